@@ -5,30 +5,33 @@ a = Analysis(
     ['fondo.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    # Perfiles de dispositivo: fondo_devices los busca junto al módulo
+    datas=[('fondo_devices.json', '.')],
+    # fondo.py importa la interfaz y los subcomandos al usarlos: declararlos para el análisis
+    hiddenimports=['fondo_gui', 'fondo_jobs', 'fondo_batch', 'fondo_bench', 'fondo_server', 'fondo_sync', 'fondo_watch'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Módulos que el convertidor nunca usa: menos que empaquetar y que indexar al arrancar
+    excludes=['pydoc', 'doctest', 'pdb', 'unittest', 'PIL.ImageQt', 'PyQt5', 'PyQt6', 'PySide2', 'PySide6',
+              'IPython', 'matplotlib'],
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
+# onedir: el modo onefile descomprimía todo el paquete en un temporal en cada arranque
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='fondo',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    # Sin UPX: descomprimir cada biblioteca al cargarla cuesta más que lo que ahorra en disco
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,8 +39,17 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
-app = BUNDLE(
+coll = COLLECT(
     exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='fondo',
+)
+app = BUNDLE(
+    coll,
     name='fondo.app',
     icon=None,
     bundle_identifier=None,
@@ -0,0 +1,402 @@
+"""
+Conversión por lotes sin interfaz gráfica
+Uso: python fondo.py batch <carpetas o globs> -o <salida> [--device NOMBRE ...]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from PIL import Image
+
+import fondo_metrics
+from fondo_core import PHONE_RESOLUTIONS, MemoryLimitError, allow_large_images, convert_file, is_image_file
+from fondo_devices import REGISTRY
+from fondo_encode import (FORMATS, PRESETS, DEFAULT_PRESET, available_formats, encoder_settings,
+                          is_available)
+from fondo_fill import FILLS, DEFAULT_FILL
+from fondo_output import FSYNC_MODES, OutputWriter
+
+# Cachés propias de cada proceso hijo (el disco se comparte entre procesos)
+_worker_cache = None
+_worker_source_cache = None
+
+
+def _init_worker(cache_dir, cache_mb, source_cache_dir=None, source_cache_mb=None, max_pixels=None):
+    """Inicializar las cachés de resultados y de orígenes en el proceso hijo
+
+    source_cache_dir '' usa la carpeta por defecto de la caché de orígenes.
+    max_pixels copia el límite de píxeles del padre (un hijo lanzado con spawn
+    arranca con el de Pillow).
+    """
+    global _worker_cache, _worker_source_cache
+    if max_pixels:
+        allow_large_images(max_pixels)
+    if cache_dir:
+        from fondo_cache import ResultCache
+        _worker_cache = ResultCache(cache_dir, disk_limit_mb=cache_mb)
+    if source_cache_dir is not None:
+        from fondo_srccache import SourceCache
+        _worker_source_cache = SourceCache(source_cache_dir or None, limit_mb=source_cache_mb)
+
+
+def iter_sources(inputs, recursive=False):
+    """Expandir carpetas y globs en la lista de imágenes de origen (sin duplicados)"""
+    seen = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            pattern = '**/*' if recursive else '*'
+            candidates = sorted(Path(item).glob(pattern))
+        else:
+            candidates = sorted(Path(p) for p in glob.glob(item, recursive=True))
+
+        for path in candidates:
+            if path.is_file() and is_image_file(path):
+                key = os.path.abspath(path)
+                if key not in seen:
+                    seen.add(key)
+                    yield str(path)
+
+
+def common_root(sources):
+    """Carpeta común de los orígenes: la salida replica el árbol desde ahí
+
+    Así col/x.jpg y col/sub/x.png (o dos carpetas de entrada con los mismos
+    nombres) no escriben en la misma ruta. None si no hay raíz común
+    (unidades distintas en Windows).
+    """
+    try:
+        return os.path.commonpath([os.path.dirname(os.path.abspath(source)) for source in sources])
+    except ValueError:
+        return None
+
+
+def _convert_task(source_path, output_dir, devices, retries, max_job_bytes=None, settings=None,
+                  fill=DEFAULT_FILL, source_root=None, fsync='never', frames=False):
+    """Tarea del proceso hijo: convertir un archivo reintentando ante fallos
+
+    Devuelve (origen, salidas, error, intentos, contadores de caché de esta tarea,
+    tiempos por etapa de esta tarea).
+    """
+    caches = [cache for cache in (_worker_cache, _worker_source_cache) if cache]
+    before = {name: value for cache in caches for name, value in cache.counters.items()}
+    stages_before = fondo_metrics.snapshot()
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            # Las salidas de un origen se sincronizan juntas con fsync='batch'
+            with OutputWriter(fsync) as writer:
+                outputs = convert_file(source_path, output_dir, devices, cache=_worker_cache,
+                                       max_job_bytes=max_job_bytes, settings=settings, fill=fill,
+                                       source_root=source_root, writer=writer, frames=frames,
+                                       source_cache=_worker_source_cache)
+            error = None
+            break
+        except Exception as e:
+            # Superar el límite de memoria no se arregla reintentando
+            if attempts > retries or isinstance(e, MemoryLimitError):
+                outputs, error = [], f"{type(e).__name__}: {e}"
+                fondo_metrics.logger.error("Conversión fallida",
+                                           extra={'fields': {'path': source_path, 'attempts': attempts,
+                                                             'error': error}})
+                break
+
+    cache_delta = {name: value - before[name] for cache in caches for name, value in cache.counters.items()}
+    stage_delta = fondo_metrics.diff(fondo_metrics.snapshot(), stages_before)
+    return source_path, outputs, error, attempts, cache_delta, stage_delta
+
+
+class BatchReport:
+    """Resultado de una corrida batch"""
+
+    def __init__(self):
+        self.converted = 0
+        self.outputs = 0
+        self.failed = []
+        self.pool_restarts = 0  # procesos hijos caídos (sin memoria, segfault en un decodificador)
+        self.elapsed = 0.0
+        self.cache_stats = {}
+        self.stage_stats = {}  # etapa -> totales de fondo_metrics sumados entre procesos
+
+    @property
+    def images_per_second(self):
+        return self.converted / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def outputs_per_second(self):
+        return self.outputs / self.elapsed if self.elapsed else 0.0
+
+
+def run_batch(sources, output_dir, devices, workers=None, retries=1, progress=None,
+              cache_dir=None, cache_mb=None, max_job_mb=None, settings=None, fill=DEFAULT_FILL,
+              source_root=None, on_result=None, fsync='never', frames=False, source_cache_dir=None,
+              source_cache_mb=None):
+    """Convertir las fuentes en un pool de procesos; los fallos se registran y no detienen la corrida
+
+    workers=0 convierte en este mismo proceso, uno a uno (útil para perfilar o depurar).
+    on_result(origen, salidas, error) se llama en este proceso al terminar cada archivo.
+    fsync es el modo de fondo_output (never, batch, always). frames da un fondo
+    por cuadro en los orígenes animados. source_cache_dir activa la caché de
+    orígenes decodificados (fondo_srccache; '' = carpeta por defecto).
+    """
+    report = BatchReport()
+    max_job_bytes = int(max_job_mb * 1024 * 1024) if max_job_mb else None
+    start = time.perf_counter()
+
+    def collect(source_path, outputs, error, cache_delta, stage_delta):
+        for name, value in cache_delta.items():
+            report.cache_stats[name] = report.cache_stats.get(name, 0) + value
+        fondo_metrics.merge(report.stage_stats, stage_delta)
+        if on_result:
+            on_result(source_path, outputs, error)
+
+        if error:
+            report.failed.append((source_path, error))
+        else:
+            report.converted += 1
+            report.outputs += len(outputs)
+
+        if progress:
+            progress(report, source_path, error)
+
+    if workers == 0:
+        _init_worker(cache_dir, cache_mb, source_cache_dir, source_cache_mb)
+        for source_path in sources:
+            _, outputs, error, _, cache_delta, stage_delta = _convert_task(
+                source_path, output_dir, devices, retries, max_job_bytes, settings, fill, source_root, fsync,
+                frames)
+            collect(source_path, outputs, error, cache_delta, stage_delta)
+        report.elapsed = time.perf_counter() - start
+        return report
+
+    workers = workers or os.cpu_count() or 1
+    # Limitar tareas en vuelo para no acumular miles de futures en memoria
+    max_pending = workers * 4
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(cache_dir, cache_mb, source_cache_dir, source_cache_mb,
+                                             Image.MAX_IMAGE_PIXELS))
+
+    # Si un hijo muere, el pool entero queda roto y no se sabe qué archivo lo
+    # mató: se rehace el pool y los que estaban en vuelo se reintentan de a uno
+    # (aislados), así sólo el culpable gasta sus reintentos
+    executor = new_pool()
+    pending = {}  # future -> origen
+    suspects = deque()  # orígenes en vuelo cuando murió un hijo
+    crashes = {}  # origen -> hijos que murieron convirtiéndolo aislado
+    alone = None  # origen aislado en vuelo
+    source_iter = iter(sources)
+    exhausted = False
+
+    def restart(lost):
+        nonlocal executor
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = new_pool()
+        report.pool_restarts += 1
+        suspects.extend(lost)
+        fondo_metrics.logger.warning("Proceso de conversión caído: se rehace el pool",
+                                     extra={'fields': {'in_flight': len(lost)}})
+
+    try:
+        while pending or suspects or not exhausted:
+            batch = []
+            if suspects:
+                if not pending:
+                    alone = suspects.popleft()
+                    batch.append(alone)
+            else:
+                alone = None
+                while not exhausted and len(pending) + len(batch) < max_pending:
+                    try:
+                        batch.append(next(source_iter))
+                    except StopIteration:
+                        exhausted = True
+
+            for index, source_path in enumerate(batch):
+                try:
+                    future = executor.submit(_convert_task, source_path, output_dir, devices, retries,
+                                             max_job_bytes, settings, fill, source_root, fsync, frames)
+                except BrokenProcessPool:
+                    lost = list(pending.values()) + batch[index:]
+                    pending.clear()
+                    restart(lost)
+                    break
+                pending[future] = source_path
+
+            if not pending:
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            dead = []  # perdidos porque el pool se rompió
+            for future in done:
+                source_path = pending.pop(future)
+                try:
+                    _, outputs, error, attempts, cache_delta, stage_delta = future.result()
+                except BrokenProcessPool:
+                    dead.append(source_path)
+                    continue
+                except Exception as e:
+                    # Fallo al enviar o recibir la tarea (p. ej. al serializar): contar como fallo
+                    outputs, error, cache_delta, stage_delta = [], f"{type(e).__name__}: {e}", {}, {}
+                collect(source_path, outputs, error, cache_delta, stage_delta)
+            if not dead:
+                continue
+
+            # Todo lo que estaba en vuelo se pierde con el pool
+            lost = dead + list(pending.values())
+            pending.clear()
+            if alone is not None:
+                lost = [source for source in lost if source != alone]
+                crashes[alone] = crashes.get(alone, 0) + 1
+                if crashes[alone] > retries:
+                    error = "BrokenProcessPool: el proceso de conversión murió con este archivo"
+                    fondo_metrics.logger.error("Conversión fallida",
+                                               extra={'fields': {'path': alone, 'attempts': crashes[alone],
+                                                                 'error': error}})
+                    collect(alone, [], error, {}, {})
+                else:
+                    lost.insert(0, alone)
+                alone = None
+            restart(lost)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _print_progress(report, source_path, error):
+    """Mostrar progreso por archivo en la consola"""
+    if error:
+        print(f"❌ {source_path}: {error}", file=sys.stderr)
+    elif report.converted % 50 == 0:
+        print(f"✅ {report.converted} imágenes convertidas ({report.outputs} fondos)")
+
+
+def resolve_devices(names, brands=None):
+    """Resolver dispositivos por nombre, nombre corto o ANCHOxALTO y marcas (vacío = todos)"""
+    if not names and not brands:
+        return list(PHONE_RESOLUTIONS)
+    unknown = [name for name in names or [] if REGISTRY.find(name) is None]
+    unknown += [f"marca {brand}" for brand in brands or [] if not REGISTRY.by_brand(brand)]
+    if unknown:
+        raise SystemExit(f"Dispositivo desconocido: {', '.join(unknown)}")
+    devices = [REGISTRY.find(name).name for name in names or []]
+    devices += [profile.name for brand in brands or [] for profile in REGISTRY.by_brand(brand)]
+    return list(dict.fromkeys(devices))
+
+
+def build_parser():
+    """Construir el parser de argumentos del modo batch"""
+    parser = argparse.ArgumentParser(prog='fondo batch',
+                                     description='Convertir imágenes por lotes para todos los dispositivos')
+    parser.add_argument('inputs', nargs='+', help='Carpetas o globs de imágenes de origen')
+    parser.add_argument('-o', '--output', default='Fondos Celulares', help='Carpeta de salida')
+    parser.add_argument('-d', '--device', action='append', dest='devices',
+                        help='Dispositivo: nombre, nombre corto o ANCHOxALTO (repetible, por defecto todos)')
+    parser.add_argument('--brand', action='append', dest='brands',
+                        help='Todos los dispositivos de una marca (repetible)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='Recorrer subcarpetas')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Procesos (por defecto todos los núcleos; 0 = en este proceso)')
+    parser.add_argument('--retries', type=int, default=1, help='Reintentos por archivo fallido')
+    parser.add_argument('--format', default='jpeg', choices=list(FORMATS), help='Formato de salida')
+    parser.add_argument('--preset', default=DEFAULT_PRESET, choices=list(PRESETS),
+                        help='Preset de codificación (fast, balanced, smallest, quality)')
+    parser.add_argument('--progressive', action=argparse.BooleanOptionalAction, default=None,
+                        help='JPEG progresivo (por defecto lo que indique el preset)')
+    parser.add_argument('--subsampling', choices=['4:4:4', '4:2:2', '4:2:0'], help='Submuestreo de croma JPEG')
+    parser.add_argument('--fill', default=DEFAULT_FILL, choices=list(FILLS),
+                        help='Relleno de las barras (cover recorta sin barras, como siempre)')
+    parser.add_argument('--target-kb', type=float, help='Buscar la mayor calidad que no supere este tamaño')
+    parser.add_argument('--frames', action='store_true',
+                        help='Un fondo por cuadro en GIF/WebP animados (<nombre.gif>-001.jpg, ...)')
+    parser.add_argument('--fsync', default='never', choices=FSYNC_MODES,
+                        help='Durabilidad: never (sólo atómico), batch (fsync por origen) o always')
+    parser.add_argument('--cache-dir', help='Carpeta de caché de resultados (activa la caché)')
+    parser.add_argument('--cache-mb', type=float, default=None, help='Tamaño máximo de la caché en disco')
+    parser.add_argument('--source-cache', nargs='?', const='', default=None, metavar='CARPETA',
+                        help='Guardar los orígenes decodificados para no volver a decodificarlos '
+                             '(sin carpeta usa la de por defecto)')
+    parser.add_argument('--source-cache-mb', type=float, default=None,
+                        help='Tamaño máximo de la caché de orígenes en disco')
+    parser.add_argument('--max-job-mb', type=float, default=None,
+                        help='Límite de memoria por imagen: compone por franjas y libera el origen cuanto antes')
+    parser.add_argument('--metrics', help='Escribir contadores de caché y tiempos por etapa en formato Prometheus')
+    parser.add_argument('--timings', action='store_true', help='Mostrar el desglose de tiempo por etapa')
+    parser.add_argument('--log-level', help='Nivel del log JSON en stderr (DEBUG muestra cada etapa)')
+    parser.add_argument('--profile', choices=['cpu', 'mem', 'cpu,mem'],
+                        help='Perfilar con cProfile/tracemalloc (convierte en este proceso, -j 0)')
+    return parser
+
+
+def main(argv=None):
+    """Punto de entrada del modo batch"""
+    args = build_parser().parse_args(argv)
+    allow_large_images()
+    if args.log_level:
+        fondo_metrics.configure_logging(args.log_level)
+    if args.profile:
+        # El perfil sólo ve el proceso actual: convertir aquí mismo
+        args.workers = 0
+        with fondo_metrics.profiling(args.profile):
+            return run(args)
+    return run(args)
+
+
+def run(args):
+    """Ejecutar el modo batch con los argumentos ya interpretados"""
+    devices = resolve_devices(args.devices, args.brands)
+    if not is_available(args.format):
+        print(f"❌ El formato {args.format} no está disponible en esta instalación "
+              f"(disponibles: {', '.join(available_formats())})")
+        return 1
+    settings = encoder_settings(args.format, args.preset, progressive=args.progressive,
+                                subsampling=args.subsampling,
+                                target_bytes=args.target_kb and args.target_kb * 1024)
+    sources = list(iter_sources(args.inputs, recursive=args.recursive))
+
+    if not sources:
+        print("⚠️ No se encontraron imágenes en las rutas indicadas")
+        return 1
+
+    print(f"🔄 Convirtiendo {len(sources)} imágenes x {len(devices)} dispositivos")
+    report = run_batch(sources, args.output, devices, workers=args.workers,
+                       retries=args.retries, progress=_print_progress,
+                       cache_dir=args.cache_dir, cache_mb=args.cache_mb, max_job_mb=args.max_job_mb,
+                       settings=settings, fill=args.fill, source_root=common_root(sources),
+                       fsync=args.fsync, frames=args.frames, source_cache_dir=args.source_cache, source_cache_mb=args.source_cache_mb)
+
+    print(f"✅ {report.converted}/{len(sources)} imágenes, {report.outputs} fondos "
+          f"en {report.elapsed:.1f}s ({report.images_per_second:.1f} imágenes/s, "
+          f"{report.outputs_per_second:.1f} fondos/s)")
+    if 'misses' in report.cache_stats:
+        print(f"🗄 Caché: {report.cache_stats['memory_hits'] + report.cache_stats['disk_hits']} aciertos, "
+              f"{report.cache_stats['misses']} fallos")
+    if 'source_hits' in report.cache_stats:
+        print(f"🗄 Caché de orígenes: {report.cache_stats['source_hits']} sin decodificar, "
+              f"{report.cache_stats['source_misses']} decodificados")
+    if report.pool_restarts:
+        print(f"⚠️ {report.pool_restarts} procesos de conversión murieron y se reemplazaron")
+    if args.timings:
+        print(fondo_metrics.format_summary(report.stage_stats))
+    if args.metrics:
+        from fondo_cache import format_metrics
+        metrics = format_metrics(report.cache_stats) if report.cache_stats else ''
+        Path(args.metrics).write_text(metrics + fondo_metrics.format_metrics(report.stage_stats))
+    if report.failed:
+        print(f"❌ {len(report.failed)} archivos fallaron")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
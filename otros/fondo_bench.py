@@ -0,0 +1,969 @@
+"""
+Mediciones de rendimiento del pipeline de conversión
+Uso: python fondo.py bench decode <imágenes...> [--device NOMBRE]
+     python fondo.py bench encoders [imagen] [--json resultados.json]
+     python fondo.py bench suite [--json resultados.json] [--baseline base.json | --no-baseline]
+     python fondo.py bench suite --quick   (compara p50 contra bench_baseline_quick.json)
+     python fondo.py bench fill [imagen] [--size 1440x3200]
+     python fondo.py bench inputs [--megapixels 12] [-k exif -k rgba ...]
+     python fondo.py bench output [-n ARCHIVOS] [--dir CARPETA]
+     python fondo.py bench http imagen [--url http://127.0.0.1:8765] [-c CONEXIONES] [-n PETICIONES]
+     python fondo.py bench startup [--bundle dist/fondo] [--baseline base.json]
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import PIL
+
+from PIL import Image
+
+from fondo_core import (PHONE_RESOLUTIONS, DEFAULT_DEVICE, allow_large_images, letterbox, open_for_targets,
+                        group_by_size, exact_preview, render_all, normalize_image, iter_frames,
+                        EXIF_ORIENTATION)
+from fondo_encode import PRESETS, DEFAULT_PRESET, available_formats, encode, encoder_settings
+from fondo_fill import FILLS, DEFAULT_FILL
+import fondo_metrics
+from fondo_metrics import percentile
+from fondo_output import FSYNC_MODES, OutputWriter
+from fondo_srccache import SourceCache
+
+
+def peak_rss_mb():
+    """Memoria residente máxima del proceso actual en MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KB, macOS informa bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_isolated(func, *args):
+    """Ejecutar una medición en un proceso nuevo para que el pico de RSS sea sólo suyo
+
+    El hijo copia el límite de píxeles del padre (con spawn arrancaría con el de Pillow).
+    """
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1, initializer=allow_large_images,
+                             initargs=(Image.MAX_IMAGE_PIXELS,)) as executor:
+        return executor.submit(func, *args).result()
+
+
+def _decode_full(source_path, target_size):
+    """Ruta actual: decodificar a resolución completa y remuestrear"""
+    start = time.perf_counter()
+    with Image.open(source_path) as image:
+        image.load()
+        decoded_size = image.size
+        letterbox(image, target_size)
+    return time.perf_counter() - start, peak_rss_mb(), decoded_size
+
+
+def _decode_reduced(source_path, target_size):
+    """Ruta nueva: decodificar en draft/reduce a la escala que cubre el objetivo"""
+    start = time.perf_counter()
+    image, _ = open_for_targets(source_path, [target_size])
+    with image:
+        decoded_size = image.size
+        letterbox(image, target_size)
+    return time.perf_counter() - start, peak_rss_mb(), decoded_size
+
+
+def _decode_cached(source_path, target_size, cache_dir):
+    """Ruta con caché de orígenes: mapear lo que decodificó una sesión anterior"""
+    start = time.perf_counter()
+    image, _ = SourceCache(cache_dir).open(source_path, [target_size])
+    with image:
+        decoded_size = image.size
+        letterbox(image, target_size)
+    return time.perf_counter() - start, peak_rss_mb(), decoded_size
+
+
+def compare_decode(source_path, target_size):
+    """Comparar tiempo y pico de RSS de la decodificación completa, la reducida y la caché de orígenes"""
+    full_time, full_rss, full_size = run_isolated(_decode_full, source_path, target_size)
+    reduced_time, reduced_rss, reduced_size = run_isolated(_decode_reduced, source_path, target_size)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Primera sesión: decodifica y guarda; la segunda (otro proceso) sólo mapea
+        run_isolated(_decode_cached, source_path, target_size, cache_dir)
+        cached_time, cached_rss, cached_size = run_isolated(_decode_cached, source_path, target_size, cache_dir)
+    return {
+        'source': str(source_path),
+        'target': list(target_size),
+        'full': {'seconds': round(full_time, 4), 'peak_rss_mb': round(full_rss, 1), 'decoded': list(full_size)},
+        'reduced': {'seconds': round(reduced_time, 4), 'peak_rss_mb': round(reduced_rss, 1),
+                    'decoded': list(reduced_size)},
+        'cached': {'seconds': round(cached_time, 4), 'peak_rss_mb': round(cached_rss, 1),
+                   'decoded': list(cached_size)},
+        'seconds_saved': round(full_time - reduced_time, 4),
+        'rss_saved_mb': round(full_rss - reduced_rss, 1),
+    }
+
+
+def _cmd_decode(args):
+    """Subcomando decode: informar ahorro de tiempo y memoria por imagen"""
+    target_size = PHONE_RESOLUTIONS[args.device]
+    results = []
+    for source_path in args.images:
+        result = compare_decode(source_path, target_size)
+        results.append(result)
+        print(f"📷 {source_path}: {result['full']['seconds']:.3f}s / {result['full']['peak_rss_mb']:.0f} MB "
+              f"-> {result['reduced']['seconds']:.3f}s / {result['reduced']['peak_rss_mb']:.0f} MB "
+              f"(decodificado {result['reduced']['decoded'][0]}x{result['reduced']['decoded'][1]}) "
+              f"-> caché de orígenes {result['cached']['seconds']:.3f}s / {result['cached']['peak_rss_mb']:.0f} MB")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+def synthetic_image(size):
+    """Imagen de prueba con detalle fino y degradados (se comprime como una foto)"""
+    fractal = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 64)
+    noise = Image.effect_noise(size, 40)
+    gradient = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', (fractal, noise, gradient))
+
+
+def measure_encoders(image, target_sizes, formats=None, presets=None, repeats=3):
+    """Medir ms de codificación y bytes por formato, preset y resolución"""
+    formats = formats or available_formats()
+    presets = presets or list(PRESETS)
+    results = []
+    for target_size in target_sizes:
+        processed = letterbox(image, target_size)
+        for fmt in formats:
+            for preset in presets:
+                settings = encoder_settings(fmt, preset)
+                timings = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    data = encode(processed, settings)
+                    timings.append(time.perf_counter() - start)
+                results.append({
+                    'target': list(target_size),
+                    'format': fmt,
+                    'preset': preset,
+                    'encode_ms': round(min(timings) * 1000, 1),
+                    'bytes': len(data),
+                })
+    return results
+
+
+def _cmd_encoders(args):
+    """Subcomando encoders: tabla de ms y bytes por preset para cada resolución"""
+    if args.image:
+        image, _ = open_for_targets(args.image, list(PHONE_RESOLUTIONS.values()))
+    else:
+        image = synthetic_image((4000, 3000))
+
+    sizes = list(group_by_size(args.devices or PHONE_RESOLUTIONS))
+    results = measure_encoders(image, sizes, formats=args.formats, presets=args.presets,
+                               repeats=args.repeats)
+
+    print(f"{'resolución':>11} {'formato':>7} {'preset':>9} {'ms':>8} {'KB':>8}")
+    for row in results:
+        width, height = row['target']
+        print(f"{width:>5}x{height:<5} {row['format']:>7} {row['preset']:>9} "
+              f"{row['encode_ms']:>8.1f} {row['bytes'] / 1024:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+# Escenarios sintéticos por defecto de la suite
+SUITE_ASPECTS = {'4:3': (4, 3), '3:4': (3, 4), '16:9': (16, 9), '9:19.5': (9, 19.5)}
+SUITE_MEGAPIXELS = (2, 12, 48)
+SUITE_MODES = ('RGB', 'RGBA', 'P', 'CMYK', 'I;16')
+
+# Etapas medidas: normalización una vez por origen, el resto por objetivo
+# (mismo algoritmo que la GUI y sus dos rutas de guardado)
+SUITE_STAGES = ('normalize', 'process', 'preview', 'save_jpeg', 'save_png')
+
+# Margen tolerado respecto de la línea base antes de declarar una regresión
+DEFAULT_TOLERANCE = 0.25
+
+# Empeoramiento mínimo en ms para contar como regresión: en etapas de pocos ms
+# el ruido de la máquina supera cualquier margen relativo
+MIN_REGRESSION_MS = 25
+
+# Métricas de tiempo que hacen fallar la comparación; p95 con pocas muestras es
+# el peor caso de una máquina compartida y sólo se informa
+GATED_METRICS = ('p50_ms',)
+INFO_METRICS = ('p95_ms',)
+
+# Repeticiones de --quick: la mediana de 7 resiste a varias mediciones ruidosas
+QUICK_REPEATS = 7
+
+# --quick no mide save_png: optimize=True del preset 'quality' tarda segundos por
+# escenario y su tiempo varía demasiado para servir de control
+QUICK_STAGES = tuple(stage for stage in SUITE_STAGES if stage != 'save_png')
+
+# Línea base versionada de --quick; se regenera en la máquina de CI con:
+#   python fondo.py bench suite --quick --save-baseline bench_baseline_quick.json
+QUICK_BASELINE = Path(__file__).with_name('bench_baseline_quick.json')
+
+
+def synthetic_source(aspect, megapixels, mode):
+    """Imagen sintética con la proporción, megapíxeles y modo indicados"""
+    aspect_w, aspect_h = aspect
+    height = int((megapixels * 1_000_000 * aspect_h / aspect_w) ** 0.5)
+    width = int(height * aspect_w / aspect_h)
+    image = synthetic_image((width, height))
+    if mode == 'RGBA':
+        image.putalpha(Image.linear_gradient('L').resize(image.size))
+    elif mode == 'I;16':
+        image = image.convert('L').point(lambda value: value * 257, 'I').convert('I;16')
+    elif mode != 'RGB':
+        image = image.convert(mode)
+    return image
+
+
+def summarize(timings):
+    """p50/p95 en ms y rendimiento (operaciones por segundo) de una etapa"""
+    return {
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 2),
+        'throughput_per_s': round(len(timings) / sum(timings), 2) if sum(timings) else 0.0,
+        'samples': len(timings),
+    }
+
+
+def _run_scenario(aspect_name, aspect, megapixels, mode, target_sizes, repeats, preset, stages=SUITE_STAGES):
+    """Medir las etapas pedidas de un escenario (se ejecuta en un proceso aislado)"""
+    source = synthetic_source(aspect, megapixels, mode)
+    jpeg_settings = encoder_settings('jpeg', preset)
+    png_settings = encoder_settings('png', preset)
+    timings = {stage: [] for stage in SUITE_STAGES if stage in stages}
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        normalized = normalize_image(source)
+        timings['normalize'].append(time.perf_counter() - start)
+        for target_size in target_sizes:
+            start = time.perf_counter()
+            processed = letterbox(normalized, target_size)
+            timings['process'].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            exact_preview(processed, target_size)
+            timings['preview'].append(time.perf_counter() - start)
+
+            if 'save_jpeg' in timings:
+                start = time.perf_counter()
+                encode(processed, jpeg_settings)
+                timings['save_jpeg'].append(time.perf_counter() - start)
+
+            if 'save_png' in timings:
+                start = time.perf_counter()
+                encode(processed, png_settings)
+                timings['save_png'].append(time.perf_counter() - start)
+
+    return {
+        'name': f"{aspect_name}-{megapixels}MP-{mode}",
+        'aspect': aspect_name,
+        'megapixels': megapixels,
+        'mode': mode,
+        'source_size': list(source.size),
+        'stages': {stage: summarize(values) for stage, values in timings.items()},
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_suite(aspects=None, megapixels=None, modes=None, devices=None, repeats=1, preset=DEFAULT_PRESET,
+              progress=None, stages=None):
+    """Ejecutar la suite completa; cada escenario en un proceso nuevo para medir su memoria"""
+    stages = stages or SUITE_STAGES
+    aspects = aspects or list(SUITE_ASPECTS)
+    megapixels = megapixels or list(SUITE_MEGAPIXELS)
+    modes = modes or list(SUITE_MODES)
+    target_sizes = list(group_by_size(devices or PHONE_RESOLUTIONS))
+
+    scenarios = []
+    for aspect_name in aspects:
+        for mp in megapixels:
+            for mode in modes:
+                result = run_isolated(_run_scenario, aspect_name, SUITE_ASPECTS[aspect_name], mp, mode,
+                                      target_sizes, repeats, preset, stages)
+                scenarios.append(result)
+                if progress:
+                    progress(result)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'targets': [list(size) for size in target_sizes],
+        'repeats': repeats,
+        'preset': preset,
+        'stages': list(stages),
+        'scenarios': scenarios,
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Listar regresiones frente a una línea base guardada
+
+    Cada una lleva 'gating': p50 y memoria hacen fallar la comparación, p95 sólo se informa.
+    """
+    previous = {scenario['name']: scenario for scenario in baseline['scenarios']}
+    regressions = []
+    for scenario in results['scenarios']:
+        before = previous.get(scenario['name'])
+        if before is None:
+            continue
+
+        checks = [('peak_rss_mb', before['peak_rss_mb'], scenario['peak_rss_mb'])]
+        for stage, summary in scenario['stages'].items():
+            if stage in before['stages']:
+                for metric in GATED_METRICS + INFO_METRICS:
+                    checks.append((f"{stage}.{metric}", before['stages'][stage][metric], summary[metric]))
+
+        for metric, old, new in checks:
+            if metric.endswith('_ms') and new - old <= MIN_REGRESSION_MS:
+                continue
+            if old and new > old * (1 + tolerance):
+                regressions.append({
+                    'scenario': scenario['name'],
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'change_pct': round((new / old - 1) * 100, 1),
+                    'gating': metric.split('.')[-1] not in INFO_METRICS,
+                })
+    return regressions
+
+
+def _print_scenario(result):
+    """Mostrar el resumen de un escenario en la consola"""
+    stages = ' '.join(f"{stage}={summary['p50_ms']:.0f}/{summary['p95_ms']:.0f}ms"
+                      for stage, summary in result['stages'].items())
+    print(f"📊 {result['name']:<22} {stages} rss={result['peak_rss_mb']:.0f}MB")
+
+
+def _cmd_suite(args):
+    """Subcomando suite: medir todo y comparar contra la línea base"""
+    if args.quick:
+        args.megapixels = args.megapixels or [2]
+        args.aspects = args.aspects or ['4:3', '9:19.5']
+        args.modes = args.modes or ['RGB', 'RGBA']
+        args.devices = args.devices or [DEFAULT_DEVICE]
+        args.repeats = args.repeats or QUICK_REPEATS
+        if not args.baseline and not args.save_baseline:
+            args.baseline = str(QUICK_BASELINE)
+
+    # Sin línea base no hay nada que falle: exigir una o que se renuncie a ella explícitamente
+    if args.no_baseline:
+        args.baseline = None
+    elif not args.baseline and not args.save_baseline:
+        print("❌ Falta la línea base: usa --baseline base.json, --save-baseline para crearla "
+              "o --no-baseline para sólo medir", file=sys.stderr)
+        return 2
+    elif args.baseline and not Path(args.baseline).is_file():
+        print(f"❌ No existe la línea base {args.baseline} (créala con --save-baseline {args.baseline})",
+              file=sys.stderr)
+        return 2
+
+    results = run_suite(aspects=args.aspects, megapixels=args.megapixels, modes=args.modes,
+                        devices=args.devices, repeats=args.repeats or 1, preset=args.preset,
+                        progress=_print_scenario, stages=QUICK_STAGES if args.quick else None)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+        print(f"💾 Línea base guardada en {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if baseline.get('preset') != results['preset'] or baseline.get('targets') != results['targets']:
+            print("⚠️ La línea base usa otro preset u otros objetivos: la comparación no es fiable",
+                  file=sys.stderr)
+        if baseline.get('environment') != results['environment']:
+            print("⚠️ La línea base se midió en otro entorno (Python, Pillow o máquina): "
+                  "regenérala con --save-baseline si hay falsas regresiones", file=sys.stderr)
+        compared = {scenario['name'] for scenario in baseline['scenarios']}
+        if not compared & {scenario['name'] for scenario in results['scenarios']}:
+            print(f"❌ Ningún escenario medido está en {args.baseline}: no se comparó nada", file=sys.stderr)
+            return 2
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for item in regressions:
+            if not item['gating']:
+                print(f"ℹ️ {item['scenario']} {item['metric']}: {item['baseline']} -> {item['current']} "
+                      f"(+{item['change_pct']}%, sólo informativo)", file=sys.stderr)
+        regressions = [item for item in regressions if item['gating']]
+        if regressions:
+            print(f"❌ {len(regressions)} regresiones (tolerancia {args.tolerance:.0%}):", file=sys.stderr)
+            for item in regressions:
+                print(f"   {item['scenario']} {item['metric']}: {item['baseline']} -> {item['current']} "
+                      f"(+{item['change_pct']}%)", file=sys.stderr)
+            return 1
+        print(f"✅ Sin regresiones frente a {args.baseline}")
+    return 0
+
+
+# Sobrecosto máximo aceptado de un relleno frente al recorte original
+FILL_BUDGET = 0.10
+
+
+def measure_fills(image, target_size, fills=None, repeats=5):
+    """Mediana del render por relleno, comparada con 'cover' y con 'black'
+
+    Se mide el camino real (pirámide + letterbox desde el nivel elegido). Todos
+    los rellenos salvo 'cover' comparten la geometría con barras, así que la
+    diferencia con 'black' es el costo propio del relleno; la diferencia con
+    'cover' incluye además el cambio de geometría (la imagen entera se ve).
+    """
+    fills = list(dict.fromkeys([DEFAULT_FILL, 'black'] + (fills or list(FILLS))))
+    for fill in fills:
+        render_all(image, [target_size], fill=fill)  # calentar
+
+    # Rondas intercaladas y en orden alterno: la deriva de la máquina afecta a todos por igual
+    timings = {fill: [] for fill in fills}
+    for round_number in range(repeats):
+        for fill in (fills if round_number % 2 else fills[::-1]):
+            start = time.perf_counter()
+            render_all(image, [target_size], fill=fill)
+            timings[fill].append(time.perf_counter() - start)
+    medians = {fill: statistics.median(values) for fill, values in timings.items()}
+    return {fill: {'ms': round(seconds * 1000, 2),
+                   'vs_cover': round(seconds / medians[DEFAULT_FILL] - 1, 3),
+                   'vs_black': round(seconds / medians['black'] - 1, 3)}
+            for fill, seconds in medians.items()}
+
+
+def _cmd_fill(args):
+    """Subcomando fill: el costo propio de cada relleno no debe superar FILL_BUDGET"""
+    target_size = tuple(int(value) for value in args.size.lower().split('x'))
+    if args.image:
+        image, _ = open_for_targets(args.image, [target_size])
+    else:
+        image = synthetic_image((4000, 3000))
+
+    results = measure_fills(image, target_size, args.fills, args.repeats)
+    over_budget = []
+    print(f"{'relleno':>9} {'ms':>8} {'vs cover':>9} {'vs black':>9}")
+    for fill, row in results.items():
+        mark = ''
+        if fill not in (DEFAULT_FILL, 'black') and row['vs_black'] > FILL_BUDGET:
+            mark = ' ⚠️'
+            over_budget.append(fill)
+        print(f"{fill:>9} {row['ms']:>8.1f} {row['vs_cover']:>+9.1%} {row['vs_black']:>+9.1%}{mark}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if over_budget:
+        print(f"❌ Superan el {FILL_BUDGET:.0%} de sobrecosto: {', '.join(over_budget)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def measure_output(image, settings, count=100, directory=None, modes=None):
+    """Archivos/s al codificar y guardar count fondos: escritura directa contra OutputWriter por modo de fsync
+
+    'direct' es el camino anterior (bytes codificados + Path.write_bytes, no
+    atómico); el resto codifica en el búfer del escritor y renombra al final.
+    """
+    modes = modes or list(FSYNC_MODES)
+    results = {}
+    with tempfile.TemporaryDirectory(dir=directory) as root:
+        for mode in ['direct'] + modes:
+            folder = Path(root) / mode
+            folder.mkdir()
+            start = time.perf_counter()
+            if mode == 'direct':
+                for index in range(count):
+                    (folder / f"{index}.jpg").write_bytes(encode(image, settings))
+            else:
+                with OutputWriter(mode) as writer:
+                    for index in range(count):
+                        writer.save(image, folder / f"{index}.jpg", settings)
+            seconds = time.perf_counter() - start
+            results[mode] = {'files_per_s': round(count / seconds, 1),
+                             'ms_per_file': round(seconds * 1000 / count, 2)}
+    return results
+
+
+def _cmd_output(args):
+    """Subcomando output: costo de la escritura atómica y de cada modo de fsync"""
+    target_size = tuple(int(value) for value in args.size.lower().split('x'))
+    image = letterbox(synthetic_image((4000, 3000)), target_size)
+    settings = encoder_settings('jpeg', args.preset)
+    results = measure_output(image, settings, args.count, args.dir, args.modes)
+    print(f"{'modo':>8} {'archivos/s':>11} {'ms/archivo':>11}")
+    for mode, row in results.items():
+        print(f"{mode:>8} {row['files_per_s']:>11.1f} {row['ms_per_file']:>11.2f}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+# Tipos de entrada medidos por bench inputs (la referencia es 'rgb', un JPEG normal)
+INPUT_KINDS = ('rgb', 'exif', 'rgba', 'palette', 'cmyk', 'gray16', 'animated')
+
+# Cuadros del GIF animado sintético
+INPUT_FRAMES = 4
+
+# Parte máxima del tiempo de conversión que puede llevarse la normalización
+NORMALIZE_BUDGET = 0.15
+
+
+def write_input(kind, directory, megapixels):
+    """Escribir un origen sintético del tipo indicado y devolver su ruta"""
+    image = synthetic_source((4, 3), megapixels, 'RGB')
+    path = Path(directory) / kind
+    if kind == 'rgb':
+        image.save(path.with_suffix('.jpg'), quality=90)
+    elif kind == 'exif':
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6  # foto de celular en vertical guardada apaisada
+        image.save(path.with_suffix('.jpg'), quality=90, exif=exif)
+    elif kind == 'rgba':
+        synthetic_source((4, 3), megapixels, 'RGBA').save(path.with_suffix('.png'), compress_level=1)
+    elif kind == 'palette':
+        image.convert('P', palette=Image.Palette.ADAPTIVE).save(path.with_suffix('.gif'))
+    elif kind == 'cmyk':
+        image.convert('CMYK').save(path.with_suffix('.jpg'), quality=90)
+    elif kind == 'gray16':
+        synthetic_source((4, 3), megapixels, 'I;16').save(path.with_suffix('.png'), compress_level=1)
+    elif kind == 'animated':
+        frames = [image.rotate(90 * index).convert('P', palette=Image.Palette.ADAPTIVE)
+                  for index in range(INPUT_FRAMES)]
+        frames[0].save(path.with_suffix('.gif'), save_all=True, append_images=frames[1:], duration=100)
+    else:
+        raise ValueError(f"Tipo de entrada desconocido: {kind}")
+    return next(Path(directory).glob(f"{kind}.*"))
+
+
+def _convert_input(kind, path, target_sizes, settings):
+    """Abrir, normalizar, renderizar y codificar un origen; devuelve los cuadros procesados"""
+    if kind == 'animated':
+        frames = iter_frames(path, target_sizes)
+    else:
+        frames = [(0, open_for_targets(path, target_sizes)[0])]
+    count = 0
+    for _, image in frames:
+        with image:
+            for processed in render_all(image, target_sizes).values():
+                encode(processed, settings)
+        count += 1
+    return count
+
+
+def measure_inputs(kinds=None, target_sizes=None, megapixels=12, repeats=5, preset=DEFAULT_PRESET):
+    """Ms por cuadro de cada tipo de entrada y la parte que se lleva la normalización"""
+    kinds = kinds or list(INPUT_KINDS)
+    target_sizes = target_sizes or [PHONE_RESOLUTIONS[DEFAULT_DEVICE]]
+    settings = encoder_settings('jpeg', preset)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {kind: write_input(kind, directory, megapixels) for kind in kinds}
+        for kind, path in paths.items():
+            _convert_input(kind, path, target_sizes, settings)  # calentar
+            timings, normalize_seconds = [], 0.0
+            for _ in range(repeats):
+                before = fondo_metrics.snapshot()
+                start = time.perf_counter()
+                count = _convert_input(kind, path, target_sizes, settings)
+                timings.append((time.perf_counter() - start) / count)
+                stages = fondo_metrics.diff(fondo_metrics.snapshot(), before)
+                normalize_seconds += stages.get('normalize', {}).get('seconds', 0.0) / count
+            median = statistics.median(timings)
+            results[kind] = {'ms_per_frame': round(median * 1000, 2),
+                             'normalize_ms': round(normalize_seconds / repeats * 1000, 2),
+                             'normalize_share': round(normalize_seconds / sum(timings), 3)}
+    if 'rgb' in results:
+        for row in results.values():
+            row['vs_rgb'] = round(row['ms_per_frame'] / results['rgb']['ms_per_frame'] - 1, 3)
+    return results
+
+
+def _cmd_inputs(args):
+    """Subcomando inputs: la normalización no debe llevarse más de NORMALIZE_BUDGET del tiempo"""
+    target_sizes = list(group_by_size(args.devices or [DEFAULT_DEVICE]))
+    results = measure_inputs(args.kinds, target_sizes, args.megapixels, args.repeats, args.preset)
+    over_budget = []
+    print(f"{'entrada':>9} {'ms/cuadro':>10} {'normalizar':>11} {'parte':>7} {'vs rgb':>8}")
+    for kind, row in results.items():
+        mark = ''
+        if row['normalize_share'] > NORMALIZE_BUDGET:
+            mark = ' ⚠️'
+            over_budget.append(kind)
+        print(f"{kind:>9} {row['ms_per_frame']:>10.1f} {row['normalize_ms']:>9.1f}ms "
+              f"{row['normalize_share']:>7.1%} {row.get('vs_rgb', 0):>+8.1%}{mark}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if over_budget:
+        print(f"❌ La normalización supera el {NORMALIZE_BUDGET:.0%} del tiempo en: {', '.join(over_budget)}",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+# Arranques medidos: nombre -> código importado en un intérprete nuevo
+STARTUP_IMPORTS = {
+    'import fondo': 'fondo',
+    'import fondo_core': 'fondo_core',
+    'import fondo_gui': 'fondo_gui',
+}
+
+# Cualquier arranque que empeore más que esto frente a la línea base es una regresión
+STARTUP_TOLERANCE = 0.30
+
+
+def parse_importtime(text):
+    """Leer la salida de -X importtime: [(módulo, acumulado µs, profundidad)] en orden"""
+    modules = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(cumulative_us), (len(name) - len(name.lstrip())) // 2))
+    return modules
+
+
+def heaviest_children(modules, module, count=5):
+    """Imports directos más costosos de un módulo de primer nivel (ms acumulados)"""
+    children = []
+    for name, cumulative, depth in modules:
+        if depth == 0:
+            if name == module:
+                break
+            children = []
+        elif depth == 1:
+            children.append((cumulative, name))
+    return {name: round(cumulative / 1000, 1) for cumulative, name in sorted(children, reverse=True)[:count]}
+
+
+def measure_imports(repeats=7):
+    """Tiempo de import (mediana de -X importtime) y de proceso completo de cada módulo de entrada"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, module in STARTUP_IMPORTS.items():
+        import_ms, wall_ms = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=here,
+                                       capture_output=True, text=True)
+            wall_ms.append((time.perf_counter() - start) * 1000)
+            modules = parse_importtime(completed.stderr)
+            cumulative = [us for found, us, depth in modules if found == module and depth == 0]
+            if completed.returncode or not cumulative:
+                raise RuntimeError(f"No se pudo importar {module}: {completed.stderr.strip()[-300:]}")
+            import_ms.append(cumulative[0] / 1000)
+        results[name] = {
+            'import_ms': round(statistics.median(import_ms), 1),
+            'process_ms': round(statistics.median(wall_ms), 1),
+            'heaviest': heaviest_children(modules, module),
+        }
+    return results
+
+
+def measure_launch(command, repeats=5):
+    """Arranque de la ventana hasta el primer dibujo (FONDO_STARTUP_EXIT): primera vez y mediana"""
+    env = dict(os.environ, FONDO_STARTUP_EXIT='1')
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        timings.append((time.perf_counter() - start) * 1000)
+        # main() informa los errores de la ventana por consola y sale con 0
+        if completed.returncode or 'Error' in completed.stdout:
+            raise RuntimeError(f"{' '.join(command)} falló: {(completed.stdout + completed.stderr).strip()[-300:]}")
+    return {'cold_ms': round(timings[0], 1), 'warm_ms': round(statistics.median(timings[1:] or timings), 1)}
+
+
+def _cmd_startup(args):
+    """Subcomando startup: tiempo de import y de arranque de la ventana (y del paquete de PyInstaller)"""
+    results = {'python': platform.python_version(), 'imports': measure_imports(args.repeats), 'launch': {}}
+    for name, row in results['imports'].items():
+        heaviest = ', '.join(f"{module} {ms:.0f}" for module, ms in row['heaviest'].items())
+        print(f"🚀 {name:<18} import {row['import_ms']:>6.1f} ms  proceso {row['process_ms']:>6.1f} ms  ({heaviest})")
+
+    launches = {}
+    if args.window:
+        launches['ventana'] = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fondo.py')]
+    if args.bundle:
+        launches['paquete'] = [args.bundle]
+    for name, command in launches.items():
+        try:
+            row = results['launch'][name] = measure_launch(command, args.repeats)
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ {name}: {e}", file=sys.stderr)
+            continue
+        print(f"🪟 {name:<18} primera {row['cold_ms']:>7.1f} ms  siguientes {row['warm_ms']:>7.1f} ms")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+        print(f"💾 Línea base guardada en {args.save_baseline}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = []
+        for section, metrics in (('imports', ('import_ms',)), ('launch', ('cold_ms', 'warm_ms'))):
+            for name, row in results[section].items():
+                before = baseline.get(section, {}).get(name, {})
+                for metric in metrics:
+                    old = before.get(metric)
+                    if old and row[metric] > old * (1 + args.tolerance):
+                        regressions.append(f"{name} {metric}: {old} -> {row[metric]} ms")
+        if regressions:
+            print(f"❌ {len(regressions)} regresiones de arranque (tolerancia {args.tolerance:.0%}):",
+                  file=sys.stderr)
+            for item in regressions:
+                print(f"   {item}", file=sys.stderr)
+            return 1
+        print(f"✅ Sin regresiones frente a {args.baseline}")
+    return 0
+
+
+async def _read_response(reader):
+    """Leer una respuesta HTTP/1.1 (Content-Length o chunked) y devolver (estado, cuerpo)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("conexión cerrada por el servidor")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+    else:
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, bytes(body), headers.get('connection', '').lower() == 'close'
+
+
+async def _http_client(host, port, request, remaining, results):
+    """Cliente con una conexión reutilizada: envía peticiones hasta agotar el contador"""
+    reader = writer = None
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        if writer is None:
+            reader, writer = await asyncio.open_connection(host, port)
+            results['connections'] += 1
+        start = time.perf_counter()
+        try:
+            writer.write(request)
+            await writer.drain()
+            status, body, closed = await _read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            results['errors'].append(f"{type(e).__name__}: {e}")
+            writer.close()
+            writer = None
+            continue
+        results['latencies'].append(time.perf_counter() - start)
+        results['statuses'][status] = results['statuses'].get(status, 0) + 1
+        results['bytes'] += len(body)
+        if closed:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load_test(url, image_data, device, requests=200, concurrency=8, fmt='jpeg', preset=DEFAULT_PRESET,
+                    fill=DEFAULT_FILL):
+    """Lanzar peticiones POST /convert concurrentes y medir peticiones/s y latencias"""
+    parts = urlsplit(url)
+    host, port = parts.hostname or '127.0.0.1', parts.port or 80
+    path = f"/convert?device={quote(device)}&format={fmt}&preset={preset}&fill={fill}"
+    request = (f"POST {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+               f"Content-Type: application/octet-stream\r\nContent-Length: {len(image_data)}\r\n\r\n"
+               ).encode('latin-1') + image_data
+
+    results = {'latencies': [], 'statuses': {}, 'errors': [], 'bytes': 0, 'connections': 0}
+    remaining = [requests]
+    start = time.perf_counter()
+    await asyncio.gather(*(_http_client(host, port, request, remaining, results) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = results['latencies']
+    ok = results['statuses'].get(200, 0)
+    return {
+        'url': url,
+        'device': device,
+        'requests': requests,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'ok_per_s': round(ok / elapsed, 2) if elapsed else 0.0,
+        'statuses': results['statuses'],
+        'errors': len(results['errors']),
+        'connections': results['connections'],
+        'mb_received': round(results['bytes'] / (1024 * 1024), 2),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99': round(percentile(latencies, 0.99) * 1000, 1),
+            'max': round(max(latencies) * 1000, 1),
+        } if latencies else {},
+    }
+
+
+def _cmd_http(args):
+    """Subcomando http: prueba de carga contra el servidor local"""
+    if args.image:
+        image_data = Path(args.image).read_bytes()
+    else:
+        buffer = io.BytesIO()
+        synthetic_image((4000, 3000)).save(buffer, 'JPEG', quality=90)
+        image_data = buffer.getvalue()
+
+    result = asyncio.run(load_test(args.url, image_data, args.device, requests=args.requests,
+                                   concurrency=args.concurrency, fmt=args.format, preset=args.preset,
+                                   fill=args.fill))
+    latency = result['latency_ms']
+    print(f"🌐 {result['requests']} peticiones, {result['concurrency']} conexiones, "
+          f"{result['connections']} abiertas en total")
+    print(f"⏱ {result['requests_per_s']:.1f} pet/s ({result['ok_per_s']:.1f} correctas/s) en {result['elapsed_s']:.1f}s")
+    if latency:
+        print(f"📊 latencia p50={latency['p50']:.0f}ms p95={latency['p95']:.0f}ms "
+              f"p99={latency['p99']:.0f}ms máx={latency['max']:.0f}ms")
+    print(f"📬 estados: {result['statuses']}  errores de conexión: {result['errors']}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2))
+    return 0 if result['statuses'].get(200) else 1
+
+
+def build_parser():
+    """Construir el parser de argumentos de las mediciones"""
+    parser = argparse.ArgumentParser(prog='fondo bench', description='Medir el rendimiento de la conversión')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    decode = subparsers.add_parser('decode', help='Comparar decodificación completa contra draft/reduce')
+    decode.add_argument('images', nargs='+', help='Imágenes de origen')
+    decode.add_argument('-d', '--device', default=DEFAULT_DEVICE, choices=list(PHONE_RESOLUTIONS),
+                        metavar='DISPOSITIVO', help='Dispositivo objetivo')
+    decode.add_argument('--json', help='Guardar resultados en un archivo JSON')
+    decode.set_defaults(handler=_cmd_decode)
+
+    encoders = subparsers.add_parser('encoders', help='Medir ms y bytes de cada preset por resolución')
+    encoders.add_argument('image', nargs='?', help='Imagen de origen (por defecto una sintética de 12 MP)')
+    encoders.add_argument('-d', '--device', action='append', dest='devices', choices=list(PHONE_RESOLUTIONS),
+                          metavar='DISPOSITIVO', help='Limitar a estos dispositivos (repetible)')
+    encoders.add_argument('-f', '--format', action='append', dest='formats', choices=available_formats(),
+                          help='Limitar a estos formatos (repetible)')
+    encoders.add_argument('-p', '--preset', action='append', dest='presets', choices=list(PRESETS),
+                          help='Limitar a estos presets (repetible)')
+    encoders.add_argument('--repeats', type=int, default=3, help='Repeticiones por medición (se toma la mejor)')
+    encoders.add_argument('--json', help='Guardar resultados en un archivo JSON')
+    encoders.set_defaults(handler=_cmd_encoders)
+
+    suite = subparsers.add_parser('suite', help='Suite completa sobre imágenes sintéticas con línea base')
+    suite.add_argument('--aspect', action='append', dest='aspects', choices=list(SUITE_ASPECTS),
+                       help='Proporciones de origen (repetible)')
+    suite.add_argument('--mp', action='append', dest='megapixels', type=int,
+                       help='Megapíxeles de origen (repetible)')
+    suite.add_argument('--mode', action='append', dest='modes', choices=list(SUITE_MODES),
+                       help='Modos de color de origen (repetible)')
+    suite.add_argument('-d', '--device', action='append', dest='devices', choices=list(PHONE_RESOLUTIONS),
+                       metavar='DISPOSITIVO', help='Limitar a estos dispositivos (repetible)')
+    suite.add_argument('--repeats', type=int, default=None,
+                       help=f'Repeticiones por objetivo (por defecto 1; {QUICK_REPEATS} con --quick)')
+    suite.add_argument('--preset', choices=list(PRESETS), default=DEFAULT_PRESET,
+                       help='Preset de codificación de save_jpeg/save_png (por defecto el de la GUI)')
+    suite.add_argument('--quick', action='store_true', help='Subconjunto pequeño para CI (sin save_png)')
+    suite.add_argument('--json', help='Guardar resultados en un archivo JSON')
+    suite.add_argument('--baseline', help='Línea base JSON contra la que comparar (falla si empeora p50 o memoria; '
+                                           f'con --quick, {QUICK_BASELINE.name})')
+    suite.add_argument('--no-baseline', action='store_true', help='Sólo medir, sin comparar contra una línea base')
+    suite.add_argument('--save-baseline', help='Guardar estos resultados como nueva línea base')
+    suite.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                       help='Empeoramiento tolerado (0.25 = 25%%)')
+    suite.set_defaults(handler=_cmd_suite)
+
+    fill = subparsers.add_parser('fill', help='Costo de cada relleno de barras frente al recorte original')
+    fill.add_argument('image', nargs='?', help='Imagen de origen (por defecto una sintética de 12 MP)')
+    fill.add_argument('--size', default='1440x3200', help='Tamaño objetivo ANCHOxALTO')
+    fill.add_argument('-f', '--fill', action='append', dest='fills', choices=list(FILLS),
+                      help='Limitar a estos rellenos (repetible)')
+    fill.add_argument('--repeats', type=int, default=9, help='Rondas de medición')
+    fill.add_argument('--json', help='Guardar resultados en un archivo JSON')
+    fill.set_defaults(handler=_cmd_fill)
+
+    inputs = subparsers.add_parser('inputs', help='Costo de cada tipo de entrada (EXIF, alfa, paleta, CMYK, '
+                                                  '16 bits, animada) y de su normalización')
+    inputs.add_argument('-k', '--kind', action='append', dest='kinds', choices=list(INPUT_KINDS),
+                        help='Limitar a estos tipos de entrada (repetible)')
+    inputs.add_argument('--megapixels', type=float, default=12, help='Megapíxeles de cada origen sintético')
+    inputs.add_argument('-d', '--device', action='append', dest='devices', choices=list(PHONE_RESOLUTIONS),
+                        help='Dispositivos objetivo (por defecto el predeterminado)')
+    inputs.add_argument('--repeats', type=int, default=5, help='Rondas de medición')
+    inputs.add_argument('--preset', choices=list(PRESETS), default=DEFAULT_PRESET, help='Preset de codificación')
+    inputs.add_argument('--json', help='Guardar resultados en un archivo JSON')
+    inputs.set_defaults(handler=_cmd_inputs)
+
+    output = subparsers.add_parser('output', help='Archivos/s guardando con escritura atómica y cada modo de fsync')
+    output.add_argument('-n', '--count', type=int, default=100, help='Archivos por modo')
+    output.add_argument('--size', default='1290x2796', help='Tamaño objetivo ANCHOxALTO')
+    output.add_argument('--dir', help='Carpeta donde medir (por defecto la temporal del sistema)')
+    output.add_argument('-m', '--mode', action='append', dest='modes', choices=list(FSYNC_MODES),
+                        help='Limitar a estos modos de fsync (repetible)')
+    output.add_argument('--preset', choices=list(PRESETS), default=DEFAULT_PRESET, help='Preset de codificación')
+    output.add_argument('--json', help='Guardar resultados en un archivo JSON')
+    output.set_defaults(handler=_cmd_output)
+
+    http = subparsers.add_parser('http', help='Prueba de carga contra fondo serve (peticiones/s y latencias)')
+    http.add_argument('image', nargs='?', help='Imagen a enviar (por defecto una sintética de 12 MP)')
+    http.add_argument('--url', default='http://127.0.0.1:8765', help='Dirección del servidor')
+    http.add_argument('-d', '--device', default='iPhone-15-Pro-Max',
+                      help='Dispositivo (nombre, nombre corto o ANCHOxALTO)')
+    http.add_argument('-n', '--requests', type=int, default=200, help='Peticiones en total')
+    http.add_argument('-c', '--concurrency', type=int, default=8, help='Conexiones simultáneas')
+    http.add_argument('--format', default='jpeg', help='Formato de salida')
+    http.add_argument('--preset', choices=list(PRESETS), default=DEFAULT_PRESET, help='Preset de codificación')
+    http.add_argument('--fill', choices=list(FILLS), default=DEFAULT_FILL, help='Relleno de las barras')
+    http.add_argument('--json', help='Guardar resultados en un archivo JSON')
+    http.set_defaults(handler=_cmd_http)
+
+    startup = subparsers.add_parser('startup', help='Tiempo de import y de arranque de la ventana y del paquete')
+    startup.add_argument('--repeats', type=int, default=7, help='Intérpretes nuevos por medición (mediana)')
+    startup.add_argument('--window', action='store_true',
+                         help='Medir también la ventana hasta el primer dibujo (necesita pantalla)')
+    startup.add_argument('--bundle', help='Ejecutable de PyInstaller a medir (primer arranque y siguientes)')
+    startup.add_argument('--json', help='Guardar resultados en un archivo JSON')
+    startup.add_argument('--baseline', help='Línea base JSON contra la que comparar (falla si hay regresiones)')
+    startup.add_argument('--save-baseline', help='Guardar estos resultados como nueva línea base')
+    startup.add_argument('--tolerance', type=float, default=STARTUP_TOLERANCE,
+                         help='Empeoramiento tolerado (0.30 = 30%%)')
+    startup.set_defaults(handler=_cmd_startup)
+    return parser
+
+
+def main(argv=None):
+    """Punto de entrada de las mediciones"""
+    args = build_parser().parse_args(argv)
+    allow_large_images()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
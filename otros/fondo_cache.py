@@ -0,0 +1,237 @@
+"""
+Caché de resultados de conversión (memoria + disco) con desalojo LRU
+Las claves dependen del contenido del origen, no de su ruta
+"""
+
+import functools
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# Límites por defecto, configurables con FONDO_CACHE_MB / FONDO_CACHE_MEMORY_MB
+DEFAULT_DISK_LIMIT_MB = 512
+DEFAULT_MEMORY_LIMIT_MB = 128
+
+# Versión del pipeline de píxeles: cambia cuando el mismo origen produce otra imagen
+# (2: orientación EXIF, modos de color y transparencia normalizados antes de remuestrear;
+#  3: el draft de JPEG deja también REDUCING_GAP veces el ajuste)
+PIPELINE_VERSION = 3
+
+# Hashes de archivos recordados (los menos usados se olvidan): una corrida
+# sobre una colección enorme no acumula una entrada por archivo
+HASH_MEMO_SIZE = 4096
+
+
+def default_cache_dir():
+    """Carpeta de caché del usuario (respeta FONDO_CACHE_DIR y XDG_CACHE_HOME)"""
+    if os.environ.get('FONDO_CACHE_DIR'):
+        return Path(os.environ['FONDO_CACHE_DIR'])
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'fondo'
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 del contenido del archivo, memorizado mientras no cambie mtime/tamaño"""
+    stat = os.stat(path)
+    return _hash_contents(os.path.abspath(path), stat.st_mtime_ns, stat.st_size, chunk_size)
+
+
+@functools.lru_cache(maxsize=HASH_MEMO_SIZE)
+def _hash_contents(path, mtime_ns, size, chunk_size):
+    """SHA-256 de un archivo; mtime y tamaño sólo forman parte de la clave del memo"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_key(source_hash, target_size, resample, encode_settings=None, fill=None):
+    """Clave de caché: hash del origen + tamaño + filtro + ajustes de codificación + relleno"""
+    parts = [source_hash, f"{target_size[0]}x{target_size[1]}", str(int(resample)), f"v{PIPELINE_VERSION}"]
+    if encode_settings:
+        parts.append(','.join(f"{name}={value}" for name, value in sorted(encode_settings.items())))
+    if fill and fill != 'cover':
+        # Sin relleno (o 'cover') no se añade nada: la clave sólo cambia si cambia la imagen
+        parts.append(f"fill={fill}")
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+class ResultCache:
+    """Caché LRU de imágenes renderizadas (memoria) y bytes codificados (memoria + disco)"""
+
+    def __init__(self, directory=None, disk_limit_mb=None, memory_limit_mb=None):
+        if disk_limit_mb is None:
+            disk_limit_mb = float(os.environ.get('FONDO_CACHE_MB', DEFAULT_DISK_LIMIT_MB))
+        if memory_limit_mb is None:
+            memory_limit_mb = float(os.environ.get('FONDO_CACHE_MEMORY_MB', DEFAULT_MEMORY_LIMIT_MB))
+
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.disk_limit = int(disk_limit_mb * 1024 * 1024)
+        self.memory_limit = int(memory_limit_mb * 1024 * 1024)
+
+        self._memory = OrderedDict()  # clave -> (valor, bytes ocupados)
+        self._memory_bytes = 0
+        self._disk_bytes = None  # se calcula al primer uso del disco
+        self._lock = threading.Lock()
+        self.counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'memory_evictions': 0,
+            'disk_evictions': 0,
+        }
+
+    # --- memoria ---
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            self._memory.move_to_end(key)
+            return entry[0]
+
+    def _memory_put(self, key, value, size):
+        if size > self.memory_limit:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old[1]
+            self._memory[key] = (value, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_limit:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self.counters['memory_evictions'] += 1
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get_image(self, key):
+        """Imagen renderizada en memoria o None"""
+        image = self._memory_get('img:' + key)
+        self._count('memory_hits' if image is not None else 'misses')
+        return image
+
+    def put_image(self, key, image):
+        """Guardar una imagen renderizada (sólo en memoria)"""
+        size = image.width * image.height * len(image.getbands())
+        self._memory_put('img:' + key, image, size)
+
+    # --- bytes codificados ---
+
+    def _path_for(self, key):
+        return self.directory / key[:2] / key
+
+    def get_bytes(self, key):
+        """Bytes codificados desde memoria o disco, o None"""
+        data = self._memory_get('bin:' + key)
+        if data is not None:
+            self._count('memory_hits')
+            return data
+
+        path = self._path_for(key)
+        try:
+            data = path.read_bytes()
+            # Marcar como usado recientemente para el LRU de disco
+            os.utime(path)
+        except OSError:
+            self._count('misses')
+            return None
+
+        self._count('disk_hits')
+        self._memory_put('bin:' + key, data, len(data))
+        return data
+
+    def put_bytes(self, key, data):
+        """Guardar bytes codificados en memoria y en disco"""
+        self._memory_put('bin:' + key, data, len(data))
+        if self.disk_limit <= 0:
+            return
+
+        path = self._path_for(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            try:
+                replaced = path.stat().st_size  # la entrada que se pisa deja de ocupar
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()[1]
+            else:
+                self._disk_bytes += len(data) - replaced
+            over_limit = self._disk_bytes > self.disk_limit
+        if over_limit:
+            self._evict_disk()
+
+    def _scan_disk(self):
+        """Listar entradas de disco (mtime, tamaño, ruta) y el total ocupado"""
+        entries = []
+        total = 0
+        for path in self.directory.glob('*/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        return entries, total
+
+    def _evict_disk(self):
+        """Borrar las entradas menos usadas hasta quedar en el 90% del límite"""
+        entries, total = self._scan_disk()
+        entries.sort()
+        target = self.disk_limit * 0.9
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._disk_bytes = total
+            self.counters['disk_evictions'] += evicted
+
+    # --- métricas ---
+
+    def stats(self):
+        """Copia de los contadores de aciertos/fallos y ocupación"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_bytes'] = self._memory_bytes
+            stats['disk_bytes'] = self._disk_bytes or 0
+        return stats
+
+    def metrics_text(self):
+        """Contadores en formato de texto de Prometheus"""
+        return format_metrics(self.stats())
+
+
+def format_metrics(stats):
+    """Formatear contadores de caché (de uno o varios procesos) para Prometheus"""
+    lines = []
+    for name, value in sorted(stats.items()):
+        metric = f"fondo_cache_{name}"
+        kind = 'gauge' if name.endswith('_bytes') else 'counter'
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.append(f"{metric} {value}")
+    return '\n'.join(lines) + '\n'
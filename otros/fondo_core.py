@@ -0,0 +1,635 @@
+"""
+Núcleo de conversión de fondos de pantalla (sin interfaz gráfica)
+Contiene el algoritmo de ajuste con barras negras usado por la GUI y por el modo batch
+"""
+
+import io
+import os
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from fondo_devices import REGISTRY, device_short_name
+from fondo_encode import DEFAULT_PRESET, encode, encoder_settings, extension_for, settings_for_path
+from fondo_fill import DEFAULT_FILL, matte_color, mirror_bars, new_canvas
+from fondo_metrics import record, span
+from fondo_output import OutputWriter, write_atomic
+
+# Resoluciones por dispositivo (vista de sólo lectura del registro de fondo_devices)
+PHONE_RESOLUTIONS = REGISTRY.resolutions
+
+# Dispositivo por defecto (el del archivo de perfiles)
+DEFAULT_DEVICE = REGISTRY.default
+
+# Margen de reducción previa: decodificar al menos al doble del ajuste conserva la calidad LANCZOS
+REDUCING_GAP = 2.0
+
+# Límite de píxeles para archivos locales (CLI e interfaz, ver allow_large_images):
+# fotos de cámara y dron de hasta ~200 MP son legítimas; Pillow avisa desde ~89 MP
+TRUSTED_MAX_PIXELS = int(os.environ.get('FONDO_MAX_PIXELS', 250_000_000))
+
+# Alto de cada franja al componer en modo de memoria acotada
+STRIP_HEIGHT = 256
+
+# Ancho del canvas de vista previa en la interfaz
+PREVIEW_WIDTH = 250
+
+# Filtro de remuestreo usado en todas las conversiones
+DEFAULT_RESAMPLE = Image.Resampling.LANCZOS
+
+# Extensiones aceptadas como imagen de origen
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.tif', '.webp')
+
+# Modos que se remuestrean y se pegan en el canvas RGB sin conversión previa
+# (RGBX es la memoria de RGB tal cual: la usan los orígenes mapeados de fondo_srccache)
+PIPELINE_MODES = ('RGB', 'RGBX', 'L')
+
+# Modos que reduce() admite; el resto se convierte antes de reducir
+REDUCIBLE_MODES = ('RGB', 'RGBX', 'L', 'RGBA', 'LA', 'CMYK', 'I', 'F')
+
+# Etiqueta EXIF de orientación -> transposición que deja la foto derecha (como ImageOps.exif_transpose)
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+class MemoryLimitError(Exception):
+    """El trabajo no cabe en el límite de memoria configurado"""
+
+
+def fit_size(source_size, target_size, fill=DEFAULT_FILL):
+    """Calcular dimensiones manteniendo proporción para cubrir el objetivo
+
+    Con un relleno distinto de 'cover' la imagen queda entera dentro del
+    objetivo y el resto lo ocupan las barras.
+    """
+    original_width, original_height = source_size
+    target_width, target_height = target_size
+    original_aspect = original_width / original_height
+    target_aspect = target_width / target_height
+
+    if (original_aspect > target_aspect) == (fill == DEFAULT_FILL):
+        # Imagen más ancha - ajustar por altura
+        new_height = target_height
+        new_width = int(new_height * original_aspect)
+    else:
+        # Imagen más alta - ajustar por ancho
+        new_width = target_width
+        new_height = int(new_width / original_aspect)
+
+    return new_width, new_height
+
+
+def image_bytes(size, mode):
+    """Memoria que ocupa una imagen decodificada (Pillow guarda RGB en 4 bytes por píxel)"""
+    if mode in ('1', 'L', 'P'):
+        pixel_size = 1
+    elif mode in ('I;16', 'I;16B', 'I;16L'):
+        pixel_size = 2
+    else:
+        pixel_size = 4
+    return size[0] * size[1] * pixel_size
+
+
+def allow_large_images(max_pixels=None):
+    """Subir el límite anti bomba de descompresión de Pillow en este proceso
+
+    Sólo para archivos de confianza (batch, sync, watch, interfaz): el
+    servidor recibe imágenes de afuera y conserva el límite de Pillow.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels or TRUSTED_MAX_PIXELS
+
+
+def exif_orientation(image):
+    """Orientación EXIF de una imagen abierta (1 si no tiene o no se puede leer)"""
+    try:
+        orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    except Exception:
+        return 1
+    return orientation if orientation in ORIENTATION_TRANSPOSE else 1
+
+
+def oriented_size(size, orientation):
+    """Tamaño tal como se ve la foto una vez aplicada la orientación EXIF"""
+    return (size[1], size[0]) if orientation in (5, 6, 7, 8) else tuple(size)
+
+
+def has_alpha(image):
+    """Comprobar si la imagen tiene transparencia (canal alfa o color transparente)"""
+    return image.mode in ('RGBA', 'LA', 'PA', 'RGBa', 'La') or 'transparency' in image.info
+
+
+def to_pipeline_mode(image, fill=DEFAULT_FILL):
+    """Convertir en una sola pasada a RGB o L, aplanando la transparencia sobre el relleno
+
+    Devuelve la misma imagen si ya está en un modo del pipeline. 16 bits se
+    escala a 8 (convert('L') recortaría todo lo mayor que 255) y CMYK, paleta,
+    YCbCr, LAB o HSV pasan a RGB.
+    """
+    mode = image.mode
+    if has_alpha(image):
+        rgba = image if mode == 'RGBA' else image.convert('RGBA')
+        flat = Image.new('RGB', image.size, matte_color(rgba, fill))
+        flat.paste(rgba, mask=rgba)
+        return flat
+    if mode in PIPELINE_MODES:
+        return image
+    if mode.startswith('I;16'):
+        return image.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+    if mode in ('I', 'F'):
+        high = image.getextrema()[1]
+        if high > 255:
+            image = image.point(lambda value: value * (255 / high))
+        return image.convert('L')
+    if mode == '1':
+        return image.convert('L')
+    return image.convert('RGB')
+
+
+def normalize_image(image, fill=DEFAULT_FILL, orientation=None):
+    """Dejar la imagen derecha y en RGB o L antes de remuestrear
+
+    orientation es la orientación EXIF (se lee de la imagen si no se indica).
+    Devuelve la misma imagen si no hay nada que corregir.
+    """
+    if orientation is None:
+        orientation = exif_orientation(image)
+    if orientation == 1 and image.mode in PIPELINE_MODES and not has_alpha(image):
+        return image
+    with span('normalize', mode=image.mode, orientation=orientation, size=image.size):
+        normalized = to_pipeline_mode(image, fill)
+        if orientation != 1:
+            # Transponer después de convertir: RGB/L es lo más barato de mover
+            normalized = normalized.transpose(ORIENTATION_TRANSPOSE[orientation])
+    return normalized
+
+
+def _replace(image, new_image):
+    """Cerrar image si new_image es otra imagen (libera el búfer decodificado enseguida)"""
+    if new_image is not image:
+        image.close()
+    return new_image
+
+
+def letterbox(image, target_size, resample=DEFAULT_RESAMPLE, fit=None, strip_height=None, fill=DEFAULT_FILL):
+    """Ajustar una imagen al tamaño objetivo centrada sobre un canvas negro
+
+    fit permite indicar el tamaño ya calculado sobre la imagen original cuando
+    image es un nivel reducido de la pirámide (evita errores de redondeo).
+    Con strip_height el remuestreo se hace por franjas directamente sobre el
+    canvas, sin reservar la imagen redimensionada completa. fill elige el
+    relleno de las barras (ver fondo_fill).
+    """
+    target_width, target_height = target_size
+
+    # Redimensionar imagen manteniendo calidad
+    new_width, new_height = fit or fit_size(image.size, target_size, fill)
+
+    # Calcular posición para centrar
+    x = (target_width - new_width) // 2
+    y = (target_height - new_height) // 2
+
+    # Sólo remuestrear la zona visible: lo que sobresale del canvas se recortaría al pegar
+    visible_left, visible_top = max(-x, 0), max(-y, 0)
+    visible_width = min(new_width, target_width)
+    visible_height = min(new_height, target_height)
+    image_box = (max(x, 0), max(y, 0), max(x, 0) + visible_width, max(y, 0) + visible_height)
+
+    # Crear canvas del tamaño objetivo (negro salvo rellenos de color o desenfoque)
+    with span('composite', size=target_size, step='canvas', fill=fill):
+        processed = new_canvas(image, target_size, fill, image_box)
+    scale_x = image.width / new_width
+    scale_y = image.height / new_height
+    left, right = visible_left * scale_x, (visible_left + visible_width) * scale_x
+
+    if not strip_height:
+        box = (left, visible_top * scale_y, right, (visible_top + visible_height) * scale_y)
+        with span('resize', source=image.size, size=(visible_width, visible_height)):
+            resized = image.resize((visible_width, visible_height), resample, box=box)
+
+        # Pegar imagen centrada en canvas negro
+        with span('composite', size=target_size, step='paste'):
+            processed.paste(resized, (max(x, 0), max(y, 0)))
+    else:
+        # Franja a franja: cada una remuestrea sólo sus filas del origen y se pega enseguida
+        resize_seconds = paste_seconds = 0.0
+        for row in range(0, visible_height, strip_height):
+            rows = min(strip_height, visible_height - row)
+            box = (left, (visible_top + row) * scale_y, right, (visible_top + row + rows) * scale_y)
+            start = time.perf_counter()
+            strip = image.resize((visible_width, rows), resample, box=box)
+            middle = time.perf_counter()
+            processed.paste(strip, (max(x, 0), max(y, 0) + row))
+            resize_seconds += middle - start
+            paste_seconds += time.perf_counter() - middle
+        # Un solo registro por etapa aunque haya muchas franjas
+        record('resize', resize_seconds, source=image.size, size=(visible_width, visible_height), strips=True)
+        record('composite', paste_seconds, size=target_size, step='paste', strips=True)
+
+    if fill == 'mirror':
+        # El reflejo sale de la imagen ya compuesta: sirve también en modo por franjas
+        with span('composite', size=target_size, step='mirror'):
+            mirror_bars(processed, image_box)
+    return processed
+
+
+def group_by_size(devices):
+    """Agrupar dispositivos por resolución para no renderizar dos veces el mismo tamaño"""
+    return REGISTRY.group_by_size(devices)
+
+
+def build_pyramid(image, fits):
+    """Construir niveles reducidos a la mitad mientras sigan cubriendo 2x el menor ajuste
+
+    Devuelve la lista de niveles de mayor a menor; el nivel 0 es la imagen original.
+    """
+    min_width = min(width for width, _ in fits)
+    min_height = min(height for _, height in fits)
+
+    levels = [image]
+    if image.mode in ('P', '1', 'I;16'):
+        # reduce() no admite estos modos; se remuestrea desde el original
+        return levels
+
+    level = image
+    while level.width // 2 >= min_width * 2 and level.height // 2 >= min_height * 2:
+        level = level.reduce(2)
+        levels.append(level)
+    return levels
+
+
+def pick_level(levels, fit):
+    """Elegir el nivel más pequeño que todavía mide al menos 2x el ajuste (calidad LANCZOS)"""
+    chosen = levels[0]
+    for level in levels[1:]:
+        if level.width >= fit[0] * 2 and level.height >= fit[1] * 2:
+            chosen = level
+        else:
+            break
+    return chosen
+
+
+def prepare_render(image, target_sizes, resample=DEFAULT_RESAMPLE, release_source=False,
+                   max_shared_bytes=None, fill=DEFAULT_FILL):
+    """Preparar lo compartido entre tamaños: ajustes y pirámide del intermedio
+
+    Devuelve (tamaños de mayor a menor, tamaño -> ajuste, niveles). Cada tamaño
+    se renderiza luego con letterbox(pick_level(niveles, ajuste), ...); los
+    niveles sólo se leen, así que esos renders pueden correr en paralelo.
+    """
+    sizes = list(dict.fromkeys(target_sizes))
+    fits = {size: fit_size(image.size, size, fill) for size in sizes}
+
+    # Intermedio compartido: sólo si reduce (ampliar y volver a reducir perdería calidad)
+    largest = max(fits.values(), key=lambda fit: fit[0] * fit[1])
+    shared = image
+    if len(sizes) > 1 and largest[0] < image.width and largest[1] < image.height:
+        if max_shared_bytes is None or image_bytes(largest, image.mode) <= max_shared_bytes:
+            with span('resize', source=image.size, size=largest, step='shared'):
+                shared = image.resize(largest, resample)
+            if release_source:
+                # Liberar el original decodificado: todo sale del intermedio
+                image.close()
+    with span('resize', source=shared.size, step='pyramid'):
+        levels = build_pyramid(shared, fits.values())
+
+    # Empezar por los tamaños grandes: comparten los niveles altos de la pirámide
+    return sorted(sizes, key=lambda s: s[0] * s[1], reverse=True), fits, levels
+
+
+def iter_render_all(image, target_sizes, resample=DEFAULT_RESAMPLE, strip_height=None,
+                    release_source=False, max_shared_bytes=None, fill=DEFAULT_FILL):
+    """Renderizar varios tamaños desde una sola decodificación, entregando uno a la vez
+
+    Los tamaños repetidos se renderizan una vez. El original se remuestrea una
+    sola vez al mayor ajuste (intermedio compartido) y cada salida parte del
+    nivel más cercano de su pirámide, así sólo queda un remuestreo final pequeño.
+    Genera pares (tamaño, imagen procesada) de mayor a menor, de modo que el
+    llamador puede codificar y soltar cada resultado antes del siguiente.
+
+    release_source cierra el original en cuanto deja de necesitarse y
+    max_shared_bytes limita el tamaño del intermedio compartido.
+    """
+    sizes, fits, levels = prepare_render(image, target_sizes, resample, release_source, max_shared_bytes, fill)
+    for size in sizes:
+        fit = fits[size]
+        yield size, letterbox(pick_level(levels, fit), size, resample, fit=fit, strip_height=strip_height,
+                              fill=fill)
+
+
+def render_all(image, target_sizes, resample=DEFAULT_RESAMPLE, fill=DEFAULT_FILL):
+    """Renderizar varios tamaños desde una sola decodificación
+
+    Devuelve un diccionario tamaño -> imagen procesada (ver iter_render_all).
+    """
+    return dict(iter_render_all(image, target_sizes, resample, fill=fill))
+
+
+def preview_size_for(target_size, preview_width=PREVIEW_WIDTH):
+    """Tamaño de la vista previa de un objetivo (manteniendo proporción)"""
+    return preview_width, int(preview_width * (target_size[1] / target_size[0]))
+
+
+def make_preview_source(image, target_sizes, preview_width=PREVIEW_WIDTH):
+    """Reducir el origen una vez al tamaño que cubre cualquier vista previa
+
+    El resultado es pequeño (unos cientos de píxeles) y sirve para pintar
+    vistas previas instantáneas de cualquier dispositivo sin tocar el original.
+    """
+    fits = [fit_size(image.size, preview_size_for(size, preview_width)) for size in target_sizes]
+    need_width = max(width for width, _ in fits) * 2
+    need_height = max(height for _, height in fits) * 2
+    with span('preview', step='source'):
+        if need_width >= image.width or need_height >= image.height:
+            return image.copy()
+        scale = max(need_width / image.width, need_height / image.height)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        return image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def quick_preview(preview_source, source_size, target_size, preview_width=PREVIEW_WIDTH, fill=DEFAULT_FILL):
+    """Vista previa aproximada del resultado a partir del origen reducido
+
+    Usa la geometría calculada sobre el original para que el encuadre
+    coincida con el resultado final; sólo cambia la calidad del filtro.
+    """
+    preview_size = preview_size_for(target_size, preview_width)
+    fit = fit_size(source_size, target_size, fill)
+    scale = preview_size[0] / target_size[0]
+    preview_fit = (max(1, round(fit[0] * scale)), max(1, round(fit[1] * scale)))
+    with span('preview', size=target_size, step='quick'):
+        return letterbox(preview_source, preview_size, Image.Resampling.BILINEAR, fit=preview_fit, fill=fill)
+
+
+def exact_preview(processed, target_size, preview_width=PREVIEW_WIDTH):
+    """Vista previa exacta de un resultado ya procesado"""
+    # reducing_gap: reducción por bloques primero y LANCZOS sólo sobre lo que queda
+    with span('preview', size=target_size, step='exact'):
+        return processed.resize(preview_size_for(target_size, preview_width), Image.Resampling.LANCZOS,
+                                reducing_gap=2.0)
+
+
+def need_size(source_size, target_sizes):
+    """Menor tamaño del origen que todavía cubre todos los objetivos (sin barras)"""
+    fits = [fit_size(source_size, size) for size in target_sizes]
+    return max(width for width, _ in fits), max(height for _, height in fits)
+
+
+def _reduce_for(image, need_width, need_height, reducing_gap, source_path, fill=DEFAULT_FILL):
+    """Reducir por bloques dejando reducing_gap veces el tamaño necesario"""
+    factor = min(int(image.width / (need_width * reducing_gap)),
+                 int(image.height / (need_height * reducing_gap)))
+    if factor < 2:
+        return image
+    if image.mode not in REDUCIBLE_MODES:
+        # Paleta, 1 bit y 16 bits no se pueden reducir: convertir primero
+        image = _replace(image, to_pipeline_mode(image, fill))
+    with span('decode', path=str(source_path), step='reduce', factor=factor):
+        return _replace(image, image.reduce(factor))
+
+
+def open_for_targets(source_path, target_sizes, reducing_gap=REDUCING_GAP, max_bytes=None,
+                     fill=DEFAULT_FILL):
+    """Abrir una imagen decodificando sólo la escala necesaria para los tamaños objetivo
+
+    JPEG usa Image.draft (escalado DCT 1/2, 1/4, 1/8 al decodificar) y el
+    resto de formatos se cargan completos y se reducen con reduce(); los dos
+    son promedios por bloques, así que ambos dejan reducing_gap veces el mayor
+    ajuste para el remuestreo final. Devuelve (imagen, tamaño original).
+
+    La imagen devuelta ya está normalizada (ver normalize_image): derecha según
+    su EXIF, en RGB o L y con la transparencia aplanada sobre fill. El tamaño
+    original es el de la foto ya girada.
+
+    Con max_bytes se comprueba antes de decodificar que el origen (a la escala
+    elegida) quepa en el límite; si no, se lanza MemoryLimitError.
+    """
+    with span('load', path=str(source_path)):
+        image = Image.open(source_path)
+    orientation = exif_orientation(image)
+    original_size = oriented_size(image.size, orientation)
+    # Lo necesario en las coordenadas del archivo (antes de girar)
+    need_width, need_height = oriented_size(need_size(original_size, target_sizes), orientation)
+
+    if image.format == 'JPEG':
+        # draft elige la mayor reducción que todavía mide al menos lo pedido
+        image.draft(None, (int(need_width * reducing_gap), int(need_height * reducing_gap)))
+
+    # Tras draft, size ya refleja la escala a la que se va a decodificar
+    if max_bytes is not None and image_bytes(image.size, image.mode) > max_bytes:
+        decoded_mb = image_bytes(image.size, image.mode) / (1024 * 1024)
+        image.close()
+        raise MemoryLimitError(f"el origen decodificado ocupa {decoded_mb:.0f} MB "
+                               f"(límite {max_bytes / (1024 * 1024):.0f} MB)")
+
+    with span('decode', path=str(source_path), format=image.format, size=image.size) as fields:
+        image.load()
+        fields['bytes'] = image_bytes(image.size, image.mode)
+    if image.format != 'JPEG':
+        image = _reduce_for(image, need_width, need_height, reducing_gap, source_path, fill)
+    # Convertir y girar sobre la imagen ya reducida: una sola pasada, la más pequeña posible
+    return _replace(image, normalize_image(image, fill, orientation)), original_size
+
+
+def is_animated(source_path):
+    """Comprobar si el archivo tiene varios cuadros (GIF, WebP o PNG animados)"""
+    with Image.open(source_path) as image:
+        return getattr(image, 'n_frames', 1) > 1
+
+
+def iter_frames(source_path, target_sizes, reducing_gap=REDUCING_GAP, fill=DEFAULT_FILL):
+    """Abrir cada cuadro de una imagen animada, reducido y normalizado como open_for_targets
+
+    Genera pares (índice, imagen); cada imagen es independiente del archivo y
+    quien la recibe debe cerrarla.
+    """
+    with span('load', path=str(source_path)):
+        image = Image.open(source_path)
+    with image:
+        orientation = exif_orientation(image)
+        need_width, need_height = oriented_size(need_size(oriented_size(image.size, orientation), target_sizes),
+                                                orientation)
+        for index in range(getattr(image, 'n_frames', 1)):
+            image.seek(index)
+            with span('decode', path=str(source_path), format=image.format, size=image.size, frame=index):
+                # copy() deja el cuadro fuera del archivo, que se reutiliza al avanzar
+                frame = image.copy()
+            frame = _reduce_for(frame, need_width, need_height, reducing_gap, source_path, fill)
+            yield index, _replace(frame, normalize_image(frame, fill, orientation))
+
+
+def encode_settings_for(file_path, preset=DEFAULT_PRESET):
+    """Ajustes de codificación según la extensión (JPEG salvo formatos reconocidos)"""
+    return settings_for_path(file_path, preset)
+
+
+def timed_encode(image, settings):
+    """Codificar registrando la etapa encode con los bytes producidos"""
+    with span('encode', format=settings['format'], size=image.size) as fields:
+        data = encode(image, settings)
+        fields['bytes'] = len(data)
+    return data
+
+
+def write_bytes(file_path, data, writer=None):
+    """Escribir un resultado de forma atómica (ver fondo_output) registrando la etapa write"""
+    if writer is None:
+        write_atomic(file_path, data)
+    else:
+        writer.write(file_path, data)
+
+
+def save_image(image, file_path, preset=DEFAULT_PRESET):
+    """Guardar según la extensión del archivo con el preset indicado"""
+    with OutputWriter() as writer:
+        writer.save(image, file_path, encode_settings_for(file_path, preset))
+
+
+def encode_image(image, extension='.jpg', preset=DEFAULT_PRESET, settings=None):
+    """Codificar en memoria con los mismos ajustes que save_image (o los indicados)"""
+    return timed_encode(image, settings or encode_settings_for(extension, preset))
+
+
+def default_output_dir():
+    """Carpeta de salida predeterminada: Escritorio, Documentos o la carpeta actual"""
+    for folder in ("Desktop", "Documents"):
+        base = Path.home() / folder
+        if base.exists():
+            return base / "Fondos Celulares"
+    return Path.cwd() / "Fondos Celulares"
+
+
+def output_path_for(source_path, output_dir, device_name, extension='.jpg', source_root=None, frame=None):
+    """Ruta de salida de un origen para un dispositivo: <salida>/<dispositivo>/<nombre.ext>.jpg
+
+    El nombre conserva la extensión del origen (foto.png -> foto.png.jpg) para
+    que foto.jpg y foto.png de la misma carpeta no se pisen. Con source_root se
+    conservan las subcarpetas del origen relativas a esa raíz.
+    frame (desde 0) numera los cuadros de un origen animado: <nombre.ext>-001.jpg.
+    """
+    if source_root:
+        relative = Path(os.path.relpath(source_path, source_root))
+    else:
+        relative = Path(Path(source_path).name)
+    suffix = f"-{frame + 1:03d}" if frame is not None else ''
+    relative = relative.with_name(f"{relative.name}{suffix}{extension}")
+    return Path(output_dir) / device_short_name(device_name) / relative
+
+
+def convert_file(source_path, output_dir, devices, cache=None, max_job_bytes=None, settings=None,
+                 fill=DEFAULT_FILL, source_root=None, writer=None, frames=False, source_cache=None):
+    """Convertir un archivo para cada dispositivo indicado y devolver las rutas generadas
+
+    La imagen se decodifica una vez y cada resolución única se renderiza y
+    codifica una sola vez, aunque varios dispositivos la compartan. Con una
+    caché (fondo_cache.ResultCache) los tamaños ya codificados no se
+    recalculan y, si están todos, ni siquiera se decodifica el origen.
+
+    max_job_bytes activa el modo de memoria acotada: composición por franjas,
+    el original se libera en cuanto existe el intermedio y se rechaza con
+    MemoryLimitError un origen que no quepa en el límite.
+
+    settings son los ajustes de fondo_encode (por defecto JPEG del preset por
+    defecto); la extensión de salida sale del formato elegido. fill elige el
+    relleno de las barras (ver fondo_fill). source_root conserva las subcarpetas
+    del origen en la salida (ver output_path_for). writer es un
+    fondo_output.OutputWriter (p. ej. con fsync por lotes); sin él cada salida
+    se escribe de forma atómica sin fsync. Con frames un GIF/WebP animado da un
+    fondo por cuadro (<nombre.gif>-001.jpg, ...); si no, se usa el primer cuadro.
+    source_cache (fondo_srccache.SourceCache) evita decodificar orígenes ya vistos.
+    """
+    if writer is None:
+        # Un escritor propio: todos los tamaños comparten su búfer de codificación
+        with OutputWriter() as writer:
+            return convert_file(source_path, output_dir, devices, cache, max_job_bytes, settings, fill,
+                                source_root, writer, frames, source_cache)
+
+    settings = settings or encoder_settings()
+    extension = extension_for(settings)
+    groups = group_by_size(devices)
+    keys = {}
+    outputs = []
+
+    def write_outputs(target_size, data, frame=None):
+        for device_name in groups[target_size]:
+            file_path = output_path_for(source_path, output_dir, device_name, extension, source_root, frame)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            writer.write(file_path, data)
+            outputs.append(str(file_path))
+
+    if frames and is_animated(source_path):
+        # Un fondo por cuadro; la caché guarda un resultado por tamaño y no aplica
+        for index, frame in iter_frames(source_path, list(groups), fill=fill):
+            with frame:
+                for target_size, processed in iter_render_all(frame, list(groups), fill=fill):
+                    with writer.encoded(processed, settings) as data:
+                        write_outputs(target_size, data, index)
+        return outputs
+
+    missing = list(groups)
+    if cache is not None:
+        from fondo_cache import file_hash, make_key
+        source_hash = file_hash(source_path)
+        missing = []
+        for target_size in groups:
+            keys[target_size] = make_key(source_hash, target_size, DEFAULT_RESAMPLE, settings, fill)
+            data = cache.get_bytes(keys[target_size])
+            if data is None:
+                missing.append(target_size)
+            else:
+                write_outputs(target_size, data)
+
+    if not missing:
+        return outputs
+
+    strip_height = None
+    decode_budget = shared_budget = None
+    if max_job_bytes is not None:
+        strip_height = STRIP_HEIGHT
+        largest_canvas = max(missing, key=lambda size: size[0] * size[1])
+        decode_budget = max_job_bytes - image_bytes(largest_canvas, 'RGB')
+        if decode_budget <= 0:
+            raise MemoryLimitError(f"el límite de {max_job_bytes / (1024 * 1024):.0f} MB "
+                                   f"no alcanza para un canvas de {largest_canvas[0]}x{largest_canvas[1]}")
+
+    if source_cache is not None and decode_budget is None:
+        image, _ = source_cache.open(source_path, missing, fill=fill)
+    else:
+        image, _ = open_for_targets(source_path, missing, max_bytes=decode_budget, fill=fill)
+    if decode_budget is not None:
+        # El intermedio compartido convive con el origen sólo mientras se crea
+        shared_budget = decode_budget - image_bytes(image.size, image.mode)
+
+    with image:
+        # Codificar y escribir cada tamaño en cuanto está listo: un solo canvas vivo a la vez
+        for target_size, processed in iter_render_all(image, missing, strip_height=strip_height,
+                                                      release_source=max_job_bytes is not None,
+                                                      max_shared_bytes=shared_budget, fill=fill):
+            # Se codifica en el búfer reutilizable del escritor y se escribe sin copiarlo
+            with writer.encoded(processed, settings) as data:
+                if cache is not None:
+                    cache.put_bytes(keys[target_size], bytes(data))
+                write_outputs(target_size, data)
+    return outputs
+
+
+def convert_bytes(data, target_size, settings=None, fill=DEFAULT_FILL):
+    """Convertir una imagen recibida en memoria a un tamaño y devolver los bytes codificados"""
+    settings = settings or encoder_settings()
+    image, _ = open_for_targets(io.BytesIO(data), [target_size], fill=fill)
+    with image:
+        processed = letterbox(image, target_size, fill=fill)
+    return timed_encode(processed, settings)
+
+
+def is_image_file(path):
+    """Comprobar si la ruta tiene una extensión de imagen soportada"""
+    return os.path.splitext(str(path))[1].lower() in IMAGE_EXTENSIONS
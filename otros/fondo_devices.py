@@ -0,0 +1,139 @@
+"""
+Registro de perfiles de dispositivo (nombre, marca, resolución, PPI)
+Los perfiles se leen de fondo_devices.json (o del JSON/TOML de FONDO_DEVICES) y
+quedan en un registro inmutable con búsquedas O(1) por nombre, nombre corto,
+resolución y marca, y agrupados por tamaño único para no renderizar dos veces
+las mismas dimensiones.
+
+Formato del archivo:
+    default   nombre del dispositivo elegido al abrir la aplicación
+    series    marca -> descripción de la serie
+    devices   lista de {name, brand, width, height[, ppi][, series]}
+"""
+
+import json
+import os
+from collections import namedtuple
+from types import MappingProxyType
+
+# Archivo de perfiles incluido con la aplicación
+DEVICES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fondo_devices.json')
+
+
+def device_short_name(device_name):
+    """Obtener nombre corto del dispositivo para nombres de archivo"""
+    return device_name.split('/')[0].strip().replace(' ', '-')
+
+
+class DeviceProfile(namedtuple('DeviceProfile', 'name short brand series width height ppi')):
+    """Perfil inmutable de un dispositivo (ppi es None si no se conoce)"""
+    __slots__ = ()
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+
+class DeviceRegistry:
+    """Perfiles indexados por nombre, nombre corto, resolución y marca (sólo lectura)"""
+
+    def __init__(self, profiles, default=None):
+        self.profiles = tuple(profiles)
+        if not self.profiles:
+            raise ValueError("El registro de dispositivos está vacío")
+        by_name, by_key, by_size, by_brand = {}, {}, {}, {}
+        for profile in self.profiles:
+            if profile.name in by_name:
+                raise ValueError(f"Dispositivo repetido: {profile.name}")
+            by_name[profile.name] = profile
+            by_key.setdefault(profile.short.lower(), profile)
+            by_key.setdefault(f"{profile.width}x{profile.height}", profile)
+            by_size.setdefault(profile.size, []).append(profile)
+            by_brand.setdefault(profile.brand.lower(), []).append(profile)
+
+        self._by_name = by_name
+        self._by_key = by_key
+        self._by_size = {size: tuple(profiles) for size, profiles in by_size.items()}
+        self._by_brand = {brand: tuple(profiles) for brand, profiles in by_brand.items()}
+        # Vista nombre -> (ancho, alto), compatible con el antiguo PHONE_RESOLUTIONS
+        self.resolutions = MappingProxyType({profile.name: profile.size for profile in self.profiles})
+        self.default = default or self.profiles[0].name
+        if self.default not in by_name:
+            raise ValueError(f"Dispositivo por defecto desconocido: {self.default}")
+
+    def __len__(self):
+        return len(self.profiles)
+
+    def __iter__(self):
+        return iter(self.profiles)
+
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    def get(self, name, default=None):
+        return self._by_name.get(name, default)
+
+    def find(self, key):
+        """Buscar por nombre completo, nombre corto o 'ANCHOxALTO' (None si no existe)"""
+        return self._by_name.get(key) or self._by_key.get(key.strip().lower())
+
+    def with_size(self, size):
+        """Perfiles que comparten una resolución"""
+        return self._by_size.get(tuple(size), ())
+
+    def by_brand(self, brand):
+        """Perfiles de una marca (sin distinguir mayúsculas)"""
+        return self._by_brand.get(brand.lower(), ())
+
+    @property
+    def brands(self):
+        return tuple(profiles[0].brand for profiles in self._by_brand.values())
+
+    @property
+    def sizes(self):
+        """Resoluciones únicas, en el orden del registro"""
+        return tuple(self._by_size)
+
+    def group_by_size(self, names=None):
+        """Agrupar nombres de dispositivo por resolución única (todos si names es None)"""
+        if names is None:
+            return {size: [profile.name for profile in profiles] for size, profiles in self._by_size.items()}
+        groups = {}
+        for name in names:
+            groups.setdefault(self._by_name[name].size, []).append(name)
+        return groups
+
+
+def _read_data(path):
+    """Leer un archivo de perfiles JSON o TOML"""
+    if str(path).lower().endswith('.toml'):
+        import tomllib
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_registry(path=None):
+    """Cargar el registro desde un archivo (por defecto FONDO_DEVICES o fondo_devices.json)"""
+    path = path or os.environ.get('FONDO_DEVICES') or DEVICES_FILE
+    data = _read_data(path)
+    series = data.get('series', {})
+    profiles = []
+    for entry in data['devices']:
+        try:
+            name, brand = entry['name'], entry['brand']
+            width, height = int(entry['width']), int(entry['height'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Perfil inválido en {path}: {entry!r}") from e
+        profiles.append(DeviceProfile(name, device_short_name(name), brand,
+                                      entry.get('series') or series.get(brand, brand), width, height,
+                                      entry.get('ppi')))
+    return DeviceRegistry(profiles, data.get('default'))
+
+
+# Registro usado por toda la aplicación
+REGISTRY = load_registry()
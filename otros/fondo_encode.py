@@ -0,0 +1,218 @@
+"""
+Codificadores de salida con presets de tamaño/velocidad
+JPEG y PNG siempre; WebP, AVIF y HEIF cuando Pillow o sus plugins los soportan
+Pillow se importa al consultar los plugins: la interfaz lee PRESETS y FORMATS sin cargarlo.
+"""
+
+import io
+
+# Formato -> (nombre de Pillow, extensión)
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+    'webp': ('WEBP', '.webp'),
+    'avif': ('AVIF', '.avif'),
+    'heif': ('HEIF', '.heic'),
+}
+
+# Extensión -> formato
+EXTENSIONS = {
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.png': 'png',
+    '.webp': 'webp',
+    '.avif': 'avif',
+    '.heic': 'heif',
+    '.heif': 'heif',
+}
+
+# Presets por formato. 'quality' reproduce el guardado original (JPEG 95 + optimize)
+PRESETS = {
+    'fast': {
+        'jpeg': {'quality': 85, 'optimize': False, 'progressive': False, 'subsampling': '4:2:0'},
+        'png': {'compress_level': 1},
+        'webp': {'quality': 80, 'method': 0},
+        'avif': {'quality': 70, 'speed': 10},
+        'heif': {'quality': 75},
+    },
+    'balanced': {
+        'jpeg': {'quality': 90, 'optimize': True, 'progressive': False, 'subsampling': '4:2:0'},
+        'png': {'compress_level': 6},
+        'webp': {'quality': 85, 'method': 4},
+        'avif': {'quality': 70, 'speed': 9},
+        'heif': {'quality': 80},
+    },
+    'smallest': {
+        'jpeg': {'quality': 82, 'optimize': True, 'progressive': True, 'subsampling': '4:2:0'},
+        'png': {'optimize': True},
+        'webp': {'quality': 80, 'method': 6},
+        'avif': {'quality': 55, 'speed': 6},
+        'heif': {'quality': 65},
+    },
+    'quality': {
+        'jpeg': {'quality': 95, 'optimize': True},
+        'png': {'optimize': True},
+        'webp': {'quality': 95, 'method': 4},
+        'avif': {'quality': 90, 'speed': 8},
+        'heif': {'quality': 92},
+    },
+}
+
+# Preset por defecto: mantiene la salida de siempre
+DEFAULT_PRESET = 'quality'
+
+# Formatos con parámetro quality (aptos para buscar un tamaño objetivo)
+LOSSY_FORMATS = ('jpeg', 'webp', 'avif', 'heif')
+
+_heif_checked = False
+
+
+def _register_heif():
+    """Registrar pillow-heif si está instalado (dependencia opcional)"""
+    global _heif_checked
+    from PIL import Image
+    if not _heif_checked:
+        _heif_checked = True
+        try:
+            from pillow_heif import register_heif_opener
+            register_heif_opener()
+        except ImportError:
+            pass
+    return '.heic' in Image.registered_extensions()
+
+
+def is_available(fmt):
+    """Comprobar si el formato se puede codificar en esta instalación"""
+    if fmt in ('jpeg', 'png'):
+        return True
+    from PIL import features
+    if fmt == 'webp':
+        return features.check('webp')
+    if fmt == 'avif':
+        try:
+            if features.check('avif'):
+                return True
+        except ValueError:
+            # Pillow < 11.2 no conoce AVIF: probar el plugin pillow-avif-plugin
+            pass
+        try:
+            import pillow_avif  # noqa: F401 (registra el formato al importarse)
+            return True
+        except ImportError:
+            return False
+    if fmt == 'heif':
+        return _register_heif()
+    return False
+
+
+def available_formats():
+    """Formatos soportados en esta instalación"""
+    return [fmt for fmt in FORMATS if is_available(fmt)]
+
+
+def format_for_path(file_path):
+    """Formato según la extensión del archivo (JPEG si no se reconoce)"""
+    suffix = str(file_path).lower()
+    for extension, fmt in EXTENSIONS.items():
+        if suffix.endswith(extension):
+            return fmt
+    return 'jpeg'
+
+
+def encoder_settings(fmt='jpeg', preset=DEFAULT_PRESET, progressive=None, subsampling=None,
+                     target_bytes=None):
+    """Ajustes completos de codificación (con la clave 'format') para un formato y preset
+
+    progressive y subsampling ('4:4:4', '4:2:2', '4:2:0') sólo aplican a JPEG
+    y reemplazan lo que indique el preset. target_bytes pide buscar la mayor
+    calidad que no supere ese tamaño (formatos con pérdida).
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato desconocido: {fmt}")
+    if preset not in PRESETS:
+        raise ValueError(f"Preset desconocido: {preset}")
+
+    settings = {'format': FORMATS[fmt][0]}
+    settings.update(PRESETS[preset][fmt])
+    if fmt == 'jpeg':
+        if progressive is not None:
+            settings['progressive'] = progressive
+        if subsampling is not None:
+            settings['subsampling'] = subsampling
+    if target_bytes:
+        settings['target_bytes'] = int(target_bytes)
+    return settings
+
+
+def settings_for_path(file_path, preset=DEFAULT_PRESET):
+    """Ajustes de codificación para guardar en una ruta con su extensión"""
+    return encoder_settings(format_for_path(file_path), preset)
+
+
+def format_of(settings):
+    """Formato (clave de FORMATS) que corresponde a unos ajustes"""
+    for fmt, (name, _) in FORMATS.items():
+        if name == settings['format']:
+            return fmt
+    raise ValueError(f"Formato desconocido: {settings['format']}")
+
+
+def extension_for(settings):
+    """Extensión de archivo que corresponde a unos ajustes"""
+    return FORMATS[format_of(settings)][1]
+
+
+def encode(image, settings):
+    """Codificar una imagen en memoria con los ajustes indicados"""
+    params = dict(settings)
+    target_bytes = params.pop('target_bytes', None)
+    if target_bytes:
+        return encode_to_size(image, params, target_bytes)
+
+    buffer = io.BytesIO()
+    encode_into(image, params, buffer)
+    return buffer.getvalue()
+
+
+def encode_into(image, settings, buffer):
+    """Codificar en un búfer ya abierto (p. ej. uno reutilizado) y devolver los bytes escritos
+
+    No admite target_bytes: la búsqueda por tamaño necesita codificar varias veces.
+    """
+    params = dict(settings)
+    params.pop('target_bytes', None)
+    pillow_format = params.pop('format')
+    fmt = format_of(settings)
+    if not is_available(fmt):
+        raise ValueError(f"El formato {fmt} no está disponible (falta el plugin de Pillow)")
+    if pillow_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+
+    start = buffer.tell()
+    image.save(buffer, pillow_format, **params)
+    return buffer.tell() - start
+
+
+def encode_to_size(image, settings, max_bytes, min_quality=30):
+    """Buscar por bisección la mayor calidad cuyo resultado no supere max_bytes
+
+    Si ni la calidad mínima entra, devuelve ese resultado (el más pequeño posible).
+    Los formatos sin pérdida se codifican tal cual.
+    """
+    if format_of(settings) not in LOSSY_FORMATS:
+        return encode(image, settings)
+
+    low, high = min_quality, settings['quality']
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode(image, dict(settings, quality=quality))
+        if len(data) <= max_bytes:
+            best = data
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        best = encode(image, dict(settings, quality=min_quality))
+    return best
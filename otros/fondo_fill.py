@@ -0,0 +1,235 @@
+"""
+Rellenos del fondo para el modo con barras (imagen completa dentro del objetivo)
+Los cálculos se hacen con NumPy sobre muestras pequeñas y franjas, nunca píxel a píxel.
+np.asarray copia el búfer de Pillow, así que nunca se convierte la imagen entera:
+los colores salen de una rejilla de muestras y el desenfoque de una miniatura.
+NumPy se importa al primer relleno que lo necesita: 'cover' (el de siempre) no lo carga.
+Pillow también se importa al usarse: la interfaz lee FILLS sin cargarlo.
+
+    cover     recortar para cubrir la pantalla, sin barras (comportamiento original)
+    black     imagen completa con barras negras
+    average   barras del color promedio de la imagen
+    dominant  barras del color más frecuente de la imagen
+    blur      barras con la propia imagen estirada, desenfocada y oscurecida
+    mirror    barras con el reflejo de los bordes de la imagen
+"""
+
+# Relleno -> descripción para la interfaz
+FILLS = {
+    'cover': 'Recortar (sin barras)',
+    'black': 'Barras negras',
+    'average': 'Color promedio',
+    'dominant': 'Color dominante',
+    'blur': 'Desenfoque',
+    'mirror': 'Espejo',
+}
+
+# Relleno por defecto: mantiene la salida de siempre
+DEFAULT_FILL = 'cover'
+
+# Lado mayor de la rejilla de muestras usada para calcular colores
+COLOR_SAMPLE = 128
+
+# Reducción del fondo desenfocado respecto del objetivo y pasadas de caja (3 ~ gaussiano)
+BLUR_SCALE = 24
+BLUR_RADIUS = 2
+BLUR_PASSES = 3
+
+# Oscurecer el fondo desenfocado para que la imagen destaque
+BLUR_DIM = 0.6
+
+# Las barras desenfocadas se interpolan a 1/4 y se amplían por vecino más cercano:
+# el fondo es tan suave que los bloques de 4 px no se distinguen y cuesta la mitad
+BLUR_NEAREST = 4
+
+
+def check_fill(fill):
+    """Validar el nombre de un relleno"""
+    if fill not in FILLS:
+        raise ValueError(f"Relleno desconocido: {fill} (usa {', '.join(FILLS)})")
+    return fill
+
+
+def _rgb_array(image):
+    """Vista NumPy (alto, ancho, 3) de una imagen pequeña en RGB"""
+    import numpy as np
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return np.asarray(image)
+
+
+def _sample(image, longest=COLOR_SAMPLE, box=None):
+    """Rejilla regular de píxeles (vecino más cercano): sólo lee los píxeles muestreados"""
+    from PIL import Image
+    left, top, right, bottom = box or (0, 0, image.width, image.height)
+    scale = min(1.0, longest / max(right - left, bottom - top))
+    size = (max(1, round((right - left) * scale)), max(1, round((bottom - top) * scale)))
+    return image.resize(size, Image.Resampling.NEAREST, box=box)
+
+
+def average_color(image):
+    """Color promedio de la imagen"""
+    return _average(_rgb_array(_sample(image)).reshape(-1, 3))
+
+
+def dominant_color(image):
+    """Color más frecuente: histograma de 4 bits por canal y promedio de la celda ganadora"""
+    return _dominant(_rgb_array(_sample(image)).reshape(-1, 3))
+
+
+def matte_color(image, fill):
+    """Color sobre el que aplanar una imagen con transparencia (image en RGBA)
+
+    Con 'average' y 'dominant' es el color de las barras calculado sólo sobre
+    los píxeles visibles, así lo transparente se funde con ellas; con el resto
+    de rellenos, negro como el canvas.
+    """
+    if fill not in ('average', 'dominant'):
+        return (0, 0, 0)
+    import numpy as np
+    pixels = np.asarray(_sample(image)).reshape(-1, 4)
+    visible = pixels[pixels[:, 3] >= 128, :3]
+    if not len(visible):
+        return (0, 0, 0)
+    return _average(visible) if fill == 'average' else _dominant(visible)
+
+
+def _average(pixels):
+    """Promedio de una lista (N, 3) de píxeles RGB"""
+    return tuple(int(value) for value in pixels.mean(axis=0).round())
+
+
+def _dominant(pixels):
+    """Celda más poblada de un histograma de 4 bits por canal sobre (N, 3) píxeles RGB"""
+    import numpy as np
+    quantized = pixels >> 4
+    cells = (quantized[:, 0].astype(np.int32) << 8) | (quantized[:, 1].astype(np.int32) << 4) | quantized[:, 2]
+    winner = np.bincount(cells, minlength=4096).argmax()
+    return tuple(int(value) for value in pixels[cells == winner].mean(axis=0).round())
+
+
+def box_blur(array, radius=BLUR_RADIUS, passes=BLUR_PASSES):
+    """Desenfoque de caja separable con sumas acumuladas (float32, bordes replicados)"""
+    import numpy as np
+    result = array.astype(np.float32)
+    window = 2 * radius + 1
+    for _ in range(passes):
+        for axis in (0, 1):
+            pad = [(0, 0)] * result.ndim
+            pad[axis] = (radius + 1, radius)
+            summed = np.cumsum(np.pad(result, pad, mode='edge'), axis=axis)
+            upper = np.take(summed, np.arange(window, summed.shape[axis]), axis=axis)
+            lower = np.take(summed, np.arange(0, summed.shape[axis] - window), axis=axis)
+            result = (upper - lower) / window
+    return result
+
+
+def cover_box(source_size, target_size):
+    """Zona del origen que se ve al cubrir el objetivo recortando (en coordenadas del origen)"""
+    source_width, source_height = source_size
+    target_aspect = target_size[0] / target_size[1]
+    if source_width / source_height > target_aspect:
+        width = source_height * target_aspect
+        left = (source_width - width) / 2
+        return left, 0, left + width, source_height
+    height = source_width / target_aspect
+    top = (source_height - height) / 2
+    return 0, top, source_width, top + height
+
+
+def bar_boxes(target_size, box):
+    """Zonas del canvas que quedan fuera de la imagen (arriba, abajo, izquierda, derecha)"""
+    width, height = target_size
+    left, top, right, bottom = box
+    bars = [(0, 0, width, top), (0, bottom, width, height), (0, top, left, bottom), (right, top, width, bottom)]
+    return [bar for bar in bars if bar[2] > bar[0] and bar[3] > bar[1]]
+
+
+def blurred_background(image, target_size, box):
+    """Barras con la imagen estirada a pantalla completa, desenfocada y oscurecida
+
+    Se desenfoca una versión diminuta y sólo se amplían las zonas de las
+    barras; bajo la imagen el canvas queda negro porque se tapa al pegar.
+    """
+    import numpy as np
+    from PIL import Image
+    small_size = (max(1, target_size[0] // BLUR_SCALE), max(1, target_size[1] // BLUR_SCALE))
+    # 4x4 muestras por píxel de la miniatura promediadas: suficiente antes de desenfocar
+    grid = image.resize((small_size[0] * 4, small_size[1] * 4), Image.Resampling.NEAREST,
+                        box=cover_box(image.size, target_size))
+    blurred = box_blur(_rgb_array(grid.reduce(4))) * BLUR_DIM
+    background = Image.fromarray(blurred.round().astype(np.uint8), 'RGB')
+
+    canvas = Image.new('RGB', target_size, (0, 0, 0))
+    scale_x, scale_y = small_size[0] / target_size[0], small_size[1] / target_size[1]
+    for bar in bar_boxes(target_size, box):
+        bar_size = (bar[2] - bar[0], bar[3] - bar[1])
+        source_box = (bar[0] * scale_x, bar[1] * scale_y, bar[2] * scale_x, bar[3] * scale_y)
+        coarse_size = (max(1, -(-bar_size[0] // BLUR_NEAREST)), max(1, -(-bar_size[1] // BLUR_NEAREST)))
+        coarse = background.resize(coarse_size, Image.Resampling.BILINEAR, box=source_box)
+        canvas.paste(coarse.resize(bar_size, Image.Resampling.NEAREST), bar[:2])
+    return canvas
+
+
+def new_canvas(image, target_size, fill, box=None):
+    """Canvas de fondo del tamaño objetivo para un relleno (la imagen se pega después)
+
+    box es la zona donde irá la imagen; el desenfoque sólo genera las barras.
+    """
+    from PIL import Image
+    if fill in ('cover', 'black', 'mirror'):
+        # mirror refleja los bordes sobre el canvas ya compuesto (ver mirror_bars)
+        return Image.new('RGB', target_size, (0, 0, 0))
+    if fill == 'average':
+        return Image.new('RGB', target_size, average_color(image))
+    if fill == 'dominant':
+        return Image.new('RGB', target_size, dominant_color(image))
+    if fill == 'blur':
+        return blurred_background(image, target_size, box or (0, 0, 0, 0))
+    raise ValueError(f"Relleno desconocido: {fill}")
+
+
+def mirror_bars(canvas, box):
+    """Rellenar las barras reflejando la imagen contigua (in situ sobre canvas)
+
+    box es la zona (izquierda, arriba, derecha, abajo) donde está la imagen.
+    Si la barra no supera a la imagen sólo se lee la franja a reflejar; si la
+    supera, el reflejo se repite alternado como np.pad(mode='symmetric').
+    """
+    import numpy as np
+    from PIL import Image
+    left, top, right, bottom = box
+    width, height = canvas.size
+    region = None
+    # (zona de la barra, eje, la barra va antes de la imagen)
+    bars = [
+        ((left, 0, right, top), 0, True),
+        ((left, bottom, right, height), 0, False),
+        ((0, top, left, bottom), 1, True),
+        ((right, top, width, bottom), 1, False),
+    ]
+    for bar, axis, before in bars:
+        extent = bar[3] - bar[1] if axis == 0 else bar[2] - bar[0]
+        if extent <= 0 or bar[2] <= bar[0] or bar[3] <= bar[1]:
+            continue
+        image_extent = bottom - top if axis == 0 else right - left
+
+        if extent <= image_extent:
+            # Franja contigua a la barra, del mismo grosor, dada vuelta (sin pasar por NumPy)
+            if axis == 0:
+                band = (left, top, right, top + extent) if before else (left, bottom - extent, right, bottom)
+                flip = Image.Transpose.FLIP_TOP_BOTTOM
+            else:
+                band = (left, top, left + extent, bottom) if before else (right - extent, top, right, bottom)
+                flip = Image.Transpose.FLIP_LEFT_RIGHT
+            canvas.paste(canvas.crop(band).transpose(flip), bar[:2])
+        else:
+            if region is None:
+                region = np.asarray(canvas.crop(box))
+            pad = [(0, 0), (0, 0), (0, 0)]
+            pad[axis] = (extent, 0) if before else (0, extent)
+            padded = np.pad(region, pad, mode='symmetric')
+            index = slice(0, extent) if before else slice(-extent, None)
+            piece = padded[index] if axis == 0 else padded[:, index]
+            canvas.paste(Image.fromarray(np.ascontiguousarray(piece), 'RGB'), bar[:2])
+    return canvas
@@ -0,0 +1,769 @@
+"""
+Interfaz gráfica del convertidor (Tk)
+Sólo se importa al abrir la ventana: la conversión vive en fondo_core y no necesita Tk.
+Pillow, fondo_core y las cachés se cargan con la primera imagen (ver load_core),
+así la ventana aparece sin esperarlos.
+"""
+
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+import os
+
+from fondo_devices import REGISTRY, device_short_name
+from fondo_encode import FORMATS, PRESETS, DEFAULT_PRESET, available_formats
+from fondo_fill import FILLS, DEFAULT_FILL
+from fondo_metrics import logger
+
+# Intervalo de sondeo de trabajos en segundo plano (~1 cuadro a 60 Hz)
+JOB_POLL_MS = 16
+
+class JobCancelled(Exception):
+    """Trabajo reemplazado por uno más reciente antes de terminar"""
+
+class iPhoneWallpaperConverter:
+    def __init__(self):
+        # Diccionario con resoluciones comunes de celulares
+        self.PHONE_RESOLUTIONS = dict(REGISTRY.resolutions)
+        
+        # Configuración inicial (iPhone 13 Pro Max por defecto)
+        self.current_resolution_name = REGISTRY.default
+        self.TARGET_WIDTH, self.TARGET_HEIGHT = self.PHONE_RESOLUTIONS[self.current_resolution_name]
+        self.TARGET_SIZE = (self.TARGET_WIDTH, self.TARGET_HEIGHT)
+        
+        # Variables
+        self.original_image = None
+        self.processed_image = None
+        self.preview_image = None
+        self.source_levels = None  # Pirámide reducida del original, compartida entre dispositivos
+        self.source_hash = None
+        self.source_size = None
+        self.preview_source = None  # Origen reducido para vistas previas instantáneas
+        self.last_saved_path = None  # Último guardado rápido (lo abre el botón de carpeta)
+        
+        # Caché de resultados renderizados y codificados (memoria + disco) y orígenes ya
+        # decodificados de sesiones anteriores (FONDO_SOURCE_CACHE_MB=0 la desactiva);
+        # se crean con la primera imagen (load_core)
+        self.cache = None
+        self.source_cache = None
+        
+        # Trabajos en segundo plano: un solo hilo mantiene el orden de carga/proceso/guardado
+        # (se crea con el primer trabajo)
+        self.executor = None
+        self.job_counter = 0
+        self.slot_jobs = {}  # slot -> (id, future) del último trabajo reemplazable
+        self.active_jobs = set()
+        
+        # Planificador de trabajos de varias imágenes (fondo_jobs), creado al primer uso
+        self.job_scheduler = None
+        self.many_job = None
+        
+        # Crear interfaz
+        self.setup_gui()
+        
+    def setup_gui(self):
+        """Configurar la interfaz gráfica"""
+        self.root = tk.Tk()
+        self.root.title("📱 Convertidor Universal de Fondos de Pantalla")
+        self.root.geometry("900x1000")
+        self.root.configure(bg='#1a1a1a')
+        
+        # Estilo
+        style = ttk.Style()
+        style.theme_use('clam')
+        style.configure('Title.TLabel', font=('Arial', 18, 'bold'), background='#1a1a1a', foreground='white')
+        style.configure('Info.TLabel', font=('Arial', 10), background='#1a1a1a', foreground='#cccccc')
+        style.configure('Custom.TButton', font=('Arial', 11, 'bold'))
+        
+        # Título principal
+        title_frame = tk.Frame(self.root, bg='#1a1a1a')
+        title_frame.pack(pady=20)
+        
+        title_label = ttk.Label(title_frame, text="📱 Convertidor Universal de Fondos de Pantalla", 
+                               style='Title.TLabel')
+        title_label.pack()
+        
+        subtitle_label = ttk.Label(title_frame, text="Compatible con iPhone, Samsung, Google Pixel, OnePlus y más", 
+                                  font=('Arial', 10), background='#1a1a1a', foreground='#4ECDC4')
+        subtitle_label.pack(pady=5)
+        
+        # Selector de resolución
+        resolution_frame = tk.Frame(self.root, bg='#2d2d2d', relief='ridge', bd=2)
+        resolution_frame.pack(pady=15, padx=20, fill='x')
+        
+        resolution_title = ttk.Label(resolution_frame, text="📐 Seleccionar Dispositivo y Resolución", 
+                                    font=('Arial', 12, 'bold'), background='#2d2d2d', foreground='#FF6B6B')
+        resolution_title.pack(pady=10)
+        
+        # Dropdown para seleccionar resolución
+        self.resolution_var = tk.StringVar(value=self.current_resolution_name)
+        self.resolution_dropdown = ttk.Combobox(resolution_frame, textvariable=self.resolution_var,
+                                               values=list(self.PHONE_RESOLUTIONS.keys()),
+                                               state='readonly', width=60, font=('Arial', 9))
+        self.resolution_dropdown.pack(pady=5)
+        self.resolution_dropdown.bind('<<ComboboxSelected>>', self.on_resolution_change)
+        
+        # Preset de codificación al guardar
+        preset_row = tk.Frame(resolution_frame, bg='#2d2d2d')
+        preset_row.pack(pady=5)
+        ttk.Label(preset_row, text="💾 Calidad de guardado:", font=('Arial', 9),
+                  background='#2d2d2d', foreground='#cccccc').pack(side='left', padx=5)
+        self.preset_var = tk.StringVar(value=DEFAULT_PRESET)
+        self.preset_dropdown = ttk.Combobox(preset_row, textvariable=self.preset_var,
+                                           values=list(PRESETS), state='readonly', width=12,
+                                           font=('Arial', 9))
+        self.preset_dropdown.pack(side='left')
+        
+        # Relleno de las barras (cover = recortar sin barras, como siempre)
+        ttk.Label(preset_row, text="🖼 Relleno:", font=('Arial', 9),
+                  background='#2d2d2d', foreground='#cccccc').pack(side='left', padx=5)
+        self.fill_var = tk.StringVar(value=DEFAULT_FILL)
+        self.fill_dropdown = ttk.Combobox(preset_row, textvariable=self.fill_var,
+                                         values=list(FILLS), state='readonly', width=10,
+                                         font=('Arial', 9))
+        self.fill_dropdown.pack(side='left')
+        self.fill_dropdown.bind('<<ComboboxSelected>>', self.on_fill_change)
+        
+        # Información técnica actualizable
+        info_frame = tk.Frame(self.root, bg='#2d2d2d', relief='ridge', bd=2)
+        info_frame.pack(pady=10, padx=20, fill='x')
+        
+        self.info_title = ttk.Label(info_frame, text="📱 Especificaciones del Dispositivo Seleccionado", 
+                              font=('Arial', 12, 'bold'), background='#2d2d2d', foreground='#4ECDC4')
+        self.info_title.pack(pady=5)
+        
+        self.specs_label = ttk.Label(info_frame, text="", 
+                                    font=('Arial', 9), background='#2d2d2d', foreground='white',
+                                    justify='center')
+        self.specs_label.pack(pady=5)
+        
+        # Actualizar información inicial
+        self.update_specs_info()
+        
+        # Botones principales
+        button_frame = tk.Frame(self.root, bg='#1a1a1a')
+        button_frame.pack(pady=20)
+        
+        self.select_btn = tk.Button(button_frame, text="📁 Seleccionar Imagen", 
+                                   command=self.select_image,
+                                   bg='#4ECDC4', fg='white', font=('Arial', 12, 'bold'),
+                                   padx=20, pady=10, relief='flat', cursor='hand2')
+        self.select_btn.pack(side='left', padx=10)
+        
+        self.process_btn = tk.Button(button_frame, text="🔄 Procesar Imagen", 
+                                    command=self.process_image,
+                                    bg='#FF6B6B', fg='white', font=('Arial', 12, 'bold'),
+                                    padx=20, pady=10, relief='flat', cursor='hand2',
+                                    state='disabled')
+        self.process_btn.pack(side='left', padx=10)
+        
+        self.save_btn = tk.Button(button_frame, text="💾 Guardar Fondo", 
+                                 command=self.save_image,
+                                 bg='#4CAF50', fg='white', font=('Arial', 12, 'bold'),
+                                 padx=20, pady=10, relief='flat', cursor='hand2',
+                                 state='disabled')
+        self.save_btn.pack(side='left', padx=5)
+        
+        self.auto_save_btn = tk.Button(button_frame, text="⚡ Guardar Rápido", 
+                                      command=self.auto_save_image,
+                                      bg='#9C27B0', fg='white', font=('Arial', 12, 'bold'),
+                                      padx=20, pady=10, relief='flat', cursor='hand2',
+                                      state='disabled')
+        self.auto_save_btn.pack(side='left', padx=5)
+        
+        self.export_all_btn = tk.Button(button_frame, text="🗂 Exportar Todos", 
+                                       command=self.export_all_devices,
+                                       bg='#FF9800', fg='white', font=('Arial', 12, 'bold'),
+                                       padx=20, pady=10, relief='flat', cursor='hand2',
+                                       state='disabled')
+        self.export_all_btn.pack(side='left', padx=5)
+        
+        self.export_many_btn = tk.Button(button_frame, text="📚 Varias Imágenes", 
+                                        command=self.export_many_images,
+                                        bg='#607D8B', fg='white', font=('Arial', 12, 'bold'),
+                                        padx=20, pady=10, relief='flat', cursor='hand2')
+        self.export_many_btn.pack(side='left', padx=5)
+        
+        self.open_folder_btn = tk.Button(button_frame, text="📂 Abrir Carpeta", 
+                                        command=self.open_last_saved,
+                                        bg='#795548', fg='white', font=('Arial', 12, 'bold'),
+                                        padx=20, pady=10, relief='flat', cursor='hand2',
+                                        state='disabled')
+        self.open_folder_btn.pack(side='left', padx=5)
+        
+        # Marco para vista previa
+        preview_frame = tk.Frame(self.root, bg='#1a1a1a')
+        preview_frame.pack(pady=20, expand=True, fill='both')
+        
+        # Etiqueta de vista previa
+        self.preview_label = ttk.Label(preview_frame, text="Vista previa aparecerá aquí", 
+                                      style='Info.TLabel')
+        self.preview_label.pack(pady=10)
+        
+        # Canvas para la imagen
+        self.canvas = tk.Canvas(preview_frame, width=250, height=540, 
+                               bg='#000000', relief='ridge', bd=3)
+        self.canvas.pack()
+        
+        # Información de estado
+        self.status_label = ttk.Label(self.root, text="💡 Selecciona una imagen para comenzar", 
+                                     style='Info.TLabel')
+        self.status_label.pack(pady=10)
+        
+        # Indicador de progreso (visible sólo mientras hay trabajos en curso)
+        self.progress = ttk.Progressbar(self.root, mode='indeterminate', length=300)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Información adicional
+        help_frame = tk.Frame(self.root, bg='#2d2d2d', relief='ridge', bd=1)
+        help_frame.pack(pady=10, padx=20, fill='x')
+        
+        help_text = ("ℹ️ Tu imagen se ajustará automáticamente manteniendo las proporciones originales.\n"
+                    "Con 'cover' llena la pantalla recortando los bordes; con otro relleno se ve entera y las\n"
+                    "barras se rellenan en negro, color promedio o dominante, desenfoque o espejo.\n"
+                    "Selecciona tu dispositivo arriba para obtener la resolución perfecta.")
+        help_label = ttk.Label(help_frame, text=help_text, 
+                              font=('Arial', 9), background='#2d2d2d', foreground='#cccccc',
+                              justify='center')
+        help_label.pack(pady=10)
+    
+    def on_resolution_change(self, event=None):
+        """Cambiar resolución cuando se selecciona un dispositivo diferente"""
+        selected_device = self.resolution_var.get()
+        if selected_device in self.PHONE_RESOLUTIONS:
+            self.current_resolution_name = selected_device
+            self.TARGET_WIDTH, self.TARGET_HEIGHT = self.PHONE_RESOLUTIONS[selected_device]
+            self.TARGET_SIZE = (self.TARGET_WIDTH, self.TARGET_HEIGHT)
+            
+            # Actualizar información
+            self.update_specs_info()
+            
+            # Si hay una imagen procesada, reprocesarla con la nueva resolución
+            if self.original_image and self.processed_image:
+                self.process_image()
+            
+            self.status_label.config(text=f"📱 Dispositivo cambiado: {selected_device.split('/')[0].strip()}")
+    
+    def on_fill_change(self, event=None):
+        """Volver a procesar la imagen con el relleno elegido"""
+        if self.original_image and self.processed_image:
+            self.process_image()
+        self.status_label.config(text=f"🖼 Relleno: {FILLS[self.fill_var.get()]}")
+    
+    def update_specs_info(self):
+        """Actualizar la información de especificaciones"""
+        # Calcular proporción
+        aspect_ratio = round(self.TARGET_WIDTH / self.TARGET_HEIGHT, 3)
+        simplified_ratio = self.get_simplified_ratio()
+        
+        # Calcular PPI aproximado (estimado)
+        ppi = self.estimate_ppi()
+        
+        # Obtener información adicional
+        device_info = self.get_device_info()
+        
+        specs_text = (
+            f"Resolución: {self.TARGET_WIDTH} x {self.TARGET_HEIGHT} píxeles\n"
+            f"Proporción: {simplified_ratio} ({aspect_ratio})\n"
+            f"PPI Estimado: ~{ppi}\n"
+            f"Dispositivos: {device_info}"
+        )
+        
+        self.specs_label.config(text=specs_text)
+    
+    def get_simplified_ratio(self):
+        """Calcular proporción simplificada"""
+        from math import gcd
+        common_divisor = gcd(self.TARGET_WIDTH, self.TARGET_HEIGHT)
+        simplified_w = self.TARGET_WIDTH // common_divisor
+        simplified_h = self.TARGET_HEIGHT // common_divisor
+        return f"{simplified_w}:{simplified_h}"
+    
+    def estimate_ppi(self):
+        """Estimar PPI basado en resolución común"""
+        # PPI del perfil; si no se conoce, el de otro dispositivo con la misma resolución
+        profile = REGISTRY[self.current_resolution_name]
+        if profile.ppi:
+            return profile.ppi
+        known = [other.ppi for other in REGISTRY.with_size(profile.size) if other.ppi]
+        return known[0] if known else "N/A"
+    
+    def get_device_info(self):
+        """Obtener información de dispositivos para la resolución actual"""
+        return f"📱 {REGISTRY[self.current_resolution_name].series}"
+    
+    def load_core(self):
+        """Cargar Pillow, fondo_core y las cachés al abrir o convertir la primera imagen"""
+        if self.cache is not None:
+            return
+        from fondo_cache import ResultCache
+        from fondo_core import allow_large_images
+        from fondo_srccache import SourceCache
+        
+        # Las imágenes las elige el usuario desde su disco: admitir fotos muy grandes
+        allow_large_images()
+        self.cache = ResultCache()
+        self.source_cache = SourceCache()
+    
+    def select_image(self):
+        """Seleccionar imagen del archivo"""
+        filetypes = [
+            ("Imágenes", "*.jpg *.jpeg *.png *.bmp *.gif *.tiff *.tif *.webp"),
+            ("JPEG", "*.jpg *.jpeg"),
+            ("PNG", "*.png"),
+            ("Todos los archivos", "*.*")
+        ]
+        
+        file_path = filedialog.askopenfilename(
+            title="Seleccionar imagen",
+            filetypes=filetypes
+        )
+        
+        if not file_path:
+            return
+        
+        self.load_core()
+        from fondo_cache import file_hash
+        from fondo_core import make_preview_source
+        
+        sizes = REGISTRY.sizes
+        fill = self.fill_var.get()
+        
+        def work(is_stale):
+            # Decodificar sólo la escala necesaria para la mayor resolución disponible
+            # (ya derecha según el EXIF y en RGB, con la transparencia aplanada);
+            # si se abrió antes, se mapea desde la caché de orígenes sin decodificar
+            image, original_size = self.source_cache.open(file_path, sizes, fill=fill)
+            return image, original_size, file_hash(file_path), make_preview_source(image, sizes)
+        
+        def done(result):
+            self.original_image, original_size, self.source_hash, self.preview_source = result
+            self.source_size = self.original_image.size
+            self.source_levels = None
+            self.processed_image = None
+            self.status_label.config(text=f"✅ Imagen cargada: {os.path.basename(file_path)}")
+            self.process_btn.config(state='normal')
+            self.export_all_btn.config(state='normal')
+            
+            # Mostrar información de la imagen original
+            width, height = original_size
+            aspect_ratio = round(width / height, 2)
+            self.preview_label.config(text=f"Imagen original: {width}x{height} px (ratio: {aspect_ratio})")
+            
+            # Resetear botones de guardado
+            self.save_btn.config(state='disabled')
+            self.auto_save_btn.config(state='disabled')
+        
+        self.run_in_background(work, done, slot='render',
+                               busy_text=f"⏳ Cargando {os.path.basename(file_path)}...",
+                               error_text="No se pudo cargar la imagen",
+                               error_status="❌ Error al cargar la imagen")
+    
+    def process_image(self):
+        """Procesar la imagen para el dispositivo seleccionado"""
+        if not self.original_image:
+            return
+        from fondo_cache import make_key
+        from fondo_core import DEFAULT_RESAMPLE, build_pyramid, fit_size, letterbox, pick_level, quick_preview
+        
+        # Capturar el estado en el hilo de Tk; el hilo de trabajo no toca la interfaz
+        original = self.original_image
+        levels = self.source_levels
+        target_size = self.TARGET_SIZE
+        device_name = self.current_resolution_name
+        fill = self.fill_var.get()
+        cache_key = make_key(self.source_hash, target_size, DEFAULT_RESAMPLE, fill=fill)
+        all_sizes = REGISTRY.sizes
+        
+        # Vista previa instantánea desde el origen reducido; se refina al terminar
+        cached = self.cache.get_image(cache_key)
+        if cached is None:
+            self.create_preview(quick_preview(self.preview_source, self.source_size, target_size, fill=fill),
+                                target_size, device_name)
+        
+        def work(is_stale):
+            # Reutilizar el resultado si ya se renderizó este origen para este tamaño
+            processed = cached
+            
+            if processed is None:
+                # Construir una sola vez la pirámide para todas las resoluciones
+                source_size = original.size
+                if levels is None:
+                    fits = [fit_size(source_size, size, fill) for size in all_sizes]
+                    work_levels = build_pyramid(original, fits)
+                else:
+                    work_levels = levels
+                
+                if is_stale():
+                    raise JobCancelled()
+                
+                # Ajustar imagen centrada en el canvas desde el nivel más cercano
+                fit = fit_size(source_size, target_size, fill)
+                level = pick_level(work_levels, fit)
+                processed = letterbox(level, target_size, fit=fit, fill=fill)
+                self.cache.put_image(cache_key, processed)
+            else:
+                work_levels = levels
+            
+            if is_stale():
+                raise JobCancelled()
+            
+            return processed, self.make_preview(processed, target_size), work_levels
+        
+        def done(result):
+            processed, preview, levels = result
+            if original is self.original_image:
+                self.source_levels = levels
+            
+            # Se cargó otra imagen mientras tanto: descartar este resultado
+            if original is not self.original_image:
+                return
+            
+            # El dispositivo o el relleno cambiaron durante el proceso: renderizar el actual
+            if target_size != self.TARGET_SIZE or fill != self.fill_var.get():
+                self.process_image()
+                return
+            self.processed_image = processed
+            
+            # Mostrar vista previa
+            self.create_preview(preview, target_size, device_name)
+            
+            self.status_label.config(text="✅ Imagen procesada correctamente")
+            self.save_btn.config(state='normal')
+            self.auto_save_btn.config(state='normal')
+        
+        self.run_in_background(work, done, slot='render',
+                               busy_text=f"⏳ Procesando para {device_name.split('/')[0].strip()}...",
+                               error_text="Error al procesar la imagen",
+                               error_status="❌ Error al procesar la imagen")
+    
+    def make_preview(self, processed, target_size):
+        """Crear la vista previa exacta del resultado (manteniendo proporción)"""
+        from fondo_core import exact_preview
+        return exact_preview(processed, target_size)
+    
+    def create_preview(self, preview, target_size, device_name):
+        """Mostrar la vista previa en el canvas (sólo desde el hilo de Tk)"""
+        # ImageTk se carga con la primera vista previa, no al abrir la ventana
+        from PIL import ImageTk
+        preview_width, preview_height = preview.size
+        self.preview_image = ImageTk.PhotoImage(preview)
+        
+        # Limpiar canvas y mostrar imagen
+        self.canvas.delete("all")
+        self.canvas.config(width=preview_width, height=preview_height)
+        self.canvas.create_image(preview_width//2, preview_height//2, 
+                                image=self.preview_image)
+        
+        self.preview_label.config(text=f"Vista previa: {target_size[0]}x{target_size[1]} px | {device_name.split('/')[0].strip()}")
+    
+    def save_image(self):
+        """Guardar la imagen procesada"""
+        if not self.processed_image:
+            return
+        
+        # Crear directorio de salida si no existe
+        output_dir = self.get_output_directory()
+        output_dir.mkdir(exist_ok=True)
+        
+        # Sugerir nombre de archivo con dispositivo
+        device_short = device_short_name(self.current_resolution_name)
+        default_name = f"fondo-{device_short}-{self.get_timestamp()}.jpg"
+        default_path = output_dir / default_name
+        
+        # Formatos disponibles en esta instalación (WebP/AVIF/HEIF según plugins)
+        filetypes = [(fmt.upper(), f"*{FORMATS[fmt][1]}") for fmt in available_formats()]
+        filetypes.append(("Todos los archivos", "*.*"))
+        
+        # Preguntar al usuario dónde guardar
+        file_path = filedialog.asksaveasfilename(
+            title="Guardar fondo de pantalla",
+            defaultextension=".jpg",
+            initialname=default_name,
+            initialdir=str(output_dir),
+            filetypes=filetypes
+        )
+        
+        if not file_path:
+            return
+        
+        from fondo_core import write_bytes
+        get_bytes = self.encoded_bytes_getter(file_path)
+        target_width, target_height = self.TARGET_SIZE
+        
+        def work(is_stale):
+            # Guardar con alta calidad
+            write_bytes(file_path, get_bytes())
+        
+        def done(result):
+            self.status_label.config(text=f"✅ Guardado: {os.path.basename(file_path)}")
+            
+            # Mostrar mensaje de éxito con ubicación
+            full_path = os.path.abspath(file_path)
+            messagebox.showinfo("Éxito", 
+                f"¡Fondo de pantalla guardado exitosamente!\n\n"
+                f"📁 Ubicación: {full_path}\n"
+                f"📄 Archivo: {os.path.basename(file_path)}\n"
+                f"📐 Resolución: {target_width}x{target_height}\n\n"
+                f"💡 Ahora puedes usar esta imagen como fondo de pantalla en tu iPhone 13 Pro Max.")
+            
+            # Opción para abrir la carpeta
+            if messagebox.askyesno("Abrir carpeta", "¿Quieres abrir la carpeta donde se guardó?"):
+                self.open_file_location(file_path)
+        
+        self.run_in_background(work, done,
+                               busy_text=f"⏳ Guardando {os.path.basename(file_path)}...",
+                               error_text="Error al guardar la imagen",
+                               error_status="❌ Error al guardar la imagen")
+    
+    def encoded_bytes_getter(self, file_path):
+        """Función que devuelve los bytes codificados de la imagen procesada actual
+
+        Captura imagen, tamaño y clave en el hilo de Tk para que el hilo de
+        trabajo codifique exactamente lo que el usuario estaba viendo.
+        """
+        from fondo_cache import make_key
+        from fondo_core import DEFAULT_RESAMPLE, encode_image, encode_settings_for
+        settings = encode_settings_for(file_path, self.preset_var.get())
+        cache_key = make_key(self.source_hash, self.TARGET_SIZE, DEFAULT_RESAMPLE, settings, self.fill_var.get())
+        processed = self.processed_image
+        
+        def get_bytes():
+            data = self.cache.get_bytes(cache_key)
+            if data is None:
+                data = encode_image(processed, settings=settings)
+                self.cache.put_bytes(cache_key, data)
+            return data
+        
+        return get_bytes
+    
+    def get_output_directory(self):
+        """Obtener directorio de salida predeterminado"""
+        # Escritorio del usuario, luego Documentos y como último recurso el directorio actual
+        from fondo_core import default_output_dir
+        return default_output_dir()
+    
+    def open_file_location(self, file_path):
+        """Abrir la ubicación del archivo guardado"""
+        try:
+            import subprocess
+            import platform
+            
+            system = platform.system()
+            if system == "Windows":
+                subprocess.run(f'explorer /select,"{file_path}"', shell=True)
+            elif system == "Darwin":  # macOS
+                subprocess.run(["open", "-R", file_path])
+            elif system == "Linux":
+                subprocess.run(["xdg-open", os.path.dirname(file_path)])
+        except Exception as e:
+            logger.warning("No se pudo abrir la ubicación", extra={'fields': {'path': str(file_path), 'error': str(e)}})
+    
+    def open_last_saved(self):
+        """Abrir la carpeta del último guardado rápido"""
+        if self.last_saved_path:
+            self.open_file_location(self.last_saved_path)
+    
+    def auto_save_image(self):
+        """Guardar automáticamente en la carpeta predeterminada"""
+        if not self.processed_image:
+            return
+        
+        # Crear directorio de salida
+        output_dir = self.get_output_directory()
+        
+        # Generar nombre único con dispositivo
+        device_short = device_short_name(self.current_resolution_name)
+        filename = f"fondo-{device_short}-{self.get_timestamp()}.jpg"
+        file_path = output_dir / filename
+        from fondo_core import write_bytes
+        get_bytes = self.encoded_bytes_getter(file_path)
+        target_width, target_height = self.TARGET_SIZE
+        
+        def work(is_stale):
+            # Guardar imagen
+            output_dir.mkdir(exist_ok=True)
+            write_bytes(file_path, get_bytes())
+        
+        def done(result):
+            # Sin diálogo modal: el éxito va a la barra de estado y al log
+            self.status_label.config(text=f"✅ Guardado automáticamente: {filename} "
+                                          f"({target_width}x{target_height})")
+            logger.info("Guardado automático", extra={'fields': {'path': str(file_path),
+                                                                 'size': f"{target_width}x{target_height}"}})
+            
+            # La carpeta se abre sólo si el usuario lo pide (📂 Abrir Carpeta)
+            self.last_saved_path = str(file_path)
+            self.open_folder_btn.config(state='normal')
+        
+        self.run_in_background(work, done,
+                               busy_text=f"⏳ Guardando {filename}...",
+                               error_text="Error al guardar automáticamente",
+                               error_status="❌ Error en guardado automático")
+    
+    def export_all_devices(self):
+        """Exportar el fondo para todos los dispositivos en una sola pasada"""
+        if not self.original_image:
+            return
+        from fondo_core import encode_image, group_by_size, iter_render_all, write_bytes
+        
+        original = self.original_image
+        output_dir = self.get_output_directory() / f"fondos-{self.get_timestamp()}"
+        groups = group_by_size(self.PHONE_RESOLUTIONS)
+        preset = self.preset_var.get()
+        fill = self.fill_var.get()
+        
+        def work(is_stale):
+            output_dir.mkdir(parents=True, exist_ok=True)
+            
+            # Decodificar una vez y renderizar cada resolución única una sola vez
+            for target_size, processed in iter_render_all(original, groups, fill=fill):
+                data = encode_image(processed, preset=preset)
+                for device_name in groups[target_size]:
+                    write_bytes(output_dir / f"fondo-{device_short_name(device_name)}.jpg", data)
+        
+        def done(result):
+            self.status_label.config(text=f"✅ {len(self.PHONE_RESOLUTIONS)} fondos exportados en {output_dir.name}")
+            self.open_file_location(str(output_dir))
+        
+        self.run_in_background(work, done,
+                               busy_text=f"⏳ Exportando {len(self.PHONE_RESOLUTIONS)} dispositivos...",
+                               error_text="Error al exportar todos los dispositivos",
+                               error_status="❌ Error al exportar todos los dispositivos")
+    
+    def export_many_images(self):
+        """Exportar varias imágenes para todos los dispositivos con el planificador de trabajos"""
+        file_paths = filedialog.askopenfilenames(
+            title="Seleccionar imágenes",
+            filetypes=[("Imágenes", "*.jpg *.jpeg *.png *.bmp *.gif *.tiff *.tif *.webp"),
+                       ("Todos los archivos", "*.*")]
+        )
+        if not file_paths:
+            return
+        
+        self.load_core()
+        from fondo_core import encode_settings_for
+        from fondo_jobs import Job, JobScheduler
+        if self.job_scheduler is None:
+            self.job_scheduler = JobScheduler()
+        if self.many_job is not None:
+            self.many_job.cancel()
+        
+        output_dir = self.get_output_directory() / f"fondos-{self.get_timestamp()}"
+        job = Job(file_paths, list(self.PHONE_RESOLUTIONS), output_dir=output_dir,
+                  settings=encode_settings_for('.jpg', self.preset_var.get()), fill=self.fill_var.get())
+        self.many_job = self.job_scheduler.submit(job)
+        self.status_label.config(text=f"⏳ Exportando {len(file_paths)} imágenes...")
+        self.root.after(JOB_POLL_MS, self._poll_many, self.many_job, output_dir)
+    
+    def _poll_many(self, handle, output_dir):
+        """Mostrar el avance del trabajo de varias imágenes a medida que terminan las salidas"""
+        if handle is not self.many_job:
+            return
+        finished = [future for future in handle.futures if future.done()]
+        if len(finished) < len(handle.futures):
+            self.status_label.config(text=f"⏳ {len(finished)}/{len(handle.futures)} resoluciones listas "
+                                          f"({len(handle.job.sources)} imágenes)...")
+            self.root.after(JOB_POLL_MS * 4, self._poll_many, handle, output_dir)
+            return
+        
+        self.many_job = None
+        outputs = handle.results()
+        failed = sorted({output.source for output in outputs if output.error})
+        written = sum(len(output.paths) for output in outputs)
+        if failed:
+            self.status_label.config(text=f"⚠️ {written} fondos exportados, {len(failed)} imágenes con error")
+            messagebox.showwarning("Exportación con errores",
+                                   "No se pudieron convertir:\n" + "\n".join(os.path.basename(path) for path in failed))
+        else:
+            self.status_label.config(text=f"✅ {written} fondos exportados en {output_dir.name}")
+        if written:
+            self.open_file_location(str(output_dir))
+    
+    def run_in_background(self, work, on_done, busy_text, error_text, error_status, slot=None):
+        """Ejecutar work(is_stale) fuera del hilo de Tk y entregar el resultado con root.after
+
+        Los trabajos con el mismo slot se reemplazan: si uno nuevo llega antes
+        de que termine el anterior, el anterior se cancela (si aún no empezó)
+        o su resultado se descarta. Los trabajos sin slot (guardados) siempre
+        terminan.
+        """
+        self.job_counter += 1
+        job_id = self.job_counter
+        
+        if slot is not None:
+            previous = self.slot_jobs.get(slot)
+            if previous is not None:
+                previous[1].cancel()
+            
+            def is_stale():
+                current = self.slot_jobs.get(slot)
+                return current is None or current[0] != job_id
+        else:
+            def is_stale():
+                return False
+        
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fondo-trabajo')
+        future = self.executor.submit(work, is_stale)
+        if slot is not None:
+            self.slot_jobs[slot] = (job_id, future)
+        self.active_jobs.add(future)
+        
+        self.status_label.config(text=busy_text)
+        self.set_busy(True)
+        self.root.after(JOB_POLL_MS, self._poll_job, future, is_stale, on_done, error_text, error_status)
+    
+    def _poll_job(self, future, is_stale, on_done, error_text, error_status):
+        """Revisar sin bloquear si el trabajo terminó"""
+        if not future.done():
+            self.root.after(JOB_POLL_MS, self._poll_job, future, is_stale, on_done, error_text, error_status)
+            return
+        
+        self.active_jobs.discard(future)
+        if not self.active_jobs:
+            self.set_busy(False)
+        
+        # Trabajo obsoleto: la selección cambió mientras se procesaba
+        if future.cancelled() or is_stale():
+            return
+        
+        try:
+            result = future.result()
+        except JobCancelled:
+            return
+        except Exception as e:
+            logger.error(error_text, exc_info=e)
+            messagebox.showerror("Error", f"{error_text}:\n{str(e)}")
+            self.status_label.config(text=error_status)
+            return
+        
+        on_done(result)
+    
+    def set_busy(self, busy):
+        """Mostrar u ocultar el indicador de progreso"""
+        if busy:
+            self.progress.pack(pady=5, before=self.status_label)
+            self.progress.start(10)
+        else:
+            self.progress.stop()
+            self.progress.pack_forget()
+    
+    def on_close(self):
+        """Cerrar la ventana descartando los trabajos pendientes"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.job_scheduler is not None:
+            if self.many_job is not None:
+                self.many_job.cancel()
+            self.job_scheduler.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+    
+    def get_timestamp(self):
+        """Generar timestamp para nombre único"""
+        from datetime import datetime
+        return datetime.now().strftime("%Y%m%d_%H%M%S")
+    
+    def run(self):
+        """Ejecutar la aplicación"""
+        self.root.mainloop()
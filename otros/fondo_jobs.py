@@ -0,0 +1,266 @@
+"""
+Trabajos de varias imágenes para varios dispositivos (orígenes x dispositivos)
+Cada origen se decodifica una sola vez y sus tamaños únicos se renderizan y
+codifican en paralelo. La admisión de memoria limita cuántos orígenes
+decodificados conviven a la vez. Cada salida es un Future que se completa en
+cuanto está lista, así quien llama puede empezar a subir o mostrar los primeros
+resultados mientras el resto sigue renderizándose:
+
+    with JobScheduler(workers=4, max_decoded=2) as scheduler:
+        handle = scheduler.submit(Job(rutas, ['iPhone-15', '1080x2400'], output_dir='salida'))
+        for output in handle.as_completed():
+            ...
+
+    async for output in handle:   # lo mismo desde asyncio
+        ...
+
+Se usan hilos: Pillow suelta el GIL al decodificar, remuestrear y codificar, y
+los hilos comparten el origen decodificado sin copiarlo entre procesos.
+"""
+
+import asyncio
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor, as_completed
+
+from fondo_core import (DEFAULT_RESAMPLE, letterbox, open_for_targets, output_path_for, pick_level,
+                        prepare_render, timed_encode)
+from fondo_devices import REGISTRY
+from fondo_encode import encoder_settings, extension_for
+from fondo_fill import DEFAULT_FILL
+from fondo_metrics import logger
+from fondo_output import OutputWriter
+
+# Orígenes decodificados a la vez por defecto
+DEFAULT_MAX_DECODED = 2
+
+# Resultado de un origen en un tamaño: devices comparten la misma resolución
+JobOutput = namedtuple('JobOutput', 'source size devices data paths error')
+
+
+def _settle(future, output):
+    """Completar un Future salvo que quien llama lo haya cancelado"""
+    try:
+        future.set_result(output)
+    except InvalidStateError:
+        pass
+
+
+class Job:
+    """Orígenes cruzados con dispositivos (nombre, nombre corto o ANCHOxALTO)
+
+    Con output_dir cada salida se escribe en <salida>/<dispositivo>/<nombre> y
+    JobOutput.paths las lista; sin él los bytes codificados quedan en
+    JobOutput.data (keep_data fuerza conservarlos también al escribir).
+    """
+
+    def __init__(self, sources, devices, output_dir=None, settings=None, fill=DEFAULT_FILL,
+                 source_root=None, fsync='never', keep_data=None):
+        profiles = [REGISTRY.find(key) for key in devices]
+        unknown = [key for key, profile in zip(devices, profiles) if profile is None]
+        if unknown:
+            raise ValueError(f"Dispositivo desconocido: {', '.join(unknown)}")
+        self.sources = [os.fspath(source) for source in sources]
+        self.devices = list(dict.fromkeys(profile.name for profile in profiles))
+        self.groups = REGISTRY.group_by_size(self.devices)
+        self.output_dir = output_dir
+        self.settings = settings or encoder_settings()
+        self.fill = fill
+        self.source_root = source_root
+        self.fsync = fsync
+        self.keep_data = output_dir is None if keep_data is None else keep_data
+
+    def __len__(self):
+        """Salidas esperadas: una por origen y tamaño único"""
+        return len(self.sources) * len(self.groups)
+
+
+class JobHandle:
+    """Futures de las salidas de un trabajo, en orden de origen y de tamaño"""
+
+    def __init__(self, job, futures):
+        self.job = job
+        self.futures = futures
+        self._cancelled = threading.Event()
+
+    def as_completed(self, timeout=None):
+        """Iterar las salidas en el orden en que terminan"""
+        for future in as_completed(self.futures, timeout):
+            if not future.cancelled():
+                yield future.result()
+
+    async def __aiter__(self):
+        """Iterar las salidas desde asyncio sin bloquear el bucle de eventos"""
+        pending = [asyncio.wrap_future(future) for future in self.futures if not future.cancelled()]
+        for next_output in asyncio.as_completed(pending):
+            try:
+                yield await next_output
+            except asyncio.CancelledError:
+                if not self._cancelled.is_set():
+                    raise
+
+    def results(self, timeout=None):
+        """Esperar todo el trabajo y devolver las salidas en orden de envío"""
+        return [future.result(timeout) for future in self.futures if not future.cancelled()]
+
+    def done(self):
+        return all(future.done() for future in self.futures)
+
+    def cancel(self):
+        """No admitir más orígenes; lo ya decodificado termina"""
+        self._cancelled.set()
+        for future in self.futures:
+            future.cancel()
+
+
+class _SourceTask:
+    """Un origen decodificado y sus renders pendientes; libera la admisión al terminar el último"""
+
+    def __init__(self, source, outputs, release):
+        self.source = source
+        self.outputs = outputs  # tamaño -> Future
+        self.image = None
+        self.levels = None
+        self.fits = None
+        self._remaining = len(outputs)
+        self._lock = threading.Lock()
+        self._release = release
+
+    def fail(self, groups, error):
+        """Completar con error todas las salidas pendientes del origen"""
+        for size, future in self.outputs.items():
+            if not future.done():
+                _settle(future, JobOutput(self.source, size, tuple(groups[size]), None, [], error))
+
+    def finish_one(self):
+        with self._lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last:
+            self.close()
+
+    def close(self):
+        # Los niveles de la pirámide pueden ser el original o derivar de él
+        image, self.image, self.levels = self.image, None, None
+        if image is not None:
+            image.close()
+        self._release()
+
+
+class JobScheduler:
+    """Planificador de trabajos con un pool de hilos y admisión por orígenes decodificados"""
+
+    def __init__(self, workers=None, max_decoded=DEFAULT_MAX_DECODED, resample=DEFAULT_RESAMPLE):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_decoded = max(1, max_decoded)
+        self.resample = resample
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fondo-job')
+        self._admission = threading.BoundedSemaphore(self.max_decoded)
+        self._feeders = []
+
+    def submit(self, job):
+        """Planificar un trabajo y devolver su JobHandle sin esperar a que empiece"""
+        tasks = []
+        futures = []
+        for source in job.sources:
+            outputs = {size: Future() for size in job.groups}
+            futures.extend(outputs.values())
+            tasks.append(_SourceTask(source, outputs, self._admission.release))
+        handle = JobHandle(job, futures)
+
+        # La admisión se espera en un hilo propio: bloquear hilos del pool con
+        # la espera dejaría sin hilos a los renders que liberan memoria
+        feeder = threading.Thread(target=self._feed, args=(job, handle, tasks),
+                                  name='fondo-job-admision', daemon=True)
+        self._feeders = [thread for thread in self._feeders if thread.is_alive()]
+        self._feeders.append(feeder)
+        feeder.start()
+        return handle
+
+    def run(self, job):
+        """Ejecutar un trabajo completo y devolver sus salidas"""
+        return self.submit(job).results()
+
+    def _feed(self, job, handle, tasks):
+        """Admitir los orígenes de uno en uno a medida que se libera memoria"""
+        for index, task in enumerate(tasks):
+            self._admission.acquire()
+            if handle._cancelled.is_set():
+                self._admission.release()
+                return
+            try:
+                self.executor.submit(self._decode, job, handle, task)
+            except RuntimeError:
+                # Planificador cerrado: no quedan hilos que terminen estas salidas
+                self._admission.release()
+                for pending in tasks[index:]:
+                    pending.fail(job.groups, "planificador cerrado")
+                return
+
+    def _decode(self, job, handle, task):
+        """Decodificar un origen una vez y repartir sus tamaños entre los hilos"""
+        sizes = list(task.outputs)
+        if handle._cancelled.is_set():
+            task.close()
+            return
+        try:
+            task.image, _ = open_for_targets(task.source, sizes, fill=job.fill)
+            ordered, task.fits, task.levels = prepare_render(task.image, sizes, self.resample, fill=job.fill)
+        except Exception as e:
+            logger.error("No se pudo decodificar", extra={'fields': {'path': task.source, 'error': str(e)}})
+            task.fail(job.groups, str(e))
+            task.close()
+            return
+        for index, size in enumerate(ordered):
+            try:
+                self.executor.submit(self._render, job, task, size)
+            except RuntimeError:
+                task.fail(job.groups, "planificador cerrado")
+                for _ in ordered[index:]:
+                    task.finish_one()
+                return
+
+    def _render(self, job, task, size):
+        """Renderizar, codificar y escribir un tamaño de un origen"""
+        devices = tuple(job.groups[size])
+        future = task.outputs[size]
+        if future.cancelled():
+            task.finish_one()
+            return
+        try:
+            fit = task.fits[size]
+            processed = letterbox(pick_level(task.levels, fit), size, self.resample, fit=fit, fill=job.fill)
+            data = timed_encode(processed, job.settings)
+            del processed
+            paths = []
+            if job.output_dir is not None:
+                extension = extension_for(job.settings)
+                with OutputWriter(job.fsync) as writer:
+                    for device_name in devices:
+                        file_path = output_path_for(task.source, job.output_dir, device_name, extension,
+                                                    job.source_root)
+                        file_path.parent.mkdir(parents=True, exist_ok=True)
+                        writer.write(file_path, data)
+                        paths.append(str(file_path))
+            output = JobOutput(task.source, size, devices, data if job.keep_data else None, paths, None)
+        except Exception as e:
+            logger.error("Error al convertir", extra={'fields': {'path': task.source, 'size': size,
+                                                                 'error': str(e)}})
+            output = JobOutput(task.source, size, devices, None, [], str(e))
+        finally:
+            task.finish_one()
+        _settle(future, output)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Cerrar el pool (wait espera también a que se admitan los orígenes pendientes)"""
+        if wait and not cancel_futures:
+            for feeder in self._feeders:
+                feeder.join()
+        self.executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
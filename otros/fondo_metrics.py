@@ -0,0 +1,226 @@
+"""
+Instrumentación de las etapas de conversión: tiempos, bytes y perfiles
+Cada etapa (load, decode, resize, composite, preview, encode, write) se mide
+como un span; los totales se consultan con snapshot() y cada span se registra
+como una línea JSON en el logger 'fondo' a nivel DEBUG.
+
+Variables de entorno:
+    FONDO_LOG=DEBUG          nivel del log estructurado (por defecto WARNING)
+    FONDO_PROFILE=cpu,mem    activar cProfile y/o tracemalloc durante la corrida (en batch, con -j 0)
+    FONDO_PROFILE_OUT=ruta   prefijo de los archivos de perfil (por defecto fondo-profile)
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('fondo')
+
+# Etapas conocidas, en el orden en que ocurren en una conversión
+STAGES = ('load', 'decode', 'normalize', 'resize', 'composite', 'preview', 'encode', 'write', 'fsync')
+
+# Modos de perfilado admitidos en FONDO_PROFILE / --profile
+PROFILE_MODES = ('cpu', 'mem')
+
+# Líneas del informe de perfil que se muestran
+PROFILE_TOP = 25
+
+_totals = {}  # etapa -> {'count', 'seconds', 'max_seconds', 'bytes'}
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatear cada registro como una línea JSON con sus campos extra"""
+
+    def format(self, record):
+        payload = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level=None, stream=None):
+    """Enviar el log 'fondo' a stderr en JSON (nivel de FONDO_LOG si no se indica)"""
+    level = level or os.environ.get('FONDO_LOG', 'WARNING')
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+
+
+def record(stage, seconds, nbytes=0, **fields):
+    """Sumar una medición ya tomada a los totales de la etapa y registrarla en el log"""
+    with _lock:
+        totals = _totals.get(stage)
+        if totals is None:
+            totals = _totals[stage] = {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0}
+        totals['count'] += 1
+        totals['seconds'] += seconds
+        totals['bytes'] += nbytes
+        if seconds > totals['max_seconds']:
+            totals['max_seconds'] = seconds
+    if logger.isEnabledFor(logging.DEBUG):
+        fields.update(stage=stage, ms=round(seconds * 1000, 3))
+        if nbytes:
+            fields['bytes'] = nbytes
+        logger.debug('span', extra={'fields': fields})
+
+
+@contextmanager
+def span(stage, **fields):
+    """Medir un bloque como etapa; el bloque puede añadir campos (p. ej. fields['bytes'])"""
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        extra = dict(fields)
+        record(stage, time.perf_counter() - start, extra.pop('bytes', 0), **extra)
+
+
+def snapshot():
+    """Copia de los totales por etapa"""
+    with _lock:
+        return {stage: dict(totals) for stage, totals in _totals.items()}
+
+
+def reset():
+    """Vaciar los totales (p. ej. antes de medir una corrida)"""
+    with _lock:
+        _totals.clear()
+
+
+def merge(into, stats):
+    """Acumular un snapshot (de otro proceso) sobre otro"""
+    for stage, totals in stats.items():
+        target = into.setdefault(stage, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'bytes': 0})
+        target['count'] += totals['count']
+        target['seconds'] += totals['seconds']
+        target['bytes'] += totals['bytes']
+        target['max_seconds'] = max(target['max_seconds'], totals['max_seconds'])
+    return into
+
+
+def diff(after, before):
+    """Diferencia entre dos snapshots del mismo proceso (max_seconds queda el de after)"""
+    delta = {}
+    for stage, totals in after.items():
+        previous = before.get(stage, {})
+        count = totals['count'] - previous.get('count', 0)
+        if count:
+            delta[stage] = {
+                'count': count,
+                'seconds': totals['seconds'] - previous.get('seconds', 0.0),
+                'max_seconds': totals['max_seconds'],
+                'bytes': totals['bytes'] - previous.get('bytes', 0),
+            }
+    return delta
+
+
+def percentile(values, fraction):
+    """Percentil por interpolación lineal (values no vacío)"""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _stage_order(stats):
+    known = [stage for stage in STAGES if stage in stats]
+    return known + sorted(stage for stage in stats if stage not in STAGES)
+
+
+def format_summary(stats):
+    """Tabla legible de tiempos por etapa, de la más costosa a la más barata en total"""
+    if not stats:
+        return "(sin mediciones)"
+    total = sum(totals['seconds'] for totals in stats.values()) or 1.0
+    lines = [f"{'etapa':<10} {'veces':>6} {'total ms':>10} {'media ms':>9} {'máx ms':>8} {'%':>5} {'MB':>8}"]
+    for stage in sorted(stats, key=lambda s: stats[s]['seconds'], reverse=True):
+        totals = stats[stage]
+        lines.append(f"{stage:<10} {totals['count']:>6} {totals['seconds'] * 1000:>10.1f} "
+                     f"{totals['seconds'] * 1000 / totals['count']:>9.2f} {totals['max_seconds'] * 1000:>8.1f} "
+                     f"{totals['seconds'] / total * 100:>5.1f} {totals['bytes'] / (1024 * 1024):>8.2f}")
+    return '\n'.join(lines)
+
+
+def format_metrics(stats):
+    """Tiempos por etapa en formato de texto de Prometheus"""
+    lines = []
+    for metric, field, kind in (('fondo_stage_seconds_total', 'seconds', 'counter'),
+                                ('fondo_stage_calls_total', 'count', 'counter'),
+                                ('fondo_stage_max_seconds', 'max_seconds', 'gauge'),
+                                ('fondo_stage_bytes_total', 'bytes', 'counter')):
+        lines.append(f"# TYPE {metric} {kind}")
+        for stage in _stage_order(stats):
+            lines.append(f'{metric}{{stage="{stage}"}} {stats[stage][field]}')
+    return '\n'.join(lines) + '\n'
+
+
+def profile_modes(value=None):
+    """Modos de perfilado pedidos (argumento o FONDO_PROFILE: 'cpu', 'mem', 'cpu,mem')"""
+    value = value if value is not None else os.environ.get('FONDO_PROFILE', '')
+    modes = [mode.strip().lower() for mode in value.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+    if unknown:
+        raise ValueError(f"Modo de perfil desconocido: {', '.join(unknown)} (usa {', '.join(PROFILE_MODES)})")
+    return modes
+
+
+@contextmanager
+def profiling(modes=None, output=None):
+    """Perfilar el bloque con cProfile ('cpu') y/o tracemalloc ('mem')
+
+    Al terminar escribe <output>.prof con 'cpu' (abrible con pstats o snakeviz)
+    y un resumen en <output>.txt con las funciones y líneas más costosas.
+    """
+    modes = profile_modes(modes)
+    if not modes:
+        yield
+        return
+
+    output = output or os.environ.get('FONDO_PROFILE_OUT', 'fondo-profile')
+    profiler = None
+    if 'cpu' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+    if 'mem' in modes:
+        import tracemalloc
+        tracemalloc.start(10)
+
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        report = []
+        if profiler:
+            import io
+            import pstats
+            profiler.disable()
+            profiler.dump_stats(f"{output}.prof")
+            text = io.StringIO()
+            pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(PROFILE_TOP)
+            report.append(text.getvalue())
+        if 'mem' in modes:
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]
+            tracemalloc.stop()
+            report.append(f"tracemalloc: actual {current / (1024 * 1024):.1f} MB, "
+                          f"pico {peak / (1024 * 1024):.1f} MB (sólo memoria de Python)")
+            report.extend(str(stat) for stat in top)
+        report.append(format_summary(snapshot()))
+        with open(f"{output}.txt", 'w', encoding='utf-8') as f:
+            f.write('\n'.join(report) + '\n')
+        logger.warning('perfil guardado', extra={'fields': {'path': f"{output}.txt", 'modes': modes}})
@@ -0,0 +1,178 @@
+"""
+Escritura atómica de resultados: archivo temporal en la misma carpeta + os.replace
+Una caída a mitad de escritura deja, como mucho, un .tmp huérfano; nunca un JPEG
+truncado con el nombre final. Cada archivo se escribe con una sola llamada a
+write desde la memoria del búfer codificado (memoryview, sin copias).
+
+Modos de fsync (durabilidad ante cortes de luz, no sólo ante caídas del proceso):
+    never    sin fsync: atómico frente a caídas del proceso (por defecto)
+    batch    se acumulan hasta fsync_every archivos y se sincronizan juntos,
+             con un solo fsync por carpeta; aparecen con su nombre al hacer flush()
+    always   fsync de cada archivo y de su carpeta antes de seguir
+"""
+
+import io
+import itertools
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from fondo_encode import encode, encode_into
+from fondo_metrics import span
+
+FSYNC_MODES = ('never', 'batch', 'always')
+
+# Archivos pendientes por ronda de sincronización en modo batch
+DEFAULT_FSYNC_EVERY = 64
+
+# Secuencia de temporales del proceso: en modo batch dos escrituras al mismo
+# destino quedan pendientes a la vez y cada una necesita su propio archivo
+_temp_sequence = itertools.count()
+
+
+def temp_path_for(path):
+    """Temporal junto al destino (misma carpeta = mismo sistema de archivos para os.replace)"""
+    path = Path(path)
+    return path.with_name(f".{path.name}.{os.getpid()}.{next(_temp_sequence)}.tmp")
+
+
+def _write_all(fd, data):
+    """Escribir todo el búfer; write puede aceptar menos bytes de los pedidos"""
+    view = memoryview(data).cast('B')
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _fsync_directory(directory):
+    """Sincronizar la entrada de directorio (el rename) donde el sistema lo permite"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Windows no abre carpetas
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class OutputWriter:
+    """Escritor atómico de archivos con fsync opcional por lotes (usar como context manager)"""
+
+    def __init__(self, fsync='never', fsync_every=DEFAULT_FSYNC_EVERY):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"Modo de fsync desconocido: {fsync} (usa {', '.join(FSYNC_MODES)})")
+        self.fsync = fsync
+        self.fsync_every = max(1, fsync_every)
+        self._pending = []  # (descriptor, temporal, destino) esperando la sincronización por lotes
+        self._buffer = io.BytesIO()
+        self.written = 0
+
+    def write(self, path, data):
+        """Escribir data en path de forma atómica"""
+        path = Path(path)
+        tmp_path = temp_path_for(path)
+        with span('write', path=str(path), bytes=len(data)):
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+            try:
+                _write_all(fd, data)
+                if self.fsync == 'batch':
+                    self._pending.append((fd, tmp_path, path))
+                    fd = None
+                elif self.fsync == 'always':
+                    os.fsync(fd)
+            except BaseException:
+                os.close(fd)
+                tmp_path.unlink(missing_ok=True)
+                raise
+            if fd is not None:
+                os.close(fd)
+                os.replace(tmp_path, path)
+                if self.fsync == 'always':
+                    _fsync_directory(path.parent)
+        self.written += 1
+        if len(self._pending) >= self.fsync_every:
+            self.flush()
+
+    @contextmanager
+    def encoded(self, image, settings):
+        """Codificar en el búfer reutilizable del escritor y entregar una vista sin copia
+
+        La vista sólo vale dentro del with: el búfer se reutiliza en la siguiente
+        codificación (quien necesite conservar los bytes los copia con bytes()).
+        """
+        if settings.get('target_bytes'):
+            # La búsqueda por tamaño prueba varias calidades: usa su propio búfer
+            with span('encode', format=settings['format'], size=image.size) as fields:
+                data = encode(image, settings)
+                fields['bytes'] = len(data)
+            yield data
+            return
+        buffer = self._buffer
+        buffer.seek(0)
+        buffer.truncate()
+        with span('encode', format=settings['format'], size=image.size) as fields:
+            fields['bytes'] = encode_into(image, settings, buffer)
+        with buffer.getbuffer() as view:
+            yield view
+
+    def save(self, image, path, settings):
+        """Codificar en el búfer reutilizable del escritor y escribirlo sin copiarlo"""
+        with self.encoded(image, settings) as data:
+            self.write(path, data)
+
+    def flush(self):
+        """Sincronizar y renombrar los archivos pendientes del modo batch"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        with span('fsync', files=len(pending)):
+            try:
+                for fd, _, _ in pending:
+                    os.fsync(fd)
+            except BaseException:
+                self._discard(pending)
+                raise
+            for fd, _, _ in pending:
+                os.close(fd)
+            directories = set()
+            for _, tmp_path, path in pending:
+                os.replace(tmp_path, path)
+                directories.add(path.parent)
+            for directory in directories:
+                _fsync_directory(directory)
+
+    def discard(self):
+        """Descartar los archivos pendientes del modo batch sin publicarlos"""
+        pending, self._pending = self._pending, []
+        self._discard(pending)
+
+    @staticmethod
+    def _discard(pending):
+        for fd, tmp_path, _ in pending:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+            tmp_path.unlink(missing_ok=True)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Si el bloque falló, lo que quedó pendiente no se publica con su nombre final
+        if exc_type is not None:
+            self.discard()
+        else:
+            self.close()
+
+
+def write_atomic(path, data, fsync=False):
+    """Escribir un archivo suelto de forma atómica (fsync=True lo deja además en disco)"""
+    with OutputWriter('always' if fsync else 'never') as writer:
+        writer.write(path, data)
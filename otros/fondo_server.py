@@ -0,0 +1,424 @@
+"""
+Servicio HTTP local de conversión (asyncio + pool de procesos)
+Uso: python fondo.py serve [--host 127.0.0.1] [--port 8765] [-j PROCESOS] [--queue N]
+
+    POST /convert?device=<dispositivo>[&format=jpeg][&preset=quality][&fill=cover]
+         cuerpo: la imagen de origen tal cual; respuesta: el fondo codificado
+    GET  /devices   dispositivos disponibles (JSON)
+    GET  /metrics   contadores del servicio y tiempos por etapa (Prometheus)
+    GET  /health    estado y ocupación de la cola
+
+Las conexiones se reutilizan (HTTP/1.1 keep-alive). Si hay más trabajos en
+vuelo que procesos + cola, se responde 503 con Retry-After en lugar de encolar
+sin límite.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import parse_qs, urlsplit
+
+import fondo_metrics
+from fondo_core import DEFAULT_RESAMPLE, convert_bytes
+from fondo_devices import REGISTRY
+from fondo_encode import FORMATS, PRESETS, DEFAULT_PRESET, encoder_settings, is_available
+from fondo_fill import FILLS, DEFAULT_FILL
+
+# Tamaño máximo aceptado de imagen de origen
+DEFAULT_MAX_BODY_MB = 64
+
+# Trabajos que pueden esperar turno además de los que ya están en un proceso
+DEFAULT_QUEUE = 16
+
+# Tamaño de cada trozo de la respuesta (Transfer-Encoding: chunked)
+CHUNK_SIZE = 64 * 1024
+
+# Segundos sin peticiones antes de cerrar una conexión keep-alive
+KEEP_ALIVE_TIMEOUT = 15
+
+# Segundos para recibir el cuerpo completo: un cliente lento no retiene un lugar de la cola
+BODY_TIMEOUT = 60
+
+# Límites de las cabeceras de una petición (se responde 431 al superarlos)
+MAX_HEADERS = 100
+MAX_HEADER_BYTES = 64 * 1024
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    408: 'Request Timeout',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    415: 'Unsupported Media Type',
+    422: 'Unprocessable Entity',
+    431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+
+class HttpError(Exception):
+    """Error que se responde al cliente con su código de estado"""
+
+    def __init__(self, status, message, close=False):
+        super().__init__(message)
+        self.status = status
+        self.close = close
+
+
+def resolve_device(key):
+    """Buscar un dispositivo por nombre completo, nombre corto o 'ANCHOxALTO'"""
+    profile = REGISTRY.find(key)
+    if profile is None:
+        raise HttpError(404, f"Dispositivo desconocido: {key}")
+    return profile.name, profile.size
+
+
+def content_length(headers):
+    """Content-Length de la petición (None si no viene)"""
+    value = headers.get('content-length')
+    if value is None:
+        return None
+    try:
+        length = int(value)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HttpError(400, f"Content-Length inválido: {value}", close=True)
+    return length
+
+
+def _sha256(data):
+    """SHA-256 en hexadecimal de los bytes recibidos"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _convert_job(data, target_size, settings, fill=DEFAULT_FILL):
+    """Tarea del proceso hijo: convertir y devolver bytes junto con sus tiempos por etapa"""
+    before = fondo_metrics.snapshot()
+    output = convert_bytes(data, target_size, settings, fill)
+    return output, fondo_metrics.diff(fondo_metrics.snapshot(), before)
+
+
+class ConversionServer:
+    """Servidor HTTP/1.1 mínimo que reparte las conversiones en un pool de procesos"""
+
+    def __init__(self, workers=None, queue=DEFAULT_QUEUE, max_body_mb=DEFAULT_MAX_BODY_MB, cache=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.capacity = self.workers + queue
+        self.max_body = int(max_body_mb * 1024 * 1024)
+        self.cache = cache
+        self.executor = None
+        self.in_flight = 0
+        self.stage_stats = {}
+        self.counters = {
+            'requests': 0,
+            'conversions': 0,
+            'rejected': 0,
+            'errors': 0,
+            'connections': 0,
+            'pool_restarts': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+        }
+
+    async def start(self, host, port):
+        """Abrir el pool de procesos y empezar a escuchar"""
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def restart_pool(self, broken):
+        """Reemplazar un pool roto (un hijo murió, p. ej. por falta de memoria)
+
+        Varias peticiones ven el mismo pool roto: sólo la primera lo reemplaza.
+        """
+        if self.executor is not broken:
+            return
+        fondo_metrics.logger.error('Pool de procesos roto: se vuelve a crear',
+                                   extra={'fields': {'workers': self.workers}})
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.counters['pool_restarts'] += 1
+
+    def close(self):
+        """Cerrar el pool de procesos"""
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- protocolo ---
+
+    async def handle_connection(self, reader, writer):
+        """Atender peticiones sucesivas de una conexión hasta que alguna parte la cierre"""
+        self.counters['connections'] += 1
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                keep_alive = await self.handle_request(request_line, reader, writer)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            # Cliente que se fue o que dejó de enviar cabeceras a mitad de petición
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_headers(self, reader):
+        """Leer las cabeceras de una petición (nombres en minúsculas)"""
+        headers = {}
+        total = 0
+        while True:
+            try:
+                line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_TIMEOUT)
+            except ValueError:
+                # Línea más larga que el búfer del lector
+                raise HttpError(431, "Cabecera demasiado larga", close=True)
+            if line in (b'\r\n', b'\n', b''):
+                return headers
+            total += len(line)
+            if total > MAX_HEADER_BYTES or len(headers) >= MAX_HEADERS:
+                raise HttpError(431, f"Cabeceras demasiado grandes (máximo {MAX_HEADERS} "
+                                     f"y {MAX_HEADER_BYTES // 1024} KB)", close=True)
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    async def handle_request(self, request_line, reader, writer):
+        """Procesar una petición y devolver si la conexión sigue abierta"""
+        started = time.perf_counter()
+        self.counters['requests'] += 1
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            await self.send(writer, 400, 'Petición mal formada\n'.encode(), keep_alive=False)
+            return False
+
+        try:
+            headers = await self.read_headers(reader)
+        except HttpError as e:
+            await self.send(writer, e.status, f"{e}\n".encode(), keep_alive=False)
+            return False
+        keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        status = 200
+        try:
+            length = content_length(headers)
+            if length and (url.path != '/convert' or method != 'POST'):
+                # Un cuerpo que no se va a leer dejaría la conexión desincronizada
+                keep_alive = False
+
+            if url.path == '/convert':
+                if method != 'POST':
+                    raise HttpError(405, "Usa POST con la imagen en el cuerpo")
+                content_type, body = await self.convert(query, headers, length, reader)
+            elif url.path in ('/devices', '/health', '/metrics') and method in ('GET', 'HEAD'):
+                content_type, body = self.info(url.path)
+            else:
+                raise HttpError(404, f"Ruta desconocida: {url.path}")
+        except HttpError as e:
+            status = e.status
+            content_type, body = 'text/plain; charset=utf-8', f"{e}\n".encode()
+            keep_alive = keep_alive and not e.close
+            if status == 503:
+                self.counters['rejected'] += 1
+            elif status >= 500:
+                self.counters['errors'] += 1
+        except Exception as e:
+            fondo_metrics.logger.error('Error inesperado en la petición', exc_info=e)
+            status, keep_alive = 500, False
+            content_type, body = 'text/plain; charset=utf-8', b'Error interno\n'
+            self.counters['errors'] += 1
+
+        extra = {'Retry-After': '1'} if status == 503 else None
+        await self.send(writer, status, body, content_type, keep_alive, extra, head=method == 'HEAD')
+        fondo_metrics.logger.info('request', extra={'fields': {
+            'method': method, 'path': url.path, 'status': status, 'bytes': len(body),
+            'ms': round((time.perf_counter() - started) * 1000, 3), 'in_flight': self.in_flight,
+        }})
+        return keep_alive
+
+    async def send(self, writer, status, body, content_type='text/plain; charset=utf-8', keep_alive=True,
+                   extra_headers=None, head=False):
+        """Enviar la respuesta en trozos, esperando al socket entre uno y otro"""
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            'Transfer-Encoding: chunked',
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        for name, value in (extra_headers or {}).items():
+            headers.append(f"{name}: {value}")
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1'))
+        if not head:
+            view = memoryview(body)
+            for offset in range(0, len(view), CHUNK_SIZE):
+                chunk = view[offset:offset + CHUNK_SIZE]
+                writer.write(f"{len(chunk):X}\r\n".encode() + chunk + b'\r\n')
+                # Control de flujo: no llenar la memoria si el cliente lee despacio
+                await writer.drain()
+            writer.write(b'0\r\n\r\n')
+            self.counters['bytes_out'] += len(body)
+        await writer.drain()
+
+    # --- rutas ---
+
+    async def convert(self, query, headers, length, reader):
+        """Leer la imagen, convertirla en el pool y devolver (tipo, bytes)
+
+        Sólo los errores que cierran la conexión se responden antes de leer el
+        cuerpo; el resto se valida después para poder reutilizarla.
+        """
+        if length is None:
+            raise HttpError(411, "Falta Content-Length", close=True)
+        if length > self.max_body:
+            raise HttpError(413, f"La imagen supera {self.max_body // (1024 * 1024)} MB", close=True)
+
+        # Contrapresión: rechazar antes de leer el cuerpo si la cola está llena
+        if self.in_flight >= self.capacity:
+            raise HttpError(503, "Servidor ocupado, reintenta en un momento", close=True)
+
+        self.in_flight += 1
+        try:
+            try:
+                data = await asyncio.wait_for(reader.readexactly(length), BODY_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise HttpError(408, f"El cuerpo no llegó en {BODY_TIMEOUT} s", close=True)
+            self.counters['bytes_in'] += length
+
+            device_key = query.get('device') or headers.get('x-device')
+            if not device_key:
+                raise HttpError(400, "Falta el dispositivo (?device=... o cabecera X-Device)")
+            _, target_size = resolve_device(device_key)
+
+            fmt = query.get('format', 'jpeg')
+            preset = query.get('preset', DEFAULT_PRESET)
+            if fmt not in FORMATS or not is_available(fmt):
+                raise HttpError(415, f"Formato no disponible: {fmt}")
+            if preset not in PRESETS:
+                raise HttpError(400, f"Preset desconocido: {preset}")
+            fill = query.get('fill', DEFAULT_FILL)
+            if fill not in FILLS:
+                raise HttpError(400, f"Relleno desconocido: {fill}")
+            settings = encoder_settings(fmt, preset)
+            content_type = f"image/{FORMATS[fmt][1].lstrip('.').replace('jpg', 'jpeg')}"
+
+            # Hash y caché en disco van a un hilo: con imágenes de decenas de MB
+            # bloquearían el bucle y con él a las demás conexiones
+            loop = asyncio.get_running_loop()
+            cache_key = None
+            if self.cache is not None:
+                from fondo_cache import make_key
+                digest = await loop.run_in_executor(None, _sha256, data)
+                cache_key = make_key(digest, target_size, DEFAULT_RESAMPLE, settings, fill)
+                cached = await loop.run_in_executor(None, self.cache.get_bytes, cache_key)
+                if cached is not None:
+                    return content_type, cached
+
+            executor = self.executor
+            try:
+                output, stage_delta = await loop.run_in_executor(executor, _convert_job, data,
+                                                                 target_size, settings, fill)
+            except BrokenProcessPool:
+                # No es culpa de la imagen: rehacer el pool y pedir que reintente
+                self.restart_pool(executor)
+                raise HttpError(503, "Se reinició el conversor, reintenta en un momento", close=True)
+            except Exception as e:
+                raise HttpError(422, f"No se pudo convertir la imagen: {type(e).__name__}: {e}")
+        finally:
+            self.in_flight -= 1
+
+        fondo_metrics.merge(self.stage_stats, stage_delta)
+        self.counters['conversions'] += 1
+        if cache_key is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.cache.put_bytes, cache_key, output)
+        return content_type, output
+
+    def info(self, path):
+        """Respuestas de consulta: dispositivos, salud y métricas"""
+        if path == '/devices':
+            devices = [{'name': profile.name, 'short': profile.short, 'brand': profile.brand,
+                        'width': profile.width, 'height': profile.height, 'ppi': profile.ppi}
+                       for profile in REGISTRY]
+            return 'application/json', json.dumps(devices, ensure_ascii=False).encode()
+        if path == '/health':
+            health = {'status': 'ok', 'workers': self.workers, 'in_flight': self.in_flight,
+                      'capacity': self.capacity}
+            return 'application/json', json.dumps(health).encode()
+
+        lines = []
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE fondo_server_{name}_total counter")
+            lines.append(f"fondo_server_{name}_total {value}")
+        lines.append("# TYPE fondo_server_in_flight gauge")
+        lines.append(f"fondo_server_in_flight {self.in_flight}")
+        text = '\n'.join(lines) + '\n' + fondo_metrics.format_metrics(self.stage_stats)
+        if self.cache is not None:
+            text += self.cache.metrics_text()
+        return 'text/plain; version=0.0.4', text.encode()
+
+
+async def serve(host, port, **options):
+    """Ejecutar el servidor hasta que se interrumpa"""
+    server = ConversionServer(**options)
+    listener = await server.start(host, port)
+    address = listener.sockets[0].getsockname()
+    print(f"🌐 Sirviendo en http://{address[0]}:{address[1]} "
+          f"({server.workers} procesos, cola de {server.capacity - server.workers})")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def build_parser():
+    """Construir el parser de argumentos del servidor"""
+    parser = argparse.ArgumentParser(prog='fondo serve', description='Servicio HTTP local de conversión')
+    parser.add_argument('--host', default='127.0.0.1', help='Dirección de escucha')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto de escucha')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='Procesos (por defecto todos los núcleos)')
+    parser.add_argument('--queue', type=int, default=DEFAULT_QUEUE,
+                        help='Trabajos en espera admitidos antes de responder 503')
+    parser.add_argument('--max-mb', type=float, default=DEFAULT_MAX_BODY_MB, help='Tamaño máximo de la imagen')
+    parser.add_argument('--cache-dir', help='Carpeta de caché de resultados (activa la caché)')
+    parser.add_argument('--cache-mb', type=float, default=None, help='Tamaño máximo de la caché en disco')
+    parser.add_argument('--log-level', help='Nivel del log JSON en stderr (INFO registra cada petición)')
+    return parser
+
+
+def main(argv=None):
+    """Punto de entrada del servidor"""
+    args = build_parser().parse_args(argv)
+    if args.log_level:
+        fondo_metrics.configure_logging(args.log_level)
+    cache = None
+    if args.cache_dir:
+        from fondo_cache import ResultCache
+        cache = ResultCache(args.cache_dir, disk_limit_mb=args.cache_mb)
+    try:
+        asyncio.run(serve(args.host, args.port, workers=args.workers, queue=args.queue,
+                          max_body_mb=args.max_mb, cache=cache))
+    except KeyboardInterrupt:
+        print("👋 Servidor detenido")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
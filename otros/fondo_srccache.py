@@ -0,0 +1,252 @@
+"""
+Caché persistente de orígenes ya decodificados, reducidos y normalizados
+Cada entrada es un archivo de píxeles crudos con una cabecera pequeña; al
+reabrir el mismo origen (otra sesión de la GUI, otra corrida batch) se mapea
+con mmap y se envuelve con Image.frombuffer sin copiar ni decodificar nada.
+
+Las entradas se validan contra el mtime y el tamaño del origen; si cambiaron,
+contra su SHA-256 (un touch o una copia no invalidan). Un origen pedido para
+objetivos mayores que los de su entrada se vuelve a decodificar y la reemplaza.
+El total en disco se limita con desalojo LRU (FONDO_SOURCE_CACHE_MB).
+
+Los píxeles RGB se guardan como RGBX (4 bytes, la misma memoria que usa Pillow):
+es lo que permite mapearlos sin conversión, a costa de un byte por píxel.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+
+from PIL import Image
+
+from fondo_cache import PIPELINE_VERSION, default_cache_dir, file_hash
+from fondo_core import need_size, open_for_targets
+from fondo_fill import DEFAULT_FILL
+from fondo_metrics import span
+from fondo_output import temp_path_for
+
+# Límite por defecto en disco (los orígenes crudos ocupan ~4 bytes por píxel)
+DEFAULT_LIMIT_MB = 1024
+
+# Cabecera: magia, versión, modo crudo, tamaño guardado, tamaño original,
+# tamaño necesario con el que se creó, mtime y tamaño del origen, SHA-256
+MAGIC = b'FONDOSRC'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sH6sIIIIIIqq32s')
+
+# Los píxeles empiezan alineados después de la cabecera
+DATA_OFFSET = 128
+
+# Modo del pipeline -> modo crudo que Image.frombuffer puede mapear sin copiar
+RAW_MODES = {'RGB': 'RGBX', 'RGBX': 'RGBX', 'L': 'L'}
+BYTES_PER_PIXEL = {'RGBX': 4, 'L': 1}
+
+
+def default_source_cache_dir():
+    """Carpeta de la caché de orígenes (respeta FONDO_SOURCE_CACHE_DIR)
+
+    Es hermana de la caché de resultados y no está dentro de ella: su desalojo
+    recorre todas sus subcarpetas y borraría estas entradas.
+    """
+    if os.environ.get('FONDO_SOURCE_CACHE_DIR'):
+        return Path(os.environ['FONDO_SOURCE_CACHE_DIR'])
+    results = default_cache_dir()
+    return results.with_name(f"{results.name}-sources")
+
+
+class SourceCache:
+    """Orígenes decodificados en disco, reabiertos con mmap (LRU por mtime de la entrada)"""
+
+    def __init__(self, directory=None, limit_mb=None):
+        if limit_mb is None:
+            limit_mb = float(os.environ.get('FONDO_SOURCE_CACHE_MB', DEFAULT_LIMIT_MB))
+        self.directory = Path(directory) if directory else default_source_cache_dir()
+        self.limit = int(limit_mb * 1024 * 1024)
+        self._disk_bytes = None  # se calcula al primer guardado
+        self._lock = threading.Lock()
+        self.counters = {
+            'source_hits': 0,
+            'source_misses': 0,
+            'source_stale': 0,
+            'source_evictions': 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _path_for(self, source_path, fill):
+        # Sólo 'average' y 'dominant' cambian el color sobre el que se aplana la transparencia
+        matte = fill if fill in ('average', 'dominant') else 'black'
+        key = hashlib.sha256(f"{os.path.abspath(source_path)}|{matte}|v{PIPELINE_VERSION}".encode()).hexdigest()
+        return self.directory / key[:2] / key
+
+    def open(self, source_path, target_sizes, fill=DEFAULT_FILL):
+        """(imagen, tamaño original) desde la caché o decodificando con open_for_targets
+
+        Con un acierto la imagen está mapeada (sólo lectura) y no se decodifica
+        nada; con un fallo se decodifica y se guarda para la próxima vez.
+        """
+        hit = self.get(source_path, target_sizes, fill)
+        if hit is not None:
+            return hit
+        image, original_size = open_for_targets(source_path, target_sizes, fill=fill)
+        self.put(source_path, image, original_size, need_size(original_size, target_sizes), fill)
+        return image, original_size
+
+    def get(self, source_path, target_sizes, fill=DEFAULT_FILL):
+        """(imagen mapeada, tamaño original) o None si no hay una entrada válida"""
+        if self.limit <= 0:
+            return None
+        path = self._path_for(source_path, fill)
+        try:
+            stat = os.stat(source_path)
+            f = open(path, 'rb')
+        except OSError:
+            self._count('source_misses')
+            return None
+
+        with f:
+            try:
+                (magic, version, raw_mode, width, height, original_width, original_height, need_width,
+                 need_height, mtime_ns, size, digest) = HEADER.unpack(f.read(HEADER.size))
+            except struct.error:
+                magic = version = None
+            raw_mode = raw_mode.rstrip(b'\0').decode('ascii', 'replace') if magic else None
+            data_bytes = width * height * BYTES_PER_PIXEL.get(raw_mode, 0) if magic else 0
+            if (magic != MAGIC or version != FORMAT_VERSION or not data_bytes
+                    or os.fstat(f.fileno()).st_size < DATA_OFFSET + data_bytes):
+                self._drop(path, 'source_stale')
+                return None
+
+            if (mtime_ns, size) != (stat.st_mtime_ns, stat.st_size):
+                if file_hash(source_path) != digest.hex():
+                    self._drop(path, 'source_stale')
+                    return None
+                # Mismo contenido con otra fecha: actualizar la cabecera y seguir
+                self._rewrite_stat(path, stat)
+
+            original_size = (original_width, original_height)
+            need_width_now, need_height_now = need_size(original_size, target_sizes)
+            full_size = (width, height) == original_size
+            if not full_size and (need_width_now > need_width or need_height_now > need_height):
+                # La entrada se redujo para objetivos más chicos: decodificar de nuevo
+                self._count('source_misses')
+                return None
+
+            with span('load', path=str(source_path), cache='source'):
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                # La imagen conserva la vista y ésta el mapa: sin copia y vivo mientras se use
+                pixels = memoryview(mapped)[DATA_OFFSET:DATA_OFFSET + data_bytes]
+                image = Image.frombuffer(raw_mode, (width, height), pixels, 'raw', raw_mode, 0, 1)
+
+        try:
+            # Marcar como usada recientemente para el LRU
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('source_hits')
+        return image, original_size
+
+    def put(self, source_path, image, original_size, need, fill=DEFAULT_FILL):
+        """Guardar un origen ya normalizado (RGB o L) para las próximas aperturas"""
+        raw_mode = RAW_MODES.get(image.mode)
+        data_bytes = image.width * image.height * BYTES_PER_PIXEL[raw_mode] if raw_mode else 0
+        if not raw_mode or self.limit <= 0 or DATA_OFFSET + data_bytes > self.limit:
+            return
+
+        try:
+            stat = os.stat(source_path)
+            digest = bytes.fromhex(file_hash(source_path))
+        except OSError:
+            return
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, raw_mode.encode('ascii'), image.width, image.height,
+                             original_size[0], original_size[1], need[0], need[1],
+                             stat.st_mtime_ns, stat.st_size, digest)
+
+        path = self._path_for(source_path, fill)
+        tmp_path = temp_path_for(path)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with span('write', path=str(path), bytes=DATA_OFFSET + data_bytes, cache='source'):
+                with open(tmp_path, 'wb') as f:
+                    f.write(header.ljust(DATA_OFFSET, b'\0'))
+                    f.write(image.tobytes('raw', raw_mode))
+                os.replace(tmp_path, path)
+        except OSError:
+            # Disco lleno o entrada mapeada en Windows: la caché es opcional
+            tmp_path.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk()[1]
+            else:
+                self._disk_bytes += DATA_OFFSET + data_bytes
+            over_limit = self._disk_bytes > self.limit
+        if over_limit:
+            self._evict()
+
+    def _rewrite_stat(self, path, stat):
+        """Actualizar mtime y tamaño del origen en la cabecera de una entrada"""
+        offset = HEADER.size - 32 - 16
+        try:
+            with open(path, 'r+b') as f:
+                f.seek(offset)
+                f.write(struct.pack('<qq', stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            pass
+
+    def _drop(self, path, counter):
+        """Borrar una entrada inválida (cuenta también como fallo)"""
+        self._count(counter)
+        self._count('source_misses')
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    def _scan_disk(self):
+        """Listar entradas (mtime, tamaño, ruta) y el total ocupado"""
+        entries = []
+        total = 0
+        for path in self.directory.glob('*/*'):
+            if path.suffix == '.tmp':
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        return entries, total
+
+    def _evict(self):
+        """Borrar las entradas menos usadas hasta quedar en el 90% del límite"""
+        entries, total = self._scan_disk()
+        entries.sort()
+        target = self.limit * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self._count('source_evictions')
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        """Vaciar la caché de orígenes"""
+        for _, _, path in self._scan_disk()[0]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = 0
@@ -0,0 +1,407 @@
+"""
+Sincronización incremental de una carpeta de imágenes con su carpeta de fondos
+Uso: python fondo.py sync <carpeta> -o <salida> [--device NOMBRE ...]
+
+Un manifiesto SQLite (<salida>/.fondo-sync.db) recuerda, por origen, su mtime,
+tamaño y hash, y por origen x dispositivo la clave de conversión y la salida.
+Cada corrida sólo hace trabajo proporcional a lo que cambió:
+
+    - sólo se hashean los orígenes cuyo mtime/tamaño cambió (el resto usa el hash guardado)
+    - se convierten los pares origen x dispositivo cuya clave no coincide con la guardada
+      (origen nuevo o modificado, otro formato/preset/relleno, dispositivo nuevo)
+    - un origen movido o renombrado (mismo hash) mueve sus salidas en vez de reconvertir
+    - las salidas de orígenes borrados se eliminan (--no-prune para conservarlas)
+
+Una salida se registra en el manifiesto sólo después de escribirse; tras una
+caída la siguiente corrida rehace a lo sumo las conversiones sin confirmar.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import fondo_metrics
+from fondo_batch import _print_progress, resolve_devices, run_batch
+from fondo_cache import file_hash, make_key
+from fondo_core import DEFAULT_RESAMPLE, PHONE_RESOLUTIONS, allow_large_images, is_image_file, output_path_for
+from fondo_encode import (FORMATS, PRESETS, DEFAULT_PRESET, available_formats, encoder_settings,
+                          extension_for, is_available)
+from fondo_fill import FILLS, DEFAULT_FILL
+from fondo_output import FSYNC_MODES
+
+# Nombre del manifiesto dentro de la carpeta de salida
+MANIFEST_NAME = '.fondo-sync.db'
+
+# Confirmar el manifiesto cada tantos orígenes convertidos (lo pendiente se rehace tras una caída)
+COMMIT_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    source TEXT NOT NULL,
+    device TEXT NOT NULL,
+    key TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (source, device)
+);
+"""
+
+
+class Manifest:
+    """Manifiesto SQLite de una carpeta sincronizada (rutas relativas al origen y a la salida)
+
+    readonly (--dry-run) no crea la carpeta ni el archivo: abre el manifiesto
+    existente en sólo lectura o, si no lo hay, uno vacío en memoria.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = Path(path)
+        if readonly:
+            if self.path.is_file():
+                # immutable no deja -shm/-wal al lado; con un WAL pendiente hay que leerlo
+                wal = self.path.with_name(self.path.name + '-wal').exists()
+                mode = 'mode=ro' if wal else 'immutable=1'
+                self.db = sqlite3.connect(f"{self.path.resolve().as_uri()}?{mode}", uri=True)
+            else:
+                self.db = sqlite3.connect(':memory:')
+                self.db.executescript(SCHEMA)
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        # WAL: una caída a mitad de escritura no corrompe lo ya confirmado
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def sources(self):
+        """Origen -> (mtime_ns, tamaño, hash)"""
+        return {row[0]: row[1:] for row in self.db.execute('SELECT path, mtime_ns, size, hash FROM sources')}
+
+    def outputs(self):
+        """(origen, dispositivo) -> (clave, salida)"""
+        return {(row[0], row[1]): (row[2], row[3])
+                for row in self.db.execute('SELECT source, device, key, path FROM outputs')}
+
+    def put_source(self, path, mtime_ns, size, source_hash):
+        self.db.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)', (path, mtime_ns, size, source_hash))
+
+    def put_output(self, source, device, key, path):
+        self.db.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?)', (source, device, key, path))
+
+    def delete_output(self, source, device):
+        self.db.execute('DELETE FROM outputs WHERE source = ? AND device = ?', (source, device))
+
+    def delete_source(self, path):
+        self.db.execute('DELETE FROM outputs WHERE source = ?', (path,))
+        self.db.execute('DELETE FROM sources WHERE path = ?', (path,))
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+class SyncPlan:
+    """Trabajo de una corrida: qué convertir, qué mover y qué borrar"""
+
+    def __init__(self):
+        self.convert = {}    # origen -> [dispositivos a convertir]
+        self.moves = []      # (origen anterior, origen nuevo, dispositivo, clave, salida anterior, salida nueva)
+        self.removed = []    # orígenes que ya no existen
+        self.conflicts = []  # (origen, origen que ya tiene esa salida, salida): no se convierten
+        self.keys = {}       # (origen, dispositivo) -> clave esperada
+        self.unchanged = 0   # pares origen x dispositivo al día
+        self.hashed = 0      # orígenes que hubo que leer para hashear
+        self.scanned = 0
+
+    @property
+    def pending(self):
+        return sum(len(devices) for devices in self.convert.values())
+
+
+def scan_sources(root):
+    """Recorrer la carpeta (recursiva) y devolver ruta relativa -> (mtime_ns, tamaño)"""
+    found = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            fondo_metrics.logger.warning("Carpeta ilegible", extra={'fields': {'path': directory, 'error': str(e)}})
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file() and is_image_file(entry.name):
+                stat = entry.stat()
+                found[Path(os.path.relpath(entry.path, root)).as_posix()] = (stat.st_mtime_ns, stat.st_size)
+    return found
+
+
+def relative_output(root, source, device, extension):
+    """Salida de un origen (relativo a root) relativa a la carpeta de salida, en formato posix"""
+    return output_path_for(os.path.join(root, source), '', device, extension, root).as_posix()
+
+
+def plan_sync(manifest, root, output_dir, devices, settings, fill=DEFAULT_FILL, verify=False, dry_run=False):
+    """Comparar la carpeta con el manifiesto y decidir el trabajo mínimo
+
+    Los hashes nuevos se guardan en el manifiesto al planificar: sólo
+    memorizan el contenido y no dicen nada de qué salidas están hechas.
+    verify comprueba además que cada salida registrada siga en disco. Una
+    salida registrada con otra ruta (nombres de versiones anteriores, que
+    podían pisarse entre foto.jpg y foto.png) se vuelve a generar. Dos orígenes
+    que darían la misma salida (p. ej. sólo difieren en mayúsculas en un disco
+    que no las distingue) no se convierten y quedan en plan.conflicts.
+    dry_run no guarda nada en el manifiesto.
+    """
+    plan = SyncPlan()
+    known = manifest.sources()
+    done = manifest.outputs()
+    found = scan_sources(root)
+    plan.scanned = len(found)
+    extension = extension_for(settings)
+
+    plan.removed = [path for path in known if path not in found]
+    # Salidas de orígenes desaparecidos por clave: un origen movido las reaprovecha
+    orphans = {}
+    for path in plan.removed:
+        for device in devices:
+            if (path, device) in done:
+                key, output = done[(path, device)]
+                orphans.setdefault(key, (path, output))
+
+    # Salida (sin distinguir mayúsculas) -> origen; las ya registradas conservan su dueño
+    claimed = {output.casefold(): source for (source, _), (_, output) in done.items() if source in found}
+    for path, (mtime_ns, size) in sorted(found.items()):
+        previous = known.get(path)
+        if previous and previous[0] == mtime_ns and previous[1] == size:
+            source_hash = previous[2]
+        else:
+            source_hash = file_hash(os.path.join(root, path))
+            if not dry_run:
+                manifest.put_source(path, mtime_ns, size, source_hash)
+            plan.hashed += 1
+
+        for device in devices:
+            key = make_key(source_hash, PHONE_RESOLUTIONS[device], DEFAULT_RESAMPLE, settings, fill)
+            new_output = relative_output(root, path, device, extension)
+            owner = claimed.setdefault(new_output.casefold(), path)
+            if owner != path:
+                plan.conflicts.append((path, owner, new_output))
+                continue
+
+            recorded = done.get((path, device))
+            current = recorded is not None and recorded[0] == key and recorded[1] == new_output
+            if current and verify:
+                current = os.path.exists(os.path.join(output_dir, recorded[1]))
+            if current:
+                plan.unchanged += 1
+                continue
+
+            plan.keys[(path, device)] = key
+            orphan = orphans.pop(key, None)
+            if orphan and os.path.exists(os.path.join(output_dir, orphan[1])):
+                plan.moves.append((orphan[0], path, device, key, orphan[1], new_output))
+            else:
+                plan.convert.setdefault(path, []).append(device)
+    if not dry_run:
+        manifest.commit()
+    return plan
+
+
+def _remove_output(output_dir, output):
+    """Borrar una salida si existe y las carpetas que queden vacías (sin salir de output_dir)"""
+    path = Path(output_dir) / output
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return
+    for parent in path.relative_to(output_dir).parents[:-1]:
+        try:
+            (Path(output_dir) / parent).rmdir()
+        except OSError:
+            break
+
+
+class SyncReport:
+    """Resultado de una corrida de sincronización"""
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.converted = 0
+        self.moved = 0
+        self.pruned = 0
+        self.failed = []
+        self.elapsed = 0.0
+        self.stage_stats = {}
+
+
+def apply_sync(manifest, plan, root, output_dir, settings, fill=DEFAULT_FILL, workers=None, retries=1,
+               prune=True, cache_dir=None, cache_mb=None, max_job_mb=None, progress=None, fsync='never'):
+    """Ejecutar un plan: mover salidas de orígenes movidos, podar borrados y convertir lo pendiente"""
+    report = SyncReport(plan)
+    start = time.perf_counter()
+    extension = extension_for(settings)
+
+    for old_source, new_source, device, key, old_output, new_output in plan.moves:
+        target = os.path.join(output_dir, new_output)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(os.path.join(output_dir, old_output), target)
+        manifest.delete_output(old_source, device)
+        manifest.put_output(new_source, device, key, new_output)
+        report.moved += 1
+    manifest.commit()
+
+    outputs = manifest.outputs()
+    if prune:
+        removed = set(plan.removed)
+        # Registros de versiones anteriores pueden compartir salida con un origen vivo
+        live = {output for (source, _), (_, output) in outputs.items() if source not in removed}
+        for (source, _), (_, output) in outputs.items():
+            if source in removed and output not in live:
+                _remove_output(output_dir, output)
+        for path in plan.removed:
+            manifest.delete_source(path)
+            report.pruned += 1
+        manifest.commit()
+
+    # Los orígenes que necesitan los mismos dispositivos se convierten juntos
+    groups = {}
+    for path, devices in plan.convert.items():
+        groups.setdefault(tuple(devices), []).append(path)
+
+    uncommitted = 0
+
+    def on_result(source_path, written, error):
+        nonlocal uncommitted
+        if error:
+            return
+        source = Path(os.path.relpath(source_path, root)).as_posix()
+        for device in plan.convert[source]:
+            output = relative_output(root, source, device, extension)
+            previous = outputs.get((source, device))
+            # Otro formato o un nombre de una versión anterior: borrar la salida vieja
+            if previous and previous[1] != output:
+                _remove_output(output_dir, previous[1])
+            manifest.put_output(source, device, plan.keys[(source, device)], output)
+        report.converted += 1
+        uncommitted += 1
+        if uncommitted >= COMMIT_EVERY:
+            manifest.commit()
+            uncommitted = 0
+
+    for devices, paths in groups.items():
+        batch = run_batch([os.path.join(root, path) for path in paths], output_dir, list(devices),
+                          workers=workers, retries=retries, progress=progress, cache_dir=cache_dir,
+                          cache_mb=cache_mb, max_job_mb=max_job_mb, settings=settings, fill=fill,
+                          source_root=root, on_result=on_result, fsync=fsync)
+        report.failed.extend(batch.failed)
+        fondo_metrics.merge(report.stage_stats, batch.stage_stats)
+        manifest.commit()
+        uncommitted = 0
+
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def build_parser():
+    """Construir el parser de argumentos del modo sync"""
+    parser = argparse.ArgumentParser(prog='fondo sync',
+                                     description='Sincronizar una carpeta de imágenes: sólo convierte lo que cambió')
+    parser.add_argument('source', help='Carpeta de imágenes de origen (se recorre con sus subcarpetas)')
+    parser.add_argument('-o', '--output', default='Fondos Celulares', help='Carpeta de salida')
+    parser.add_argument('-d', '--device', action='append', dest='devices',
+                        help='Dispositivo: nombre, nombre corto o ANCHOxALTO (repetible, por defecto todos)')
+    parser.add_argument('--brand', action='append', dest='brands',
+                        help='Todos los dispositivos de una marca (repetible)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Procesos (por defecto todos los núcleos; 0 = en este proceso)')
+    parser.add_argument('--retries', type=int, default=1, help='Reintentos por archivo fallido')
+    parser.add_argument('--format', default='jpeg', choices=list(FORMATS), help='Formato de salida')
+    parser.add_argument('--preset', default=DEFAULT_PRESET, choices=list(PRESETS),
+                        help='Preset de codificación (fast, balanced, smallest, quality)')
+    parser.add_argument('--fill', default=DEFAULT_FILL, choices=list(FILLS), help='Relleno de las barras')
+    parser.add_argument('--manifest', help=f'Ruta del manifiesto (por defecto <salida>/{MANIFEST_NAME})')
+    parser.add_argument('--no-prune', dest='prune', action='store_false',
+                        help='No borrar las salidas de orígenes eliminados')
+    parser.add_argument('--verify', action='store_true',
+                        help='Comprobar que cada salida registrada siga en disco (un stat por salida)')
+    parser.add_argument('--dry-run', action='store_true', help='Mostrar el plan sin convertir ni borrar')
+    parser.add_argument('--fsync', default='never', choices=FSYNC_MODES,
+                        help='Durabilidad: never (sólo atómico), batch (fsync por origen) o always')
+    parser.add_argument('--cache-dir', help='Carpeta de caché de resultados (activa la caché)')
+    parser.add_argument('--cache-mb', type=float, default=None, help='Tamaño máximo de la caché en disco')
+    parser.add_argument('--max-job-mb', type=float, default=None,
+                        help='Límite de memoria por imagen: compone por franjas y libera el origen cuanto antes')
+    parser.add_argument('--timings', action='store_true', help='Mostrar el desglose de tiempo por etapa')
+    parser.add_argument('--log-level', help='Nivel del log JSON en stderr (DEBUG muestra cada etapa)')
+    return parser
+
+
+def main(argv=None):
+    """Punto de entrada del modo sync"""
+    args = build_parser().parse_args(argv)
+    allow_large_images()
+    if args.log_level:
+        fondo_metrics.configure_logging(args.log_level)
+    if not os.path.isdir(args.source):
+        print(f"❌ No existe la carpeta de origen: {args.source}")
+        return 1
+    if not is_available(args.format):
+        print(f"❌ El formato {args.format} no está disponible en esta instalación "
+              f"(disponibles: {', '.join(available_formats())})")
+        return 1
+
+    devices = resolve_devices(args.devices, args.brands)
+    settings = encoder_settings(args.format, args.preset)
+    manifest = Manifest(args.manifest or os.path.join(args.output, MANIFEST_NAME), readonly=args.dry_run)
+    try:
+        start = time.perf_counter()
+        plan = plan_sync(manifest, args.source, args.output, devices, settings, fill=args.fill,
+                         verify=args.verify, dry_run=args.dry_run)
+        print(f"🔎 {plan.scanned} imágenes en {time.perf_counter() - start:.1f}s ({plan.hashed} hasheadas): "
+              f"{plan.pending} fondos por convertir en {len(plan.convert)} imágenes, {len(plan.moves)} por mover, "
+              f"{len(plan.removed)} orígenes borrados, {plan.unchanged} al día")
+        for path, owner, output in plan.conflicts:
+            print(f"⚠️ {path} no se convierte: su salida {output} ya es de {owner}")
+        if args.dry_run:
+            for path, path_devices in sorted(plan.convert.items()):
+                print(f"  + {path} ({len(path_devices)} dispositivos)")
+            for old_source, new_source in sorted({move[:2] for move in plan.moves}):
+                print(f"  > {old_source} -> {new_source}")
+            for path in plan.removed:
+                print(f"  - {path}")
+            return 2 if plan.conflicts else 0
+
+        report = apply_sync(manifest, plan, args.source, args.output, settings, fill=args.fill,
+                            workers=args.workers, retries=args.retries, prune=args.prune,
+                            cache_dir=args.cache_dir, cache_mb=args.cache_mb, max_job_mb=args.max_job_mb,
+                            progress=_print_progress, fsync=args.fsync)
+    finally:
+        manifest.close()
+
+    print(f"✅ {report.converted} imágenes convertidas, {report.moved} fondos movidos, "
+          f"{report.pruned} orígenes podados en {report.elapsed:.1f}s")
+    if args.timings:
+        print(fondo_metrics.format_summary(report.stage_stats))
+    if report.failed:
+        print(f"❌ {len(report.failed)} archivos fallaron (se reintentarán en la próxima corrida)")
+    if report.failed or plan.conflicts:
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
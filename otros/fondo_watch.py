@@ -0,0 +1,502 @@
+"""
+Modo vigilancia: convertir automáticamente las imágenes nuevas de una o más carpetas
+Uso: python fondo.py watch <carpetas> [-o <salida>] [--device NOMBRE ...]
+
+En Linux se usa inotify (vía ctypes, sin dependencias); en otros sistemas, o
+con --backend poll, se sondea la carpeta cada --interval segundos. Los eventos
+de un mismo archivo se agrupan hasta que pasa --debounce sin cambios, así una
+escritura parcial o una ráfaga de 500 fotos de una cámara se convierten una
+vez por archivo. Los archivos listos pasan a una cola acotada (procesos +
+--queue); el resto espera agrupado sin duplicarse, hasta --max-pending archivos.
+La salida replica las subcarpetas de la carpeta vigilada.
+
+Cada conversión informa su latencia: desde el último evento del archivo
+(cierre de escritura) hasta el fondo escrito. Lo que ya existía al arrancar
+no se convierte: para eso está 'fondo.py sync'.
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import signal
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+
+import fondo_metrics
+from fondo_batch import _convert_task, _init_worker, resolve_devices
+from fondo_core import allow_large_images, default_output_dir, is_image_file
+from fondo_encode import (FORMATS, PRESETS, DEFAULT_PRESET, available_formats, encoder_settings,
+                          is_available)
+from fondo_fill import FILLS, DEFAULT_FILL
+from fondo_output import FSYNC_MODES
+from fondo_sync import scan_sources
+
+# Eventos de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Sólo interesan archivos terminados de escribir o movidos a la carpeta (y carpetas nuevas)
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+# Cabecera de struct inotify_event: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct('iIII')
+
+# Silencio necesario tras el último evento de un archivo antes de convertirlo
+DEFAULT_DEBOUNCE = 1.0
+
+# Intervalo del sondeo cuando no hay inotify
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Archivos listos en espera además de los que se están convirtiendo
+DEFAULT_QUEUE = 16
+
+# Archivos distintos esperando el debounce; al pasarse se descartan los más antiguos
+DEFAULT_MAX_PENDING = 10000
+
+# Latencias recientes que se guardan para los percentiles
+LATENCY_WINDOW = 10000
+
+
+class InotifyWatcher:
+    """Vigilancia recursiva con inotify; read() devuelve las rutas con eventos"""
+
+    def __init__(self, roots, ignore=None):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self.ignore = ignore
+        self.directories = {}  # descriptor de vigilancia -> carpeta
+        self.roots = roots
+        self.started = time.time()
+        for root in roots:
+            self.add_tree(root)
+
+    def add_tree(self, directory):
+        """Vigilar una carpeta y sus subcarpetas; devuelve las imágenes que ya contiene"""
+        found = []
+        stack = [directory]
+        while stack:
+            current = stack.pop()
+            if self.ignore and (os.path.abspath(current) + os.sep).startswith(self.ignore):
+                continue
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                fondo_metrics.logger.warning("No se puede vigilar la carpeta",
+                                             extra={'fields': {'path': current,
+                                                               'error': os.strerror(ctypes.get_errno())}})
+                continue
+            self.directories[wd] = current
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif is_image_file(entry.name):
+                    found.append(entry.path)
+        return found
+
+    def read(self, timeout):
+        """Esperar hasta timeout segundos y devolver las imágenes con eventos"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buffer = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Se perdieron eventos: volver a mirar todo lo modificado desde el arranque
+                fondo_metrics.logger.warning("Cola de inotify desbordada, reescaneando")
+                paths.extend(_modified_since(self.roots, self.started))
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF):
+                self.directories.pop(wd, None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Carpeta nueva: vigilarla y tomar lo que ya haya llegado dentro
+                    paths.extend(self.add_tree(path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and is_image_file(name):
+                paths.append(path)
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Vigilancia por sondeo: compara mtime/tamaño entre recorridos de la carpeta"""
+
+    def __init__(self, roots, interval=DEFAULT_POLL_INTERVAL, ignore=None):
+        self.roots = roots
+        self.interval = interval
+        self.ignore = ignore
+        self.state = self.scan()
+        self.next_scan = time.monotonic() + interval
+
+    def scan(self):
+        state = {}
+        for root in self.roots:
+            for relative, stat in scan_sources(root).items():
+                path = os.path.join(root, relative)
+                if not (self.ignore and os.path.abspath(path).startswith(self.ignore)):
+                    state[path] = stat
+        return state
+
+    def read(self, timeout):
+        """Esperar hasta el próximo recorrido (o timeout) y devolver lo nuevo o modificado"""
+        remaining = self.next_scan - time.monotonic()
+        if remaining > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, remaining))
+        self.next_scan = time.monotonic() + self.interval
+        previous, self.state = self.state, self.scan()
+        # Un archivo que sigue creciendo cambia en cada recorrido y el debounce lo retiene
+        return [path for path, stat in self.state.items() if previous.get(path) != stat]
+
+    def close(self):
+        pass
+
+
+def _modified_since(roots, since):
+    """Imágenes de las carpetas modificadas después de since (epoch)"""
+    since_ns = int(since * 1e9)
+    return [os.path.join(root, relative) for root in roots
+            for relative, (mtime_ns, _) in scan_sources(root).items() if mtime_ns >= since_ns]
+
+
+def inotify_available():
+    """Comprobar si el sistema ofrece inotify"""
+    if not sys.platform.startswith('linux'):
+        return False
+    name = ctypes.util.find_library('c')
+    return bool(name) and hasattr(ctypes.CDLL(name), 'inotify_init1')
+
+
+class Debouncer:
+    """Agrupar eventos por archivo: listo cuando pasó debounce sin eventos nuevos"""
+
+    def __init__(self, debounce=DEFAULT_DEBOUNCE, max_pending=DEFAULT_MAX_PENDING):
+        self.debounce = debounce
+        self.max_pending = max(1, max_pending)
+        self.pending = {}  # ruta -> (primer evento, último evento); en orden de llegada
+        self.coalesced = 0
+        self.dropped = 0
+
+    def touch(self, path, now):
+        if path in self.pending:
+            self.coalesced += 1
+            self.pending[path] = (self.pending[path][0], now)
+            return
+        if len(self.pending) >= self.max_pending:
+            # Llegan más archivos de los que se convierten: no crecer sin límite
+            oldest = next(iter(self.pending))
+            del self.pending[oldest]
+            self.dropped += 1
+            fondo_metrics.logger.warning("Archivo descartado por cola llena (convertir luego con sync)",
+                                         extra={'fields': {'path': oldest, 'max_pending': self.max_pending}})
+        self.pending[path] = (now, now)
+
+    def next_deadline(self):
+        """Momento en que el archivo más antiguo quedaría listo (None si no hay pendientes)"""
+        return min((last for _, last in self.pending.values()), default=None)
+
+    def pop_ready(self, now, limit, busy=()):
+        """Sacar hasta limit archivos listos, los más antiguos primero (salvo los que están en curso)"""
+        ready = []
+        for path, (_, last) in self.pending.items():
+            if len(ready) >= limit:
+                break
+            if now - last >= self.debounce and path not in busy:
+                ready.append((path, last))
+        for path, _ in ready:
+            del self.pending[path]
+        return ready
+
+
+class WatchStats:
+    """Conversiones, fallos y latencias (evento -> fondo escrito) del modo vigilancia"""
+
+    def __init__(self):
+        self.converted = 0
+        self.outputs = 0
+        self.failed = 0
+        self.dropped = 0
+        self.pool_restarts = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.convert_times = deque(maxlen=LATENCY_WINDOW)
+
+    def summary(self):
+        if not self.latencies:
+            return "(sin conversiones)"
+        latencies = list(self.latencies)
+        dropped = f", {self.dropped} descartados por cola llena" if self.dropped else ''
+        if self.pool_restarts:
+            dropped += f", {self.pool_restarts} procesos caídos"
+        return (f"{self.converted} imágenes, {self.outputs} fondos, {self.failed} fallos{dropped}; latencia "
+                f"p50 {fondo_metrics.percentile(latencies, 0.50) * 1000:.0f} ms, "
+                f"p95 {fondo_metrics.percentile(latencies, 0.95) * 1000:.0f} ms, "
+                f"máx {max(latencies) * 1000:.0f} ms; conversión "
+                f"p50 {fondo_metrics.percentile(list(self.convert_times), 0.50) * 1000:.0f} ms")
+
+
+def watch(roots, output_dir, devices, settings, fill=DEFAULT_FILL, workers=None, queue=DEFAULT_QUEUE,
+          debounce=DEFAULT_DEBOUNCE, backend='auto', interval=DEFAULT_POLL_INTERVAL, retries=1,
+          cache_dir=None, cache_mb=None, max_job_mb=None, stop=None, on_converted=None, fsync='never',
+          max_pending=DEFAULT_MAX_PENDING):
+    """Vigilar las carpetas y convertir cada imagen nueva hasta que stop() sea verdadero
+
+    Devuelve WatchStats. workers=0 convierte en este mismo proceso. La salida
+    replica las subcarpetas desde la carpeta vigilada (o desde la carpeta común
+    si son varias), así a/IMG_1.jpg y b/IMG_1.jpg no se pisan.
+    """
+    stop = stop or (lambda: False)
+    ignore = os.path.abspath(output_dir) + os.sep
+    if backend == 'auto':
+        backend = 'inotify' if inotify_available() else 'poll'
+    watcher = InotifyWatcher(roots, ignore) if backend == 'inotify' else PollingWatcher(roots, interval, ignore)
+    fondo_metrics.logger.info("Vigilando", extra={'fields': {'roots': roots, 'backend': backend}})
+
+    if backend == 'poll':
+        # Un archivo a medio escribir sólo se nota en el recorrido siguiente: esperar más que un intervalo
+        debounce = max(debounce, interval * 1.5)
+    debouncer = Debouncer(debounce, max_pending)
+    try:
+        source_root = os.path.commonpath([os.path.abspath(root) for root in roots])
+    except ValueError:
+        source_root = None  # unidades distintas en Windows
+    stats = WatchStats()
+    max_job_bytes = int(max_job_mb * 1024 * 1024) if max_job_mb else None
+    in_process = workers == 0
+    capacity = (1 if in_process else workers or os.cpu_count() or 1) + queue
+    executor = None
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1, initializer=_init_worker,
+                                   initargs=(cache_dir, cache_mb, None, None, Image.MAX_IMAGE_PIXELS))
+
+    if not in_process:
+        executor = new_pool()
+    else:
+        _init_worker(cache_dir, cache_mb)
+    running = {}  # future -> (ruta, último evento)
+    # Un hijo muerto (sin memoria, segfault) rompe el pool: se rehace y lo que
+    # estaba en vuelo se reintenta de a uno para saber qué archivo lo mató
+    suspects = deque()  # (ruta, último evento) en vuelo cuando murió un hijo
+    crashes = {}  # ruta -> hijos que murieron convirtiéndola aislada
+    alone = None  # ruta aislada en vuelo
+
+    def restart(lost):
+        nonlocal executor
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = new_pool()
+        stats.pool_restarts += 1
+        suspects.extend(lost)
+        fondo_metrics.logger.warning("Proceso de conversión caído: se rehace el pool",
+                                     extra={'fields': {'in_flight': len(lost)}})
+
+    def submit(path, last_event):
+        """Enviar una conversión al pool; False si el pool estaba roto (ya rehecho)"""
+        try:
+            future = executor.submit(_convert_task, path, output_dir, devices, retries,
+                                     max_job_bytes, settings, fill, source_root, fsync=fsync)
+        except BrokenProcessPool:
+            lost = [*running.values(), (path, last_event)]
+            running.clear()
+            restart(lost)
+            return False
+        running[future] = (path, last_event)
+        return True
+
+    def finish(path, last_event, outputs, error, stage_delta):
+        now = time.time()
+        # Tiempo de conversión propiamente dicho (suma de etapas); el resto de la latencia es espera
+        convert_seconds = sum(totals['seconds'] for totals in stage_delta.values())
+        if error:
+            stats.failed += 1
+            print(f"❌ {path}: {error}", file=sys.stderr)
+            return
+        stats.converted += 1
+        stats.outputs += len(outputs)
+        stats.latencies.append(now - last_event)
+        stats.convert_times.append(convert_seconds)
+        fondo_metrics.logger.info("Convertido", extra={'fields': {
+            'path': path, 'outputs': len(outputs), 'latency_ms': round((now - last_event) * 1000, 1),
+            'convert_ms': round(convert_seconds * 1000, 1), 'backlog': len(debouncer.pending)}})
+        print(f"✅ {os.path.basename(path)}: {len(outputs)} fondos, latencia {(now - last_event) * 1000:.0f} ms")
+        if on_converted:
+            on_converted(path, outputs)
+
+    try:
+        while not stop():
+            deadline = debouncer.next_deadline()
+            timeout = 0.25 if deadline is None else min(0.25, max(0.0, deadline + debounce - time.time()))
+            if running:
+                timeout = min(timeout, 0.05)
+            for path in watcher.read(timeout):
+                debouncer.touch(path, time.time())
+
+            if alone is not None and not running:
+                alone = None  # el aislado terminó sin matar al proceso
+            if suspects and alone is None and not running:
+                # Aislar: un sospechoso por vez; lo nuevo espera agrupado en el debouncer
+                alone, last_event = suspects.popleft()
+                if not os.path.exists(alone) or not submit(alone, last_event):
+                    alone = None
+            elif not suspects and alone is None:
+                busy = {path for path, _ in running.values()}
+                for path, last_event in debouncer.pop_ready(time.time(), capacity - len(running), busy):
+                    if not os.path.exists(path):
+                        continue  # borrado antes de convertirse
+                    if in_process:
+                        _, outputs, error, _, _, stage_delta = _convert_task(path, output_dir, devices, retries,
+                                                                             max_job_bytes, settings, fill,
+                                                                             source_root, fsync=fsync)
+                        finish(path, last_event, outputs, error, stage_delta)
+                    elif not submit(path, last_event):
+                        break
+
+            if running:
+                done, _ = wait(running, timeout=0, return_when=FIRST_COMPLETED)
+                dead = []  # perdidos porque el pool se rompió
+                for future in done:
+                    path, last_event = running.pop(future)
+                    try:
+                        _, outputs, error, _, _, stage_delta = future.result()
+                    except BrokenProcessPool:
+                        dead.append((path, last_event))
+                        continue
+                    except Exception as e:
+                        outputs, error, stage_delta = [], f"{type(e).__name__}: {e}", {}
+                    finish(path, last_event, outputs, error, stage_delta)
+                if dead:
+                    lost = dead + list(running.values())
+                    running.clear()
+                    if alone is not None:
+                        culprit = [item for item in lost if item[0] == alone]
+                        lost = [item for item in lost if item[0] != alone]
+                        crashes[alone] = crashes.get(alone, 0) + 1
+                        if crashes[alone] > retries:
+                            finish(alone, culprit[0][1], [], "BrokenProcessPool: el proceso de conversión "
+                                                             "murió con este archivo", {})
+                            del crashes[alone]
+                        else:
+                            lost[:0] = culprit
+                        alone = None
+                    restart(lost)
+    finally:
+        stats.dropped = debouncer.dropped
+        watcher.close()
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+    return stats
+
+
+def build_parser():
+    """Construir el parser de argumentos del modo vigilancia"""
+    parser = argparse.ArgumentParser(prog='fondo watch',
+                                     description='Vigilar carpetas y convertir automáticamente las imágenes nuevas')
+    parser.add_argument('inputs', nargs='+', help='Carpetas a vigilar (con sus subcarpetas)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='Carpeta de salida (por defecto la del guardado automático)')
+    parser.add_argument('-d', '--device', action='append', dest='devices',
+                        help='Dispositivo: nombre, nombre corto o ANCHOxALTO (repetible, por defecto todos)')
+    parser.add_argument('--brand', action='append', dest='brands',
+                        help='Todos los dispositivos de una marca (repetible)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Procesos (por defecto todos los núcleos; 0 = en este proceso)')
+    parser.add_argument('--queue', type=int, default=DEFAULT_QUEUE,
+                        help='Archivos listos en cola además de los que se convierten')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help='Archivos esperando el debounce como máximo (se descartan los más antiguos)')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help='Segundos sin eventos antes de convertir un archivo')
+    parser.add_argument('--backend', choices=['auto', 'inotify', 'poll'], default='auto',
+                        help='inotify (Linux) o sondeo de la carpeta')
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='Segundos entre recorridos con --backend poll')
+    parser.add_argument('--retries', type=int, default=1, help='Reintentos por archivo fallido')
+    parser.add_argument('--format', default='jpeg', choices=list(FORMATS), help='Formato de salida')
+    parser.add_argument('--preset', default=DEFAULT_PRESET, choices=list(PRESETS),
+                        help='Preset de codificación (fast, balanced, smallest, quality)')
+    parser.add_argument('--fill', default=DEFAULT_FILL, choices=list(FILLS), help='Relleno de las barras')
+    parser.add_argument('--fsync', default='never', choices=FSYNC_MODES,
+                        help='Durabilidad: never (sólo atómico), batch (fsync por origen) o always')
+    parser.add_argument('--cache-dir', help='Carpeta de caché de resultados (activa la caché)')
+    parser.add_argument('--cache-mb', type=float, default=None, help='Tamaño máximo de la caché en disco')
+    parser.add_argument('--max-job-mb', type=float, default=None,
+                        help='Límite de memoria por imagen: compone por franjas y libera el origen cuanto antes')
+    parser.add_argument('--log-level', help='Nivel del log JSON en stderr (INFO registra cada conversión)')
+    return parser
+
+
+def main(argv=None):
+    """Punto de entrada del modo vigilancia"""
+    args = build_parser().parse_args(argv)
+    allow_large_images()
+    if args.log_level:
+        fondo_metrics.configure_logging(args.log_level)
+    missing = [path for path in args.inputs if not os.path.isdir(path)]
+    if missing:
+        print(f"❌ No existen las carpetas: {', '.join(missing)}")
+        return 1
+    if not is_available(args.format):
+        print(f"❌ El formato {args.format} no está disponible en esta instalación "
+              f"(disponibles: {', '.join(available_formats())})")
+        return 1
+    if args.backend == 'inotify' and not inotify_available():
+        print("❌ inotify no está disponible en este sistema (usa --backend poll)")
+        return 1
+
+    devices = resolve_devices(args.devices, args.brands)
+    settings = encoder_settings(args.format, args.preset)
+    output_dir = args.output or str(default_output_dir())
+
+    # Terminar ordenadamente con Ctrl+C o SIGTERM (p. ej. al detener el servicio)
+    stopping = []
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopping.append(True))
+    print(f"👀 Vigilando {', '.join(args.inputs)} -> {output_dir} ({len(devices)} dispositivos)")
+    stats = watch(args.inputs, output_dir, devices, settings, fill=args.fill, workers=args.workers,
+                  queue=args.queue, debounce=args.debounce, backend=args.backend, interval=args.interval,
+                  retries=args.retries, cache_dir=args.cache_dir, cache_mb=args.cache_mb,
+                  max_job_mb=args.max_job_mb, stop=lambda: bool(stopping), fsync=args.fsync,
+                  max_pending=args.max_pending)
+    print(f"⏹ Detenido: {stats.summary()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Pruebas del modo batch: rutas de salida sin colisiones
+Uso: python -m unittest test_fondo_batch
+"""
+
+import contextlib
+import io
+import multiprocessing
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+import fondo_batch
+
+
+class BatchOutputPathsTest(unittest.TestCase):
+    """Orígenes con el mismo nombre en subcarpetas o con otra extensión"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.sources = self.root / 'col'
+        self.output = self.root / 'salida'
+        # Mismo nombre base en la raíz, en una subcarpeta y con otra extensión
+        for relative, color in (('x.jpg', 'red'), ('sub/x.png', 'green'), ('x.png', 'blue')):
+            path = self.sources / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            Image.new('RGB', (64, 48), color).save(path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_batch(self, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fondo_batch.main([*args, '-o', str(self.output), '-d', '1080x2400', '-j', '0'])
+
+    def outputs(self):
+        # Sin la carpeta del dispositivo (su nombre corto)
+        return sorted(Path(*path.relative_to(self.output).parts[1:]).as_posix()
+                      for path in self.output.rglob('*.jpg'))
+
+    def test_recursive_mirrors_tree(self):
+        self.assertEqual(self.run_batch(str(self.sources), '-r'), 0)
+        self.assertEqual(self.outputs(), ['sub/x.png.jpg', 'x.jpg.jpg', 'x.png.jpg'])
+
+    def test_outputs_keep_their_source(self):
+        self.run_batch(str(self.sources), '-r')
+        # Cada salida conserva el color de su propio origen
+        for name, color in (('x.jpg.jpg', (255, 0, 0)), ('sub/x.png.jpg', (0, 128, 0)),
+                            ('x.png.jpg', (0, 0, 255))):
+            [path] = self.output.glob(f'*/{name}')
+            with Image.open(path) as image:
+                pixel = image.convert('RGB').getpixel((image.width // 2, image.height // 2))
+            self.assertTrue(all(abs(a - b) < 8 for a, b in zip(pixel, color)), (name, pixel))
+
+    def test_several_inputs_with_same_names(self):
+        other = self.root / 'otra'
+        other.mkdir()
+        Image.new('RGB', (64, 48), 'white').save(other / 'x.jpg')
+        self.assertEqual(self.run_batch(str(self.sources), str(other)), 0)
+        self.assertEqual(self.outputs(), ['col/x.jpg.jpg', 'col/x.png.jpg', 'otra/x.jpg.jpg'])
+
+
+def _convert_or_die(source_path, *args, **kwargs):
+    """convert_file que mata al proceso hijo con los orígenes 'veneno'"""
+    if 'veneno' in os.path.basename(source_path):
+        os._exit(1)
+    return _real_convert_file(source_path, *args, **kwargs)
+
+
+_real_convert_file = fondo_batch.convert_file
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'el hijo hereda el parche sólo con fork')
+class BatchWorkerCrashTest(unittest.TestCase):
+    """Un hijo que muere no detiene la corrida ni arrastra a los demás archivos"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.sources = []
+        for name in ('a.jpg', 'veneno.jpg', 'b.jpg', 'c.jpg', 'd.jpg'):
+            path = self.root / name
+            Image.new('RGB', (64, 48), 'red').save(path)
+            self.sources.append(str(path))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_only_the_culprit_fails(self):
+        with mock.patch.object(fondo_batch, 'convert_file', _convert_or_die):
+            devices = fondo_batch.resolve_devices(['1080x2400'], None)
+            report = fondo_batch.run_batch(self.sources, str(self.root / 'salida'), devices, workers=2,
+                                           retries=1)
+        self.assertEqual(report.converted, 4)
+        self.assertEqual([os.path.basename(path) for path, _ in report.failed], ['veneno.jpg'])
+        self.assertIn('BrokenProcessPool', report.failed[0][1])
+        # Una caída en grupo y dos aisladas (el intento y su reintento)
+        self.assertEqual(report.pool_restarts, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Pruebas del registro de dispositivos: carga desde JSON y TOML
+Uso: python -m unittest test_fondo_devices
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import fondo_devices
+
+DATA = {
+    'default': 'Pixel 8 / 8a',
+    'series': {'Google': 'Pixel'},
+    'devices': [
+        {'name': 'Galaxy S24', 'brand': 'Samsung', 'width': 1080, 'height': 2340, 'ppi': 416},
+        {'name': 'Pixel 8 / 8a', 'brand': 'Google', 'width': 1080, 'height': 2400},
+        {'name': 'Pixel 8 Pro', 'brand': 'Google', 'width': 1344, 'height': 2992, 'series': 'Pixel Pro'},
+        {'name': 'Galaxy A54', 'brand': 'Samsung', 'width': 1080, 'height': 2340},
+    ],
+}
+
+TOML = """
+default = "Pixel 8 / 8a"
+
+[series]
+Google = "Pixel"
+
+[[devices]]
+name = "Galaxy S24"
+brand = "Samsung"
+width = 1080
+height = 2340
+ppi = 416
+
+[[devices]]
+name = "Pixel 8 / 8a"
+brand = "Google"
+width = 1080
+height = 2400
+
+[[devices]]
+name = "Pixel 8 Pro"
+brand = "Google"
+width = 1344
+height = 2992
+series = "Pixel Pro"
+
+[[devices]]
+name = "Galaxy A54"
+brand = "Samsung"
+width = 1080
+height = 2340
+"""
+
+
+class LoadRegistryTest(unittest.TestCase):
+    """Un mismo archivo de perfiles en JSON o en TOML da el mismo registro"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_json(self, data, name='devices.json'):
+        path = self.root / name
+        path.write_text(json.dumps(data), encoding='utf-8')
+        return str(path)
+
+    def test_json_profiles_and_lookups(self):
+        registry = fondo_devices.load_registry(self.write_json(DATA))
+        self.assertEqual(len(registry), 4)
+        self.assertEqual(registry.default, 'Pixel 8 / 8a')
+        self.assertEqual(registry['Galaxy S24'].ppi, 416)
+        self.assertIsNone(registry['Galaxy A54'].ppi)
+        # Serie: la propia del perfil, la de su marca o la marca misma
+        self.assertEqual(registry['Pixel 8 Pro'].series, 'Pixel Pro')
+        self.assertEqual(registry['Pixel 8 / 8a'].series, 'Pixel')
+        self.assertEqual(registry['Galaxy S24'].series, 'Samsung')
+        # Nombre corto y resolución: gana el primero del archivo
+        self.assertEqual(registry.find('pixel-8').name, 'Pixel 8 / 8a')
+        self.assertEqual(registry.find('1080x2340').name, 'Galaxy S24')
+        self.assertIsNone(registry.find('Nokia 3310'))
+        self.assertEqual([profile.name for profile in registry.by_brand('samsung')], ['Galaxy S24', 'Galaxy A54'])
+        self.assertEqual(registry.group_by_size()[(1080, 2340)], ['Galaxy S24', 'Galaxy A54'])
+        self.assertEqual(registry.sizes, ((1080, 2340), (1080, 2400), (1344, 2992)))
+
+    def test_toml_matches_json(self):
+        path = self.root / 'devices.toml'
+        path.write_text(TOML, encoding='utf-8')
+        from_toml = fondo_devices.load_registry(str(path))
+        from_json = fondo_devices.load_registry(self.write_json(DATA))
+        self.assertEqual(from_toml.profiles, from_json.profiles)
+        self.assertEqual(from_toml.default, from_json.default)
+
+    def test_environment_file(self):
+        with mock.patch.dict(os.environ, {'FONDO_DEVICES': self.write_json(DATA)}):
+            registry = fondo_devices.load_registry()
+        self.assertEqual(registry.default, 'Pixel 8 / 8a')
+
+    def test_default_is_first_profile_when_missing(self):
+        data = dict(DATA)
+        del data['default']
+        self.assertEqual(fondo_devices.load_registry(self.write_json(data)).default, 'Galaxy S24')
+
+    def test_invalid_files(self):
+        broken = dict(DATA, devices=[{'name': 'Sin tamaño', 'brand': 'X'}])
+        with self.assertRaisesRegex(ValueError, 'Perfil inválido'):
+            fondo_devices.load_registry(self.write_json(broken))
+        with self.assertRaisesRegex(ValueError, 'por defecto desconocido'):
+            fondo_devices.load_registry(self.write_json(dict(DATA, default='Nokia 3310')))
+        with self.assertRaisesRegex(ValueError, 'repetido'):
+            fondo_devices.load_registry(self.write_json(dict(DATA, devices=DATA['devices'] * 2)))
+        with self.assertRaisesRegex(ValueError, 'vacío'):
+            fondo_devices.load_registry(self.write_json(dict(DATA, devices=[], default=None)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Pruebas de la codificación por tamaño (encode_to_size)
+Uso: python -m unittest test_fondo_encode
+"""
+
+import math
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+import fondo_encode
+
+
+def _photo(size=(320, 240)):
+    """Imagen con detalle: su tamaño en JPEG crece con la calidad"""
+    noise = Image.effect_noise(size, 60)
+    gradient = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', (noise, gradient, Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 64)))
+
+
+class EncodeToSizeTest(unittest.TestCase):
+    """Bisección de la calidad JPEG para no superar un tamaño"""
+
+    def setUp(self):
+        self.image = _photo()
+        self.settings = fondo_encode.encoder_settings('jpeg', 'balanced')
+
+    def encode_spy(self):
+        return mock.patch.object(fondo_encode, 'encode', wraps=fondo_encode.encode)
+
+    def qualities(self, spy):
+        return [call.args[1]['quality'] for call in spy.call_args_list]
+
+    def size_at(self, quality):
+        return len(fondo_encode.encode(self.image, dict(self.settings, quality=quality)))
+
+    def test_highest_quality_that_fits(self):
+        top = self.settings['quality']
+        limit = (self.size_at(40) + self.size_at(top)) // 2
+        with self.encode_spy() as spy:
+            data = fondo_encode.encode_to_size(self.image, self.settings, limit, min_quality=30)
+        self.assertLessEqual(len(data), limit)
+        # Bisección, no barrido: log2 del rango de calidades
+        self.assertLessEqual(spy.call_count, math.ceil(math.log2(top - 30 + 1)) + 1)
+        chosen = max(quality for quality in self.qualities(spy) if self.size_at(quality) <= limit)
+        self.assertEqual(data, fondo_encode.encode(self.image, dict(self.settings, quality=chosen)))
+        self.assertGreater(self.size_at(chosen + 1), limit)
+
+    def test_everything_fits_keeps_preset_quality(self):
+        data = fondo_encode.encode_to_size(self.image, self.settings, 10 * 1024 * 1024)
+        self.assertEqual(data, fondo_encode.encode(self.image, self.settings))
+
+    def test_nothing_fits_returns_smallest(self):
+        data = fondo_encode.encode_to_size(self.image, self.settings, 100, min_quality=30)
+        self.assertEqual(data, fondo_encode.encode(self.image, dict(self.settings, quality=30)))
+
+    def test_lossless_is_encoded_once(self):
+        settings = fondo_encode.encoder_settings('png', 'fast')
+        with self.encode_spy() as spy:
+            data = fondo_encode.encode_to_size(self.image, settings, 100)
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(data, fondo_encode.encode(self.image, settings))
+
+    def test_target_bytes_setting(self):
+        limit = self.size_at(60)
+        settings = fondo_encode.encoder_settings('jpeg', 'balanced', target_bytes=limit)
+        self.assertLessEqual(len(fondo_encode.encode(self.image, settings)), limit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""
+Pruebas de la escritura atómica (OutputWriter)
+Uso: python -m unittest test_fondo_output
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import fondo_output
+
+
+class OutputWriterTest(unittest.TestCase):
+    """Publicación por lotes, descarte ante errores y temporales sin colisiones"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def files(self):
+        return sorted(os.listdir(self.root))
+
+    def test_never_publishes_at_once(self):
+        with fondo_output.OutputWriter('never') as writer:
+            writer.write(self.root / 'a.jpg', b'uno')
+            self.assertEqual(self.files(), ['a.jpg'])
+        self.assertEqual((self.root / 'a.jpg').read_bytes(), b'uno')
+
+    def test_batch_publishes_on_flush(self):
+        with fondo_output.OutputWriter('batch', fsync_every=10) as writer:
+            writer.write(self.root / 'a.jpg', b'uno')
+            writer.write(self.root / 'b.jpg', b'dos')
+            # Pendientes: sólo temporales ocultos hasta el flush
+            self.assertTrue(all(name.startswith('.') and name.endswith('.tmp') for name in self.files()))
+            writer.flush()
+            self.assertEqual(self.files(), ['a.jpg', 'b.jpg'])
+        self.assertEqual(writer.written, 2)
+
+    def test_batch_flushes_every_n_files(self):
+        writer = fondo_output.OutputWriter('batch', fsync_every=2)
+        writer.write(self.root / 'a.jpg', b'uno')
+        self.assertNotIn('a.jpg', self.files())
+        writer.write(self.root / 'b.jpg', b'dos')
+        self.assertEqual(self.files(), ['a.jpg', 'b.jpg'])
+        writer.close()
+
+    def test_same_destination_twice_in_a_batch(self):
+        with fondo_output.OutputWriter('batch') as writer:
+            writer.write(self.root / 'a.jpg', b'primero')
+            writer.write(self.root / 'a.jpg', b'segundo')
+        self.assertEqual(self.files(), ['a.jpg'])
+        self.assertEqual((self.root / 'a.jpg').read_bytes(), b'segundo')
+
+    def test_error_discards_pending(self):
+        (self.root / 'a.jpg').write_bytes(b'anterior')
+        with self.assertRaises(RuntimeError):
+            with fondo_output.OutputWriter('batch') as writer:
+                writer.write(self.root / 'a.jpg', b'nuevo')
+                writer.write(self.root / 'b.jpg', b'nuevo')
+                raise RuntimeError('falló la conversión')
+        # Nada a medias: el archivo anterior sigue y no quedan temporales
+        self.assertEqual(self.files(), ['a.jpg'])
+        self.assertEqual((self.root / 'a.jpg').read_bytes(), b'anterior')
+
+    def test_failed_fsync_discards_batch(self):
+        writer = fondo_output.OutputWriter('batch')
+        writer.write(self.root / 'a.jpg', b'uno')
+        with mock.patch.object(fondo_output.os, 'fsync', side_effect=OSError('disco lleno')):
+            with self.assertRaises(OSError):
+                writer.flush()
+        self.assertEqual(self.files(), [])
+        writer.close()  # ya no queda nada pendiente
+
+    def test_failed_write_removes_temporary(self):
+        with mock.patch.object(fondo_output, '_write_all', side_effect=OSError('disco lleno')):
+            with self.assertRaises(OSError):
+                fondo_output.write_atomic(self.root / 'a.jpg', b'uno')
+        self.assertEqual(self.files(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
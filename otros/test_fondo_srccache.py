@@ -0,0 +1,85 @@
+"""
+Pruebas de la caché de orígenes: qué invalida una entrada y qué no
+Uso: python -m unittest test_fondo_srccache
+"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+from fondo_srccache import SourceCache
+
+TARGET = (108, 240)
+
+
+class SourceCacheInvalidationTest(unittest.TestCase):
+    """Un touch conserva la entrada; otro contenido o un objetivo mayor la rehacen"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.source = self.root / 'foto.png'
+        Image.new('RGB', (800, 600), 'red').save(self.source)
+        self.cache = SourceCache(self.root / 'cache', limit_mb=64)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self, target=TARGET):
+        image, original_size = self.cache.open(str(self.source), [target])
+        with image:
+            return image.convert('RGB').getpixel((0, 0)), image.size, original_size
+
+    def set_mtime(self, seconds):
+        os.utime(self.source, ns=(seconds * 10**9, seconds * 10**9))
+
+    def test_second_open_is_a_hit(self):
+        first = self.open()
+        self.assertEqual(self.cache.counters['source_misses'], 1)
+        self.assertEqual(self.open(), first)
+        self.assertEqual(self.cache.counters['source_hits'], 1)
+        self.assertEqual(first[2], (800, 600))
+
+    def test_touch_keeps_the_entry(self):
+        self.open()
+        self.set_mtime(1_700_000_000)
+        self.assertEqual(self.open()[0], (255, 0, 0))
+        self.set_mtime(1_700_000_100)
+        self.assertEqual(self.open()[0], (255, 0, 0))
+        self.assertEqual(self.cache.counters['source_hits'], 2)
+        self.assertEqual(self.cache.counters['source_stale'], 0)
+
+    def test_new_content_invalidates(self):
+        self.open()
+        Image.new('RGB', (800, 600), 'blue').save(self.source)
+        self.set_mtime(1_700_000_000)
+        self.assertEqual(self.open()[0], (0, 0, 255))
+        self.assertEqual(self.cache.counters['source_stale'], 1)
+        # La entrada nueva reemplaza a la vieja
+        self.assertEqual(self.open()[0], (0, 0, 255))
+        self.assertEqual(self.cache.counters['source_hits'], 1)
+
+    def test_larger_target_decodes_again(self):
+        small = self.open((27, 60))
+        self.assertLess(small[1][0], 800)
+        large = self.open((540, 1200))
+        self.assertEqual(large[1], (800, 600))
+        self.assertEqual(self.cache.counters['source_misses'], 2)
+        # Lo más chico sale de la entrada más grande
+        self.open((27, 60))
+        self.assertEqual(self.cache.counters['source_hits'], 1)
+
+    def test_disabled_cache(self):
+        cache = SourceCache(self.root / 'cache', limit_mb=0)
+        for _ in range(2):
+            image, _ = cache.open(str(self.source), [TARGET])
+            image.close()
+        self.assertEqual(cache.counters['source_hits'], 0)
+        self.assertFalse((self.root / 'cache').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Pruebas del modo sync: movidos, borrados, conflictos y --dry-run
+Uso: python -m unittest test_fondo_sync
+"""
+
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+import fondo_sync
+
+
+class SyncTest(unittest.TestCase):
+    """Cada corrida hace sólo el trabajo que pide lo que cambió en la carpeta"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.sources = self.root / 'fotos'
+        self.output = self.root / 'salida'
+        self.add('a.jpg', 'red')
+        self.add('viaje/b.png', 'blue')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add(self, relative, color):
+        path = self.sources / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        Image.new('RGB', (64, 48), color).save(path)
+
+    def sync(self, *args):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            code = fondo_sync.main([str(self.sources), '-o', str(self.output), '-d', '1080x2400', '-j', '0', *args])
+        return code, out.getvalue()
+
+    def outputs(self):
+        # Sin la carpeta del dispositivo
+        return sorted(Path(*path.relative_to(self.output).parts[1:]).as_posix()
+                      for path in self.output.rglob('*.jpg'))
+
+    def manifest_sources(self):
+        db = sqlite3.connect(self.output / fondo_sync.MANIFEST_NAME)
+        try:
+            return sorted(row[0] for row in db.execute('SELECT path FROM sources'))
+        finally:
+            db.close()
+
+    def test_second_run_does_nothing(self):
+        code, out = self.sync()
+        self.assertEqual(code, 0)
+        self.assertIn('2 imágenes convertidas', out)
+        self.assertEqual(self.outputs(), ['a.jpg.jpg', 'viaje/b.png.jpg'])
+        code, out = self.sync()
+        self.assertEqual(code, 0)
+        self.assertIn('0 fondos por convertir', out)
+        self.assertIn('0 hasheadas', out)
+
+    def test_modified_source_is_converted_again(self):
+        self.sync()
+        self.add('a.jpg', 'green')
+        code, out = self.sync()
+        self.assertIn('1 fondos por convertir en 1 imágenes', out)
+        [path] = self.output.glob('*/a.jpg.jpg')
+        with Image.open(path) as image:
+            red, green, _ = image.convert('RGB').getpixel((image.width // 2, image.height // 2))
+        self.assertGreater(green, red)
+
+    def test_moved_source_moves_its_output(self):
+        self.sync()
+        (self.sources / 'archivo').mkdir()
+        os.replace(self.sources / 'a.jpg', self.sources / 'archivo' / 'c.jpg')
+        code, out = self.sync()
+        self.assertEqual(code, 0)
+        self.assertIn('0 imágenes convertidas, 1 fondos movidos, 1 orígenes podados', out)
+        self.assertEqual(self.outputs(), ['archivo/c.jpg.jpg', 'viaje/b.png.jpg'])
+        self.assertEqual(self.manifest_sources(), ['archivo/c.jpg', 'viaje/b.png'])
+
+    def test_deleted_source_is_pruned(self):
+        self.sync()
+        (self.sources / 'viaje' / 'b.png').unlink()
+        code, out = self.sync()
+        self.assertIn('1 orígenes podados', out)
+        self.assertEqual(self.outputs(), ['a.jpg.jpg'])
+        # La subcarpeta que quedó vacía también se borra
+        self.assertEqual([path for path in self.output.glob('*/viaje')], [])
+
+    def test_no_prune_keeps_outputs(self):
+        self.sync()
+        (self.sources / 'viaje' / 'b.png').unlink()
+        self.sync('--no-prune')
+        self.assertEqual(self.outputs(), ['a.jpg.jpg', 'viaje/b.png.jpg'])
+
+    def test_case_conflict_is_reported(self):
+        self.add('A.jpg', 'white')
+        code, out = self.sync()
+        self.assertEqual(code, 2)
+        self.assertIn('ya es de A.jpg', out)
+        # Sólo el primero (en orden) se queda con la salida
+        [path] = [path for path in self.output.rglob('*.jpg') if path.name.lower() == 'a.jpg.jpg']
+        self.assertEqual(path.name, 'A.jpg.jpg')
+
+    def test_dry_run_without_manifest_writes_nothing(self):
+        code, out = self.sync('--dry-run')
+        self.assertEqual(code, 0)
+        self.assertIn('  + a.jpg (1 dispositivos)', out)
+        self.assertFalse(self.output.exists())
+
+    def test_dry_run_keeps_manifest_and_outputs(self):
+        self.sync()
+        before = {path: path.stat().st_mtime_ns for path in self.output.rglob('*')}
+        self.add('nueva.jpg', 'white')
+        (self.sources / 'viaje' / 'b.png').unlink()
+        code, out = self.sync('--dry-run')
+        self.assertEqual(code, 0)
+        self.assertIn('  + nueva.jpg', out)
+        self.assertIn('  - viaje/b.png', out)
+        self.assertEqual({path: path.stat().st_mtime_ns for path in self.output.rglob('*')}, before)
+        self.assertEqual(self.manifest_sources(), ['a.jpg', 'viaje/b.png'])
+
+
+if __name__ == '__main__':
+    unittest.main()
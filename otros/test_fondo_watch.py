@@ -0,0 +1,113 @@
+"""
+Pruebas del modo vigilancia
+Uso: python -m unittest test_fondo_watch
+"""
+
+import contextlib
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from PIL import Image
+
+import fondo_batch
+import fondo_watch
+from fondo_encode import encoder_settings
+
+
+def _convert_or_die(source_path, *args, **kwargs):
+    """convert_file que mata al proceso hijo con los orígenes 'veneno'"""
+    if 'veneno' in os.path.basename(source_path):
+        os._exit(1)
+    return _real_convert_file(source_path, *args, **kwargs)
+
+
+_real_convert_file = fondo_batch.convert_file
+
+
+class DebouncerTest(unittest.TestCase):
+    """Eventos agrupados por archivo y cola acotada"""
+
+    def test_coalesces_until_quiet(self):
+        debouncer = fondo_watch.Debouncer(debounce=1.0)
+        debouncer.touch('a.jpg', 0.0)
+        debouncer.touch('a.jpg', 0.5)
+        debouncer.touch('a.jpg', 0.9)
+        self.assertEqual(debouncer.coalesced, 2)
+        self.assertEqual(debouncer.next_deadline(), 0.9)
+        # Cuenta desde el último evento, no desde el primero
+        self.assertEqual(debouncer.pop_ready(1.5, 10), [])
+        self.assertEqual(debouncer.pop_ready(2.0, 10), [('a.jpg', 0.9)])
+        self.assertEqual(debouncer.pending, {})
+        self.assertIsNone(debouncer.next_deadline())
+
+    def test_oldest_first_and_limit(self):
+        debouncer = fondo_watch.Debouncer(debounce=0.1)
+        for index, path in enumerate(('a.jpg', 'b.jpg', 'c.jpg')):
+            debouncer.touch(path, index * 0.01)
+        self.assertEqual([path for path, _ in debouncer.pop_ready(1.0, 2)], ['a.jpg', 'b.jpg'])
+        self.assertEqual([path for path, _ in debouncer.pop_ready(1.0, 2)], ['c.jpg'])
+
+    def test_busy_paths_wait(self):
+        debouncer = fondo_watch.Debouncer(debounce=0.1)
+        debouncer.touch('a.jpg', 0.0)
+        debouncer.touch('b.jpg', 0.0)
+        self.assertEqual([path for path, _ in debouncer.pop_ready(1.0, 10, busy={'a.jpg'})], ['b.jpg'])
+        self.assertIn('a.jpg', debouncer.pending)
+
+    def test_full_queue_drops_oldest(self):
+        debouncer = fondo_watch.Debouncer(debounce=0.1, max_pending=2)
+        with contextlib.redirect_stderr(io.StringIO()):
+            for index, path in enumerate(('a.jpg', 'b.jpg', 'c.jpg')):
+                debouncer.touch(path, float(index))
+            # Un evento nuevo de un archivo ya pendiente no descarta a nadie
+            debouncer.touch('c.jpg', 3.0)
+        self.assertEqual(debouncer.dropped, 1)
+        self.assertEqual(list(debouncer.pending), ['b.jpg', 'c.jpg'])
+
+
+@unittest.skipUnless(multiprocessing.get_start_method() == 'fork', 'el hijo hereda el parche sólo con fork')
+class WatchWorkerCrashTest(unittest.TestCase):
+    """Un hijo que muere no detiene la vigilancia"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        (self.root / 'fotos').mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_keeps_watching_after_a_crash(self):
+        def drop_files():
+            time.sleep(0.3)
+            for name in ('a.jpg', 'veneno.jpg', 'b.jpg'):
+                Image.new('RGB', (64, 48), 'red').save(self.root / 'fotos' / name)
+            time.sleep(2.5)
+            Image.new('RGB', (64, 48), 'red').save(self.root / 'fotos' / 'c.jpg')
+
+        converted = []
+        writer = threading.Thread(target=drop_files)
+        writer.start()
+        start = time.time()
+        devices = fondo_batch.resolve_devices(['1080x2400'], None)
+        with mock.patch.object(fondo_batch, 'convert_file', _convert_or_die), \
+                contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            stats = fondo_watch.watch([str(self.root / 'fotos')], str(self.root / 'salida'), devices,
+                                      encoder_settings(), workers=2, debounce=0.2, backend='poll', interval=0.2,
+                                      retries=1, stop=lambda: time.time() - start > 6,
+                                      on_converted=lambda path, outputs: converted.append(os.path.basename(path)))
+        writer.join()
+        self.assertEqual(sorted(converted), ['a.jpg', 'b.jpg', 'c.jpg'])
+        self.assertEqual(stats.failed, 1)
+        self.assertGreaterEqual(stats.pool_restarts, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()